@@ -1,10 +1,11 @@
 from django.contrib import admin
-from .models import Ticker, PriceBar, Watchlist, Order
+from .models import Ticker, PriceBar, IntradayBar, Watchlist, Order, Position, TradingStrategy, RiskMetric, TickerStats, PriceAlert, PortfolioSnapshot
 
 @admin.register(Ticker)
 class TickerAdmin(admin.ModelAdmin):
-    list_display = ('symbol', 'name', 'sector', 'price', 'change_pct', 'is_index')
+    list_display = ('symbol', 'name', 'sector', 'price', 'change_pct', 'shares_outstanding', 'is_index')
     list_filter = ('sector', 'exchange', 'is_index')
+    list_editable = ('shares_outstanding',)
     search_fields = ('symbol', 'name')
 
 @admin.register(PriceBar)
@@ -13,6 +14,12 @@ class PriceBarAdmin(admin.ModelAdmin):
     list_filter = ('ticker', 'date')
     date_hierarchy = 'date'
 
+@admin.register(IntradayBar)
+class IntradayBarAdmin(admin.ModelAdmin):
+    list_display = ('ticker', 'resolution', 'start', 'open', 'high', 'low', 'close', 'volume')
+    list_filter = ('resolution', 'ticker')
+    date_hierarchy = 'start'
+
 @admin.register(Watchlist)
 class WatchlistAdmin(admin.ModelAdmin):
     list_display = ('user', 'ticker', 'added_at')
@@ -20,6 +27,47 @@ class WatchlistAdmin(admin.ModelAdmin):
 
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
-    list_display = ('user', 'ticker', 'order_type', 'quantity', 'price', 'status', 'created_at')
-    list_filter = ('status', 'order_type', 'ticker')
+    list_display = ('user', 'ticker', 'order_type', 'kind', 'quantity', 'price', 'status', 'created_at', 'filled_at')
+    list_filter = ('status', 'kind', 'order_type', 'ticker')
     date_hierarchy = 'created_at'
+
+@admin.register(Position)
+class PositionAdmin(admin.ModelAdmin):
+    list_display = ('user', 'ticker', 'shares', 'avg_cost', 'total_cost', 'realized_pnl', 'updated_at')
+    list_filter = ('ticker',)
+    search_fields = ('user__username', 'ticker__symbol')
+
+@admin.register(TradingStrategy)
+class TradingStrategyAdmin(admin.ModelAdmin):
+    list_display = ('name', 'user', 'is_active', 'created_at')
+    list_filter = ('is_active',)
+    search_fields = ('name', 'user__username')
+
+@admin.register(RiskMetric)
+class RiskMetricAdmin(admin.ModelAdmin):
+    list_display = ('ticker', 'benchmark', 'as_of', 'beta', 'volatility', 'sharpe', 'max_drawdown')
+    list_filter = ('benchmark', 'as_of')
+    search_fields = ('ticker__symbol',)
+
+@admin.register(TickerStats)
+class TickerStatsAdmin(admin.ModelAdmin):
+    list_display = ('ticker', 'as_of', 'rsi_14', 'high_52w', 'low_52w', 'avg_volume_20', 'market_cap')
+    list_filter = ('as_of',)
+    search_fields = ('ticker__symbol',)
+
+@admin.register(PriceAlert)
+class PriceAlertAdmin(admin.ModelAdmin):
+    list_display = ('user', 'ticker', 'alert_type', 'target_price', 'is_active', 'created_at', 'triggered_at')
+    list_filter = ('alert_type', 'is_active')
+    search_fields = ('user__username', 'ticker__symbol')
+
+@admin.register(PortfolioSnapshot)
+class PortfolioSnapshotAdmin(admin.ModelAdmin):
+    list_display = ('user', 'as_of', 'holdings', 'market_value', 'cost_basis', 'unrealized_pnl', 'realized_pnl')
+    list_filter = ('as_of',)
+    search_fields = ('user__username',)
+    ordering = ('-as_of', '-market_value')
+    list_select_related = ('user',)
+    readonly_fields = ('computed_at',)
+    # Skip the unfiltered COUNT(*) over every snapshot on filtered pages
+    show_full_result_count = False
@@ -0,0 +1,273 @@
+"""
+Price alert evaluation.
+
+Active PriceAlerts live in memory in two sorted books, one per direction. Each
+alert is keyed by ``(ticker, threshold in paise)`` packed into one int64, with
+ABOVE thresholds ascending and BELOW thresholds descending within a ticker.
+For a given price the alerts it crosses are then a contiguous run at the
+front of the ticker's segment, so a tick is a single ``searchsorted`` over
+the whole book plus a slice per ticker that actually fired. Fired alerts are
+not removed from the arrays; a per-ticker head pointer just moves past them.
+
+New or edited alerts wait in a small pending set, checked directly on each
+tick, until enough accumulate to merge them into the books in one sort.
+
+Each process builds its book on first use. Its own PriceAlert writes reach
+the book through the receivers in ``markets.signals``; before every tick
+``sync`` also applies the alerts other processes created, edited or
+deactivated since the last one, found by ``updated_at``. Stamping
+``triggered_at`` only touches alerts that are still active, so an alert
+deleted elsewhere never fires and several processes evaluating the same
+ticks never fire an alert twice.
+"""
+import threading
+from datetime import timedelta
+
+import numpy as np
+from django.db import transaction
+from django.utils import timezone
+
+ABOVE, BELOW = 'ABOVE', 'BELOW'
+# Ticker slot in the high bits, threshold in paise in the low 40
+# (DecimalField(10, 2) tops out just under 2**40 paise)
+SHIFT = 40
+PRICE_MASK = (1 << SHIFT) - 1
+MERGE_AT = 4096
+STAMP_BATCH = 5000
+# How far back each sync re-reads, so rows a slow transaction commits after
+# the last sync are still picked up
+SYNC_LAG = timedelta(seconds=60)
+
+_EMPTY = np.empty(0, dtype=np.int64)
+
+
+def _paise(prices):
+    return np.rint(np.asarray(prices, dtype=np.float64) * 100).astype(np.int64)
+
+
+class _Book:
+    """One direction's alerts for every ticker, sorted so crossed alerts are a contiguous run"""
+
+    def __init__(self, slots, paise, ids, n_tickers, descending):
+        self.descending = descending
+        keys = (slots << SHIFT) | self._price_bits(paise)
+        order = np.argsort(keys, kind='stable')
+        self.keys = keys[order]
+        self.ids = ids[order]
+        self.starts = np.searchsorted(self.keys, np.arange(n_tickers, dtype=np.int64) << SHIFT)
+        self.head = self.starts.copy()
+
+    def _price_bits(self, paise):
+        return PRICE_MASK - paise if self.descending else paise
+
+    def live(self):
+        """``(slots, paise, ids)`` of alerts that have not fired yet"""
+        slots = self.keys >> SHIFT
+        alive = np.arange(len(self.keys)) >= self.head[slots]
+        return slots[alive], self._price_bits(self.keys[alive] & PRICE_MASK), self.ids[alive]
+
+    def cross(self, slots, paise):
+        """Ids of alerts crossed by ``paise`` on each ticker slot, consuming them"""
+        ends = np.searchsorted(self.keys, (slots << SHIFT) | self._price_bits(paise), side='right')
+        starts = self.head[slots]
+        fired = ends > starts
+        if not fired.any():
+            return _EMPTY
+        starts, ends = starts[fired], ends[fired]
+        self.head[slots[fired]] = ends
+        # Concatenate the [start, end) runs without a Python loop
+        lengths = ends - starts
+        offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+        return self.ids[offsets + np.arange(lengths.sum())]
+
+    def __len__(self):
+        return int(len(self.keys) - (self.head - self.starts).sum())
+
+
+class AlertBook:
+
+    def __init__(self):
+        self.tickers = _EMPTY       # sorted ticker ids; a ticker's slot is its position
+        self.books = {}             # alert type -> _Book
+        self.pending = {}           # alert id -> (ticker id, alert type, paise)
+        self.dead = set()           # ids whose entry in the books is stale
+        self.synced_at = None       # when the book last read the database
+        self.lock = threading.Lock()
+        self._build(_EMPTY, np.empty(0, dtype=object), _EMPTY, _EMPTY)
+
+    def load(self, rows):
+        """Bulk-load ``(id, ticker_id, alert_type, target_price)`` rows, sorting once"""
+        rows = list(rows)
+        with self.lock:
+            self.pending.clear()
+            self.dead.clear()
+            if not rows:
+                self._build(_EMPTY, np.empty(0, dtype=object), _EMPTY, _EMPTY)
+                return
+            ids, ticker_ids, types, prices = zip(*rows)
+            self._build(
+                np.array(ticker_ids, dtype=np.int64), np.array(types, dtype=object),
+                _paise(prices), np.array(ids, dtype=np.int64),
+            )
+
+    def _build(self, ticker_ids, types, paise, ids):
+        self.tickers = np.unique(ticker_ids)
+        slots = np.searchsorted(self.tickers, ticker_ids)
+        for alert_type in (ABOVE, BELOW):
+            mine = types == alert_type
+            self.books[alert_type] = _Book(
+                slots[mine], paise[mine], ids[mine], len(self.tickers), descending=alert_type == BELOW,
+            )
+
+    def _merge(self):
+        parts = []
+        for alert_type, book in self.books.items():
+            slots, paise, ids = book.live()
+            keep = ~np.isin(ids, list(self.dead))
+            parts.append((self.tickers[slots[keep]], np.full(keep.sum(), alert_type, dtype=object), paise[keep], ids[keep]))
+        if self.pending:
+            ids = np.fromiter(self.pending, dtype=np.int64, count=len(self.pending))
+            ticker_ids, types, paise = zip(*self.pending.values())
+            parts.append((np.array(ticker_ids, dtype=np.int64), np.array(types, dtype=object),
+                          np.array(paise, dtype=np.int64), ids))
+        self._build(*(np.concatenate(column) for column in zip(*parts)))
+        self.pending.clear()
+        self.dead.clear()
+
+    def add(self, alert_id, ticker_id, alert_type, target_price):
+        if alert_type not in (ABOVE, BELOW):
+            raise ValueError(f'Unknown alert type {alert_type!r}')
+        with self.lock:
+            # Any earlier version of this alert is superseded
+            self.dead.add(alert_id)
+            self.pending[alert_id] = (ticker_id, alert_type, int(_paise(target_price)))
+
+    def discard(self, alert_id):
+        with self.lock:
+            self.pending.pop(alert_id, None)
+            self.dead.add(alert_id)
+
+    def evaluate(self, ticker_ids, prices):
+        """
+        Ids of alerts crossed by a tick, which are then dropped from the book.
+        ``ticker_ids`` and ``prices`` are parallel sequences with at most one
+        price per ticker.
+        """
+        ticker_ids = np.asarray(ticker_ids, dtype=np.int64)
+        paise = _paise(prices)
+        with self.lock:
+            if len(self.pending) >= MERGE_AT:
+                self._merge()
+
+            fired = []
+            if len(self.tickers):
+                slots = np.minimum(np.searchsorted(self.tickers, ticker_ids), len(self.tickers) - 1)
+                known = self.tickers[slots] == ticker_ids
+                slots, known_paise = slots[known], paise[known]
+                for book in self.books.values():
+                    crossed = book.cross(slots, known_paise)
+                    if self.dead and len(crossed):
+                        crossed = crossed[~np.isin(crossed, list(self.dead))]
+                    fired.extend(crossed.tolist())
+
+            if self.pending:
+                tick = dict(zip(ticker_ids.tolist(), paise.tolist()))
+                for alert_id, (ticker_id, alert_type, target) in list(self.pending.items()):
+                    price = tick.get(ticker_id)
+                    if price is not None and (price >= target if alert_type == ABOVE else price <= target):
+                        del self.pending[alert_id]
+                        fired.append(alert_id)
+            return fired
+
+    def __len__(self):
+        return sum(len(book) for book in self.books.values()) + len(self.pending)
+
+
+_book = None
+_build_lock = threading.Lock()
+
+
+def build():
+    from .models import PriceAlert
+
+    book = AlertBook()
+    book.synced_at = timezone.now()
+    book.load(
+        PriceAlert.objects.filter(is_active=True)
+        .values_list('id', 'ticker_id', 'alert_type', 'target_price')
+        .iterator(chunk_size=10000)
+    )
+    return book
+
+
+def get_book():
+    global _book
+    if _book is None:
+        with _build_lock:
+            if _book is None:
+                _book = build()
+    return _book
+
+
+def sync(book):
+    """Apply alerts created, edited or deactivated since the book last looked, e.g. by another process"""
+    from .models import PriceAlert
+
+    now = timezone.now()
+    changed = PriceAlert.objects.filter(updated_at__gte=book.synced_at - SYNC_LAG).values_list(
+        'id', 'ticker_id', 'alert_type', 'target_price', 'is_active',
+    )
+    for alert_id, ticker_id, alert_type, target_price, is_active in changed:
+        if is_active:
+            book.add(alert_id, ticker_id, alert_type, target_price)
+        else:
+            book.discard(alert_id)
+    book.synced_at = now
+
+
+def stamp(alert_ids, when=None):
+    """Deactivate the alerts still active among ``alert_ids`` and set ``triggered_at``; returns their ids"""
+    from .models import PriceAlert
+
+    when = when or timezone.now()
+    alert_ids = list(alert_ids)
+    stamped = []
+    for offset in range(0, len(alert_ids), STAMP_BATCH):
+        with transaction.atomic():
+            ids = list(PriceAlert.objects.select_for_update().filter(
+                id__in=alert_ids[offset:offset + STAMP_BATCH], is_active=True,
+            ).values_list('id', flat=True))
+            PriceAlert.objects.filter(id__in=ids).update(is_active=False, triggered_at=when, updated_at=when)
+        stamped.extend(ids)
+    return stamped
+
+
+def process_tick(ticker_ids, prices, when=None):
+    """Evaluate a tick against every active alert and stamp the ones that fired"""
+    book = get_book()
+    sync(book)
+    fired = book.evaluate(ticker_ids, prices)
+    return stamp(fired, when) if fired else []
+
+
+def ticker_saved(ticker):
+    process_tick([ticker.id], [ticker.price])
+
+
+def alert_saved(alert):
+    if _book is None:
+        return
+    if alert.is_active:
+        _book.add(alert.id, alert.ticker_id, alert.alert_type, alert.target_price)
+    else:
+        _book.discard(alert.id)
+
+
+def alert_deleted(alert):
+    if _book is not None:
+        _book.discard(alert.id)
+
+
+def invalidate():
+    global _book
+    _book = None
@@ -0,0 +1,382 @@
+"""
+Batch backtesting for ``TradingStrategy.criteria``.
+
+A strategy's criteria is a JSON document of entry and exit rules::
+
+    {
+        "entry": [{"left": "sma:20", "op": "crosses_above", "right": "sma:50"}],
+        "exit": [{"left": "rsi:14", "op": ">", "right": 70}],
+        "sizing": {"method": "percent", "value": 1.0}
+    }
+
+An operand is ``open``, ``close``, a number, or an indicator spec understood
+by ``markets.indicators``. Indicators with several outputs take a component
+suffix, e.g. ``macd:12:26:9.signal`` or ``bb:20:2.lower``. Comparisons are
+``>``, ``<``, ``>=``, ``<=``, ``crosses_above`` and ``crosses_below``.
+Each entry buys a ``percent`` (fraction) of the sleeve's cash, a cash
+``amount`` or a number of ``shares``.
+
+Strategies are long-only. A position opens when every entry rule holds and
+closes when any exit rule holds. Signals are read at the close and filled at
+the next bar's open, adjusted for slippage and commission. Each ticker trades
+an equal slice of the starting capital. Tickers are simulated independently
+with vectorized signals, so the universe fans out across a process pool.
+"""
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, timedelta
+
+import numpy as np
+
+from . import indicators, risk
+
+EPOCH = date(1970, 1, 1)
+
+COMPARISONS = {
+    '>': np.greater,
+    '<': np.less,
+    '>=': np.greater_equal,
+    '<=': np.less_equal,
+}
+CROSSES = ('crosses_above', 'crosses_below')
+SIZING_METHODS = ('percent', 'amount', 'shares')
+
+
+def _iso(day):
+    return (EPOCH + timedelta(days=int(day))).isoformat()
+
+
+def _operand(value, prices, computed):
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    name = str(value).strip().lower()
+    if name in prices:
+        return prices[name]
+
+    spec, _, component = name.partition('.')
+    if spec not in computed:
+        parsed = indicators.parse_spec(spec)
+        if len(parsed) != 1:
+            raise ValueError(f'Invalid operand: {value}')
+        computed[spec] = indicators.compute(prices['close'], parsed)[indicators.spec_key(*parsed[0])]
+
+    series = computed[spec]
+    if isinstance(series, dict):
+        if component not in series:
+            raise ValueError(f'{spec} needs one of: {", ".join(series)}')
+        return series[component]
+    if component:
+        raise ValueError(f'{spec} has no component {component}')
+    return series
+
+
+def _condition(rule, prices, computed):
+    try:
+        left = _operand(rule['left'], prices, computed)
+        right = _operand(rule['right'], prices, computed)
+        op = rule['op']
+    except (KeyError, TypeError):
+        raise ValueError(f'Rules need left, op and right: {rule}')
+    if not isinstance(op, str):
+        raise ValueError(f'Unknown operator: {op}')
+
+    n = len(prices['close'])
+    with np.errstate(invalid='ignore'):
+        if op in COMPARISONS:
+            return np.broadcast_to(COMPARISONS[op](left, right), (n,))
+        if op in CROSSES:
+            diff = np.broadcast_to(np.subtract(left, right), (n,))
+            prev = np.empty(n)
+            prev[0] = np.nan
+            prev[1:] = diff[:-1]
+            if op == 'crosses_above':
+                return (diff > 0) & (prev <= 0)
+            return (diff < 0) & (prev >= 0)
+    raise ValueError(f'Unknown operator: {op}')
+
+
+def signals(criteria, prices):
+    """Boolean entry and exit arrays for one ticker's ``open``/``close`` arrays"""
+    computed = {}
+    n = len(prices['close'])
+    entry_rules = criteria.get('entry') or []
+    exit_rules = criteria.get('exit') or []
+    if not isinstance(entry_rules, list) or not isinstance(exit_rules, list):
+        raise ValueError('Entry and exit rules must be lists')
+    if not entry_rules:
+        raise ValueError('Strategy criteria need at least one entry rule')
+
+    entry = np.logical_and.reduce([_condition(r, prices, computed) for r in entry_rules])
+    if exit_rules:
+        exit_ = np.logical_or.reduce([_condition(r, prices, computed) for r in exit_rules])
+    else:
+        exit_ = np.zeros(n, dtype=bool)
+    return entry, exit_
+
+
+def validate_criteria(criteria):
+    """Raise ValueError if ``criteria`` cannot be evaluated"""
+    if not isinstance(criteria, dict):
+        raise ValueError('Strategy criteria must be a JSON object')
+    signals(criteria, {'open': np.ones(2), 'close': np.ones(2)})
+    resolve_sizing(criteria)
+
+
+def resolve_sizing(criteria, overrides=None):
+    """
+    ``criteria['sizing']`` with ``overrides`` applied, as ``{'method',
+    'value'}``. Raises ValueError unless the method is known and the value is
+    a positive number, at most 1 for ``percent``.
+    """
+    sizing = criteria.get('sizing') or {}
+    if not isinstance(sizing, dict):
+        raise ValueError('Sizing must be an object with a method and a value')
+    sizing = dict(sizing, **(overrides or {}))
+
+    method = sizing.get('method', 'percent')
+    if method not in SIZING_METHODS:
+        raise ValueError(f'Unknown sizing method: {method}')
+    try:
+        value = float(sizing.get('value', 1.0))
+    except (TypeError, ValueError):
+        raise ValueError(f'Sizing value must be a number: {sizing["value"]}')
+    if not math.isfinite(value) or value <= 0:
+        raise ValueError('Sizing value must be positive')
+    if method == 'percent' and value > 1:
+        raise ValueError('Percent sizing is a fraction of cash, at most 1')
+    return {'method': method, 'value': value}
+
+
+def holdings(entry, exit_):
+    """
+    Whether a position is held during each bar, given close-of-bar signals.
+
+    Exit wins when both fire on the same bar; the resulting state takes effect
+    from the next bar's open.
+    """
+    n = len(entry)
+    events = np.full(n, -1, dtype=np.int8)
+    events[entry] = 1
+    events[exit_] = 0
+    last = np.where(events >= 0, np.arange(n), -1)
+    np.maximum.accumulate(last, out=last)
+    state = np.where(last >= 0, events[np.maximum(last, 0)], 0) == 1
+
+    held = np.zeros(n, dtype=bool)
+    held[1:] = state[:-1]
+    return held
+
+
+def simulate(symbol, days, opens, closes, criteria, config):
+    """Backtest one ticker; returns its trades and daily equity"""
+    capital = config['capital']
+    slippage = config['slippage_bps'] / 10000
+    commission_rate = config['commission_bps'] / 10000
+    commission = config['commission']
+    sizing = config['sizing']
+
+    entry, exit_ = signals(criteria, {'open': opens, 'close': closes})
+    changes = np.diff(holdings(entry, exit_).astype(np.int8), prepend=0)
+    entries = np.flatnonzero(changes == 1)
+    exits = np.flatnonzero(changes == -1)
+
+    cash = capital
+    cash_flow = np.zeros(len(days))
+    shares_held = np.zeros(len(days))
+    trades = []
+
+    for i, entry_idx in enumerate(entries):
+        exit_idx = int(exits[i]) if i < len(exits) else None
+        buy_price = opens[entry_idx] * (1 + slippage)
+        if sizing['method'] == 'shares':
+            budget = min(cash, sizing['value'] * buy_price * (1 + commission_rate) + commission)
+        elif sizing['method'] == 'amount':
+            budget = min(cash, sizing['value'])
+        else:
+            budget = cash * sizing['value']
+        shares = math.floor(max(0.0, budget - commission) / (buy_price * (1 + commission_rate)) + 1e-9)
+        if shares <= 0:
+            continue
+
+        cost = shares * buy_price * (1 + commission_rate) + commission
+        cash -= cost
+        cash_flow[entry_idx] -= cost
+        shares_held[entry_idx:exit_idx] = shares
+
+        trade = {
+            'symbol': symbol,
+            'entry_date': _iso(days[entry_idx]),
+            'entry_price': round(float(buy_price), 4),
+            'shares': shares,
+            'exit_date': None,
+            'exit_price': None,
+        }
+        if exit_idx is None:
+            value = shares * closes[-1]
+        else:
+            sell_price = opens[exit_idx] * (1 - slippage)
+            value = shares * sell_price * (1 - commission_rate) - commission
+            cash += value
+            cash_flow[exit_idx] += value
+            trade['exit_date'] = _iso(days[exit_idx])
+            trade['exit_price'] = round(float(sell_price), 4)
+        trade['pnl'] = round(float(value - cost), 2)
+        trade['return_pct'] = round(float((value / cost - 1) * 100), 2)
+        trades.append(trade)
+
+    equity = capital + np.cumsum(cash_flow) + shares_held * closes
+    return {'symbol': symbol, 'days': days, 'equity': equity, 'trades': trades}
+
+
+def _simulate_job(job):
+    return simulate(*job)
+
+
+def summarize(days, equity, trades, capital):
+    """Headline statistics for an equity curve and its trades"""
+    stats = {
+        'start_value': round(float(capital), 2),
+        'end_value': round(float(equity[-1]), 2) if len(equity) else round(float(capital), 2),
+        'total_return_pct': 0.0,
+        'cagr_pct': 0.0,
+        'volatility_pct': 0.0,
+        'sharpe': 0.0,
+        'max_drawdown_pct': 0.0,
+        'trades': len(trades),
+        'win_rate_pct': 0.0,
+    }
+    if len(equity) < 2:
+        return stats
+
+    stats['total_return_pct'] = round(float((equity[-1] / capital - 1) * 100), 2)
+    years = (days[-1] - days[0]) / 365.25
+    if years > 0 and equity[-1] > 0:
+        stats['cagr_pct'] = round(float(((equity[-1] / capital) ** (1 / years) - 1) * 100), 2)
+
+    returns = risk.daily_returns(equity)
+    stats['volatility_pct'] = round(float(np.nan_to_num(risk.annualized_volatility(returns)) * 100), 2)
+    sharpe = risk.sharpe_ratio(returns)
+    if not np.isnan(sharpe):
+        stats['sharpe'] = round(float(sharpe), 2)
+    stats['max_drawdown_pct'] = round(float(risk.max_drawdown(equity) * 100), 2)
+
+    closed = [t for t in trades if t['exit_date'] is not None]
+    if closed:
+        stats['win_rate_pct'] = round(100 * sum(t['pnl'] > 0 for t in closed) / len(closed), 2)
+    return stats
+
+
+def load_prices(tickers, start=None, end=None):
+    """
+    ``(symbol, days, opens, closes)`` for each ticker with bars in range, days
+    counted from the epoch. Uses the columnar store when it is enabled.
+    """
+    from django.db.models import FloatField
+    from django.db.models.functions import Cast
+
+    from . import pricestore
+    from .models import PriceBar
+
+    symbols = {t.id: t.symbol for t in tickers}
+    series = {}
+    missing = []
+    for ticker_id, symbol in symbols.items():
+        stored = pricestore.read(ticker_id, start=start, end=end) if pricestore.is_enabled() else None
+        if stored is None:
+            missing.append(ticker_id)
+        elif len(stored):
+            series[ticker_id] = (
+                np.array(stored.data[pricestore.DATE]),
+                stored.prices('open'),
+                stored.prices('close'),
+            )
+
+    if missing:
+        bars = PriceBar.objects.filter(ticker_id__in=missing)
+        if start:
+            bars = bars.filter(date__gte=start)
+        if end:
+            bars = bars.filter(date__lte=end)
+        # Casting in SQL skips building a Decimal for every price
+        rows = bars.order_by('ticker_id', 'date').annotate(
+            open_f=Cast('open', FloatField()),
+            close_f=Cast('close', FloatField()),
+        ).values_list('ticker_id', 'date', 'open_f', 'close_f')
+        grouped = {}
+        for ticker_id, day, open_, close in rows.iterator(chunk_size=10000):
+            grouped.setdefault(ticker_id, []).append(((day - EPOCH).days, open_, close))
+        for ticker_id, rows in grouped.items():
+            days, opens, closes = (np.array(col) for col in zip(*rows))
+            series[ticker_id] = (days.astype(np.int64), opens, closes)
+
+    return [(symbols[ticker_id], *series[ticker_id]) for ticker_id in symbols if ticker_id in series]
+
+
+def run_backtest(criteria, tickers, start=None, end=None, capital=100000.0, slippage_bps=0.0,
+                 commission=0.0, commission_bps=0.0, sizing=None, workers=None):
+    """
+    Backtest ``criteria`` over ``tickers`` and return a JSON-ready dict with
+    the combined equity curve, every trade and summary statistics. Raises
+    ValueError unless capital is positive and the trading costs are not
+    negative.
+    """
+    validate_criteria(criteria)
+    sizing = resolve_sizing(criteria, sizing)
+    if not math.isfinite(capital) or capital <= 0:
+        raise ValueError('Capital must be positive')
+    for name, cost in (('slippage_bps', slippage_bps), ('commission', commission), ('commission_bps', commission_bps)):
+        if not math.isfinite(cost) or cost < 0:
+            raise ValueError(f'{name} must be zero or positive')
+
+    prices = load_prices(tickers, start, end)
+    sleeve = capital / len(prices) if prices else capital
+    config = {
+        'capital': sleeve,
+        'slippage_bps': slippage_bps,
+        'commission': commission,
+        'commission_bps': commission_bps,
+        'sizing': sizing,
+    }
+    jobs = [(symbol, days, opens, closes, criteria, config) for symbol, days, opens, closes in prices]
+
+    workers = workers or os.cpu_count() or 1
+    if workers > 1 and len(jobs) > 1:
+        from django.db import connections
+
+        # Forked workers must not share the parent's database connections
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_simulate_job, jobs, chunksize=max(1, len(jobs) // (workers * 4))))
+    else:
+        results = [_simulate_job(job) for job in jobs]
+
+    # Combine per-ticker sleeves on the union of trading days, carrying each
+    # sleeve's last value forward and counting it as cash before its first bar
+    all_days = np.unique(np.concatenate([r['days'] for r in results])) if results else np.array([], dtype=np.int64)
+    equity = np.zeros(len(all_days))
+    trades = []
+    for result in results:
+        pos = np.searchsorted(result['days'], all_days, 'right') - 1
+        equity += np.where(pos >= 0, result['equity'][np.maximum(pos, 0)], sleeve)
+        trades.extend(result['trades'])
+    trades.sort(key=lambda t: (t['entry_date'], t['symbol']))
+
+    return {
+        'symbols': [r['symbol'] for r in results],
+        'config': {
+            'start': start.isoformat() if start else None,
+            'end': end.isoformat() if end else None,
+            'capital': capital,
+            'slippage_bps': slippage_bps,
+            'commission': commission,
+            'commission_bps': commission_bps,
+            'sizing': sizing,
+        },
+        'stats': summarize(all_days, equity, trades, capital),
+        'equity_curve': [
+            {'date': _iso(day), 'equity': round(float(value), 2)}
+            for day, value in zip(all_days, equity)
+        ],
+        'trades': trades,
+    }
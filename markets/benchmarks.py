@@ -0,0 +1,248 @@
+"""
+Latency and query-count benchmarks for the markets pages and APIs.
+
+``run_suite`` seeds a synthetic dataset at one of ``SCALES`` inside a
+transaction that is rolled back afterwards, then requests every entry of
+``ENDPOINTS`` through the Django test client as one of the seeded traders:
+once with an empty cache (cold) and ``repeat`` more times (warm). Results
+are plain dicts so the bench_views command can write them as JSON, and
+``compare`` diffs two such files to flag slower endpoints or new queries.
+
+``load_test`` is the concurrent counterpart against a running server:
+virtual users loop over weighted endpoints with a random think time, the
+way a locust scenario would, and latencies are summarised per endpoint.
+"""
+import random
+import threading
+import time
+from datetime import datetime, time as dt_time
+from urllib.request import Request, urlopen
+
+import numpy as np
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from . import ledger, marketgen
+from .models import Order, Ticker
+
+SCALES = {
+    'small': {'tickers': 50, 'days': 250, 'users': 10, 'orders': 50},
+    'medium': {'tickers': 500, 'days': 750, 'users': 100, 'orders': 200},
+    'large': {'tickers': 2000, 'days': 1260, 'users': 1000, 'orders': 500},
+}
+PREFIX = 'BENCH'
+USER_PREFIX = 'bench-trader'
+HOLDINGS = 10       # tickers each seeded trader trades
+
+# name -> (url name, takes a symbol, query string, load-test weight)
+ENDPOINTS = {
+    'home': ('home', False, '', 3),
+    'stocks': ('stocks', False, '', 2),
+    'stock_detail': ('stock_detail', True, '', 4),
+    'portfolio': ('portfolio', False, '', 2),
+    'dashboard': ('dashboard', False, '', 1),
+    'analytics': ('analytics', False, '', 1),
+    'screener': ('screener', False, '', 1),
+    'trade_history': ('trade_history', False, '', 1),
+    'get_chart_data': ('chart_data', True, '?period=1y', 4),
+    'search_stocks': ('search_stocks', False, f'?q={PREFIX[:3]}', 2),
+}
+
+
+def endpoint_path(name, symbol):
+    url_name, with_symbol, query, _ = ENDPOINTS[name]
+    return reverse(url_name, args=[symbol] if with_symbol else []) + query
+
+
+def summarize(latencies):
+    """Count, mean and percentiles of ``latencies`` (seconds) in milliseconds"""
+    ms = np.asarray(latencies, dtype=float) * 1000
+    if not len(ms):
+        return {'count': 0}
+    return {
+        'count': len(ms),
+        'mean_ms': round(float(ms.mean()), 2),
+        'p50_ms': round(float(np.percentile(ms, 50)), 2),
+        'p95_ms': round(float(np.percentile(ms, 95)), 2),
+        'p99_ms': round(float(np.percentile(ms, 99)), 2),
+        'max_ms': round(float(ms.max()), 2),
+    }
+
+
+def seed_dataset(scale, seed=0):
+    """
+    Create the tickers, bars, traders and filled orders of ``scale`` (a key
+    of ``SCALES`` or a dict like its values). Returns the traders.
+    """
+    size = SCALES[scale] if isinstance(scale, str) else scale
+    marketgen.generate(size['tickers'], size['days'], seed=seed, prefix=PREFIX)
+    tickers = list(Ticker.objects.filter(symbol__startswith=PREFIX).order_by('symbol').values_list('id', flat=True))
+    days = marketgen.trading_days(timezone.localdate(), size['days']).tolist()
+
+    User.objects.bulk_create([User(username=f'{USER_PREFIX}{i}') for i in range(size['users'])])
+    users = list(User.objects.filter(username__startswith=USER_PREFIX).order_by('id'))
+    prices = dict(Ticker.objects.filter(id__in=tickers).values_list('id', 'price'))
+
+    rng = random.Random(seed)
+    orders = []
+    for user in users:
+        held = rng.sample(tickers, min(HOLDINGS, len(tickers)))
+        fill_days = sorted(rng.choice(days) for _ in range(size['orders']))
+        for i, day in enumerate(fill_days):
+            # Two buys for every sell keeps each position long
+            ticker_id = held[(i // 3) % len(held)]
+            filled_at = timezone.make_aware(datetime.combine(day, dt_time(10, 0)))
+            orders.append(Order(
+                user=user, ticker_id=ticker_id, order_type='SELL' if i % 3 == 2 else 'BUY',
+                quantity=3 if i % 3 == 2 else 5, price=prices[ticker_id], status='FILLED', filled_at=filled_at,
+            ))
+        if len(orders) >= 50000:
+            Order.objects.bulk_create(orders, batch_size=5000)
+            orders = []
+    Order.objects.bulk_create(orders, batch_size=5000)
+    ledger.rebuild_positions([user.id for user in users])
+    return users
+
+
+def measure(client, path, repeat):
+    """Cold and warm latency, query count, status and size of GET ``path``"""
+    cache.clear()
+    with CaptureQueriesContext(connection) as queries:
+        started = time.perf_counter()
+        response = client.get(path)
+        cold = time.perf_counter() - started
+    cold_queries = len(queries)
+
+    warm = []
+    for _ in range(repeat):
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            response = client.get(path)
+            warm.append(time.perf_counter() - started)
+    return {
+        'path': path,
+        'status': response.status_code,
+        'bytes': len(response.content),
+        'cold_ms': round(cold * 1000, 2),
+        'cold_queries': cold_queries,
+        'queries': len(queries) if repeat else cold_queries,
+        **summarize(warm),
+    }
+
+
+def run_suite(scale, repeat=10, endpoints=None, seed=0, progress=None):
+    """
+    Seed ``scale`` in a rolled-back transaction and measure ``endpoints``
+    (default: all of ``ENDPOINTS``). Returns ``{'dataset', 'endpoints'}``.
+    ``progress(name, result)`` is called after each endpoint.
+    """
+    size = SCALES[scale] if isinstance(scale, str) else scale
+    result = {'dataset': dict(size), 'endpoints': {}}
+    # The columnar store lives outside the database and would outlive the rollback
+    with override_settings(PRICE_STORE_DIR=None), transaction.atomic():
+        started = time.perf_counter()
+        users = seed_dataset(size, seed=seed)
+        result['dataset'].update(
+            bars=size['tickers'] * size['days'], order_rows=size['users'] * size['orders'],
+            seed_seconds=round(time.perf_counter() - started, 2),
+        )
+        symbol = Ticker.objects.filter(symbol__startswith=PREFIX).order_by('symbol').values_list('symbol', flat=True)[0]
+
+        client = Client()
+        client.force_login(users[0])
+        for name in endpoints or ENDPOINTS:
+            result['endpoints'][name] = measure(client, endpoint_path(name, symbol), repeat)
+            if progress:
+                progress(name, result['endpoints'][name])
+        transaction.set_rollback(True)
+    cache.clear()
+    return result
+
+
+def compare(current, baseline, tolerance=0.25):
+    """
+    Rows of ``(scale, endpoint, field, before, after)`` for every endpoint in
+    both result sets whose warm p50 grew by more than ``tolerance`` or that
+    issues more queries than before
+    """
+    regressions = []
+    for scale, run in current.get('scales', {}).items():
+        before_run = baseline.get('scales', {}).get(scale, {}).get('endpoints', {})
+        for name, after in run['endpoints'].items():
+            before = before_run.get(name)
+            if not before:
+                continue
+            if after.get('p50_ms', 0) > before.get('p50_ms', 0) * (1 + tolerance):
+                regressions.append((scale, name, 'p50_ms', before['p50_ms'], after['p50_ms']))
+            if after['queries'] > before['queries']:
+                regressions.append((scale, name, 'queries', before['queries'], after['queries']))
+    return regressions
+
+
+def session_cookie(user):
+    """A logged-in session for ``user`` in the configured session store, as a cookie header value"""
+    client = Client()
+    client.force_login(user)
+    return f'{settings.SESSION_COOKIE_NAME}={client.cookies[settings.SESSION_COOKIE_NAME].value}'
+
+
+def load_test(base_url, cookie, symbols, users=10, duration=30.0, spawn_rate=5.0, think_time=0.5, timeout=30.0):
+    """
+    Run ``users`` virtual users against ``base_url`` for ``duration``
+    seconds, starting ``spawn_rate`` of them per second. Each picks an
+    endpoint by weight (and a random symbol where one is needed), requests
+    it and waits up to ``think_time`` seconds. Returns per-endpoint
+    summaries with error counts, plus the totals.
+    """
+    paths = {name: [endpoint_path(name, symbol) for symbol in symbols] for name in ENDPOINTS}
+    names = list(ENDPOINTS)
+    weights = [ENDPOINTS[name][3] for name in names]
+    latencies = {name: [] for name in names}
+    errors = {name: 0 for name in names}
+    lock = threading.Lock()
+    login = reverse('login')
+    deadline = time.perf_counter() + duration
+
+    def user_loop(index):
+        rng = random.Random(index)
+        while time.perf_counter() < deadline:
+            name = rng.choices(names, weights)[0]
+            request = Request(base_url.rstrip('/') + rng.choice(paths[name]), headers={'Cookie': cookie})
+            started = time.perf_counter()
+            try:
+                with urlopen(request, timeout=timeout) as response:
+                    response.read()
+                # An expired session is redirected to the login page
+                failed = response.geturl().split('?')[0].endswith(login)
+            except OSError:
+                failed = True
+            elapsed = time.perf_counter() - started
+            with lock:
+                if failed:
+                    errors[name] += 1
+                else:
+                    latencies[name].append(elapsed)
+            time.sleep(rng.uniform(0, think_time))
+
+    threads = []
+    started = time.perf_counter()
+    for index in range(users):
+        thread = threading.Thread(target=user_loop, args=(index,), daemon=True)
+        thread.start()
+        threads.append(thread)
+        if spawn_rate and index + 1 < users:
+            time.sleep(1 / spawn_rate)
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    endpoints = {name: {**summarize(latencies[name]), 'errors': errors[name]} for name in names}
+    every = [t for name in names for t in latencies[name]]
+    total = {**summarize(every), 'errors': sum(errors.values()), 'rps': round(len(every) / elapsed, 2)}
+    return {'users': users, 'duration': round(elapsed, 2), 'endpoints': endpoints, 'total': total}
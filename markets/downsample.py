@@ -0,0 +1,84 @@
+"""
+Shape-preserving downsampling for chart series.
+
+Both methods take bars as ``(time, open, high, low, close, volume)`` rows,
+oldest first, and return at most ``threshold`` of them together with
+``picks``: for each returned row, the index in the input whose close it
+shows, so overlays computed on the full series can be thinned to match.
+
+``lttb``
+    Largest-Triangle-Three-Buckets over the closes. The first and last bars
+    are kept; the rest are split into equal buckets and each contributes the
+    bar forming the largest triangle with the bar kept from the previous
+    bucket and the mean of the next one. Bars are evenly spaced on the
+    chart's axis, so x is the bar's position.
+``ohlc``
+    Consecutive bars merged into candles: first open, highest high, lowest
+    low, last close and summed volume. Every extreme in the range survives.
+"""
+import numpy as np
+
+METHODS = ('ohlc', 'lttb')
+
+
+def lttb_indices(values, threshold):
+    """Indices of the ``threshold`` points of ``values`` that best keep its shape"""
+    y = np.asarray(values, dtype=float)
+    n = len(y)
+    if threshold >= n:
+        return np.arange(n)
+    if threshold < 3:
+        return np.array([0, n - 1])[:threshold]
+
+    # threshold - 2 buckets between the fixed first and last points
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    x = np.arange(n, dtype=float)
+    sizes = np.diff(edges)
+    mean_x = np.add.reduceat(x[:-1], edges[:-1]) / sizes
+    mean_y = np.add.reduceat(y[:-1], edges[:-1]) / sizes
+
+    picks = np.empty(threshold, dtype=np.int64)
+    picks[0], picks[-1] = 0, n - 1
+    a = 0
+    for bucket in range(threshold - 2):
+        lo, hi = edges[bucket], edges[bucket + 1]
+        if bucket + 1 < threshold - 2:
+            cx, cy = mean_x[bucket + 1], mean_y[bucket + 1]
+        else:
+            cx, cy = x[-1], y[-1]
+        # Twice the triangle area; the constant factor does not change the argmax
+        area = np.abs((x[a] - cx) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (cy - y[a]))
+        a = lo + int(np.argmax(area))
+        picks[bucket + 1] = a
+    return picks
+
+
+def lttb(rows, threshold):
+    picks = lttb_indices([row[4] for row in rows], threshold)
+    return [rows[i] for i in picks.tolist()], picks
+
+
+def ohlc(rows, threshold):
+    n = len(rows)
+    if threshold >= n:
+        return list(rows), np.arange(n)
+    starts = np.linspace(0, n, threshold, endpoint=False).astype(np.int64)
+    ends = np.append(starts[1:], n) - 1
+    times, opens, highs, lows, closes, volumes = zip(*rows)
+    high = np.maximum.reduceat(np.array(highs, dtype=float), starts)
+    low = np.minimum.reduceat(np.array(lows, dtype=float), starts)
+    volume = np.add.reduceat(np.array(volumes, dtype=np.int64), starts)
+    merged = [
+        (times[start], opens[start], h, l, closes[end], v)
+        for start, end, h, l, v in zip(starts.tolist(), ends.tolist(), high.tolist(), low.tolist(), volume.tolist())
+    ]
+    return merged, ends
+
+
+def downsample(rows, threshold, method='ohlc'):
+    """``(rows, picks)`` with at most ``threshold`` rows, by ``method`` ('ohlc' or 'lttb')"""
+    if method not in METHODS:
+        raise ValueError(f'Unknown downsampling method {method!r}')
+    if threshold < 1:
+        raise ValueError('max_points must be at least 1')
+    return (lttb if method == 'lttb' else ohlc)(rows, threshold)
@@ -1,7 +1,4 @@
 # Add to views.py
-from django.http import JsonResponse
-from django.views.decorators.csrf import csrf_exempt
-import json
 
 def dashboard(request):
     """Enhanced dashboard view"""
@@ -56,64 +53,7 @@ def screener(request):
     context = {'stocks': stocks}
     return render(request, 'markets/screener.html', context)
 
-def analytics(request):
-    """Portfolio analytics view"""
-    if not request.user.is_authenticated:
-        return redirect('login')
-        
-    # Get user's holdings and calculate analytics
-    orders = Order.objects.filter(user=request.user, status='FILLED')
-    holdings = {}
-    
-    # Calculate holdings with analytics metrics
-    for order in orders:
-        symbol = order.ticker.symbol
-        if symbol not in holdings:
-            holdings[symbol] = {
-                'ticker': order.ticker,
-                'qty': 0,
-                'weight': 0,
-                'return': 0,
-                'contribution': 0,
-                'beta': round(random.uniform(0.5, 1.5), 2),
-                'volatility': round(random.uniform(10, 25), 1),
-                'sharpe': round(random.uniform(0.5, 2.5), 2),
-                'max_drawdown': round(random.uniform(5, 20), 1)
-            }
-        
-        if order.side == 'BUY':
-            holdings[symbol]['qty'] += order.qty
-        else:
-            holdings[symbol]['qty'] -= order.qty
-    
-    # Remove zero positions
-    active_holdings = {k: v for k, v in holdings.items() if v['qty'] > 0}
-    
-    context = {'holdings': active_holdings.values()}
-    return render(request, 'markets/analytics.html', context)
-
-@csrf_exempt
-def price_alerts(request):
-    """Handle price alerts"""
-    if request.method == 'POST':
-        data = json.loads(request.body)
-        # Save alert to database
-        return JsonResponse({'status': 'success'})
-    
-    # Return user's alerts
-    alerts = []  # Get from database
-    return JsonResponse({'alerts': alerts})
-
 # Add to models.py
-class PriceAlert(models.Model):
-    user = models.ForeignKey(User, on_delete=models.CASCADE)
-    ticker = models.ForeignKey(Ticker, on_delete=models.CASCADE)
-    target_price = models.DecimalField(max_digits=10, decimal_places=2)
-    alert_type = models.CharField(max_length=10, choices=[('ABOVE', 'Above'), ('BELOW', 'Below')])
-    is_active = models.BooleanField(default=True)
-    created_at = models.DateTimeField(auto_now_add=True)
-    triggered_at = models.DateTimeField(null=True, blank=True)
-
 class MarketNews(models.Model):
     title = models.CharField(max_length=200)
     content = models.TextField()
@@ -125,11 +65,3 @@ class MarketNews(models.Model):
         ('NEGATIVE', 'Negative'),
         ('NEUTRAL', 'Neutral')
     ])
-
-class TradingStrategy(models.Model):
-    user = models.ForeignKey(User, on_delete=models.CASCADE)
-    name = models.CharField(max_length=100)
-    description = models.TextField()
-    criteria = models.JSONField()  # Store screening criteria
-    is_active = models.BooleanField(default=True)
-    created_at = models.DateTimeField(auto_now_add=True)
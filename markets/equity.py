@@ -0,0 +1,162 @@
+"""
+Daily portfolio equity curves.
+
+A user's curve walks the trading dates of the tickers they have traded once.
+Fills from FILLED orders apply from their trade date, and holdings are marked
+to that day's PriceBar close through a (dates, tickers) price matrix. The curve
+and the state needed to continue it are cached per user. Later calls only
+process fills and bars that arrived since, and fall back to a full rebuild
+when history changed underneath the cache, e.g. a fill was removed or
+backdated, or an order placed before the last fill rested and filled later.
+
+The last cached day is always recomputed, from the state as of the day
+before it, because the price feeds rewrite the current day's bar through
+the session.
+"""
+import numpy as np
+from django.core.cache import cache
+from django.db.models import Count
+from django.utils import timezone
+
+from .models import Order, PriceBar
+from .risk import close_matrix
+
+CACHE_KEY = 'equity-curve:{}'
+
+
+def _empty_state():
+    return {
+        'count': 0,          # fills applied so far
+        'max_id': 0,         # highest applied fill id
+        'ticker_ids': [],
+        'shares': np.zeros(0),
+        'last_prices': np.zeros(0),
+        'dates': [],
+        'value': np.zeros(0),
+        'cost': np.zeros(0),
+    }
+
+
+def _forward_fill(prices, seed):
+    """Fill NaN gaps in a (dates, tickers) matrix down each column, starting from ``seed``"""
+    filled = np.vstack([seed, prices])
+    rows = np.where(np.isnan(filled), 0, np.arange(len(filled))[:, None])
+    np.maximum.accumulate(rows, axis=0, out=rows)
+    return filled[rows, np.arange(filled.shape[1])][1:]
+
+
+def _new_fills(user, after_id):
+    orders = Order.objects.filter(user=user, status='FILLED')
+    if after_id:
+        # Only when extending: an id floor on a full build steers the planner
+        # off the (user, status, filled_at) index
+        orders = orders.filter(id__gt=after_id)
+    rows = orders.values_list('id', 'ticker_id', 'order_type', 'quantity', 'price', 'filled_at', 'created_at')
+    # Fill time as ledger.FILLED_AT has it, sorted here: ordering by the
+    # expression in SQL would sort in a temp table instead of reading the index
+    rows = sorted(rows, key=lambda row: (row[5] or row[6], row[0]))
+    return [
+        (order_id, ticker_id, timezone.localdate(filled_at or created_at),
+         quantity if order_type == 'BUY' else -quantity, float(price))
+        for order_id, ticker_id, order_type, quantity, price, filled_at, created_at in rows
+    ]
+
+
+def _rewind(state):
+    """``state`` without its last day, so that day can be recomputed"""
+    return {
+        **state['head'],
+        'dates': state['dates'][:-1],
+        'value': state['value'][:-1],
+        'cost': state['cost'][:-1],
+    }
+
+
+def _extend(state, fills, new_dates):
+    """Append ``new_dates`` to ``state``, applying the fills dated on or before the last of them"""
+    last_date = new_dates[-1]
+    applied = [fill for fill in fills if fill[2] <= last_date]
+    # Fills up to the day before, for the state _rewind returns to
+    before = [fill for fill in applied if len(new_dates) > 1 and fill[2] <= new_dates[-2]]
+
+    # Widen the ticker columns for anything traded for the first time
+    ticker_ids = list(state['ticker_ids'])
+    seed = list(state['last_prices'])
+    for _, ticker_id, _, _, price in applied:
+        if ticker_id not in ticker_ids:
+            ticker_ids.append(ticker_id)
+            seed.append(price)
+    columns = {ticker_id: i for i, ticker_id in enumerate(ticker_ids)}
+    shares = np.zeros(len(ticker_ids))
+    shares[:len(state['shares'])] = state['shares']
+
+    prices = _forward_fill(close_matrix(ticker_ids, new_dates).T, np.array(seed, dtype=float))
+
+    share_changes = np.zeros((len(new_dates), len(ticker_ids)))
+    cash_flows = np.zeros(len(new_dates))
+    if applied:
+        _, fill_tickers, fill_dates, quantities, fill_prices = zip(*applied)
+        rows = np.searchsorted(np.array(new_dates, dtype=object), np.array(fill_dates, dtype=object))
+        quantities = np.array(quantities, dtype=float)
+        np.add.at(share_changes, (rows, [columns[t] for t in fill_tickers]), quantities)
+        np.add.at(cash_flows, rows, quantities * np.array(fill_prices))
+
+    held = shares + np.cumsum(share_changes, axis=0)
+    last_cost = state['cost'][-1] if len(state['cost']) else 0.0
+
+    return {
+        'count': state['count'] + len(applied),
+        'max_id': max([state['max_id']] + [fill[0] for fill in applied]),
+        'ticker_ids': ticker_ids,
+        'shares': held[-1],
+        'last_prices': prices[-1],
+        'dates': state['dates'] + list(new_dates),
+        'value': np.concatenate([state['value'], (held * prices).sum(axis=1)]),
+        'cost': np.concatenate([state['cost'], last_cost + np.cumsum(cash_flows)]),
+        'head': {
+            'count': state['count'] + len(before),
+            'max_id': max([state['max_id']] + [fill[0] for fill in before]),
+            'ticker_ids': ticker_ids,
+            'shares': held[-2] if len(new_dates) > 1 else shares,
+            'last_prices': prices[-2] if len(new_dates) > 1 else np.array(seed, dtype=float),
+        },
+    }
+
+
+def equity_curve(user):
+    """
+    The user's daily equity curve as ``{'dates', 'value', 'cost'}``, where
+    ``value`` marks holdings to each day's close and ``cost`` is the net
+    amount invested so far.
+    """
+    key = CACHE_KEY.format(user.id)
+    state = cache.get(key)
+    state = _rewind(state) if state and 'head' in state else _empty_state()
+
+    total = Order.objects.filter(user=user, status='FILLED').aggregate(count=Count('id'))['count']
+    fills = _new_fills(user, state['max_id'])
+    last_date = state['dates'][-1] if state['dates'] else None
+
+    # Anything other than fills appended after the cached range invalidates it
+    if state['count'] + len(fills) != total or (last_date and any(f[2] <= last_date for f in fills)):
+        state = _empty_state()
+        fills = _new_fills(user, 0)
+        last_date = None
+
+    ticker_ids = set(state['ticker_ids']) | {fill[1] for fill in fills}
+    dates = PriceBar.objects.filter(ticker_id__in=ticker_ids)
+    if last_date:
+        dates = dates.filter(date__gt=last_date)
+    elif fills:
+        dates = dates.filter(date__gte=fills[0][2])
+    new_dates = list(dates.values_list('date', flat=True).distinct().order_by('date'))
+
+    if new_dates:
+        state = _extend(state, fills, new_dates)
+        cache.set(key, state, None)
+
+    return {'dates': state['dates'], 'value': state['value'], 'cost': state['cost']}
+
+
+def invalidate(user):
+    cache.delete(CACHE_KEY.format(user.id))
@@ -0,0 +1,97 @@
+"""
+Streaming CSV and JSON reports.
+
+Each report is a header plus a generator of rows read with
+``.iterator(chunk_size=...)``, so neither the queryset cache nor the response
+body ever holds more than a chunk at a time regardless of how many orders a
+user has. ``stream`` renders the rows lazily for ``StreamingHttpResponse``.
+"""
+import csv
+import json
+from decimal import Decimal
+
+from django.utils import timezone
+
+from . import equity
+from .models import Order, Position
+
+CHUNK_SIZE = 2000
+FORMATS = ('csv', 'json')
+
+
+class _Echo:
+    """File-like object whose write hands the line straight back to csv.writer's caller"""
+
+    def write(self, value):
+        return value
+
+
+def _trades(user):
+    header = ['date', 'symbol', 'name', 'side', 'quantity', 'price', 'amount', 'status']
+    rows = Order.objects.filter(user=user).order_by('created_at', 'id').values_list(
+        'created_at', 'ticker__symbol', 'ticker__name', 'order_type', 'quantity', 'price', 'status',
+    ).iterator(chunk_size=CHUNK_SIZE)
+    return header, (
+        [timezone.localtime(created_at).isoformat(), symbol, name, side, quantity, price, quantity * price, status]
+        for created_at, symbol, name, side, quantity, price, status in rows
+    )
+
+
+def _holdings(user):
+    header = [
+        'symbol', 'name', 'shares', 'avg_cost', 'total_cost', 'price',
+        'market_value', 'unrealized_pnl', 'realized_pnl',
+    ]
+    rows = Position.objects.filter(user=user, shares__gt=0).order_by('ticker__symbol').values_list(
+        'ticker__symbol', 'ticker__name', 'shares', 'avg_cost', 'total_cost', 'realized_pnl', 'ticker__price',
+    ).iterator(chunk_size=CHUNK_SIZE)
+    return header, (
+        [symbol, name, shares, avg_cost, total_cost, price, shares * price, shares * price - total_cost, realized]
+        for symbol, name, shares, avg_cost, total_cost, realized, price in rows
+    )
+
+
+def _equity(user):
+    header = ['date', 'value', 'cost', 'pnl']
+    curve = equity.equity_curve(user)
+    return header, (
+        [day.isoformat(), round(value, 2), round(cost, 2), round(value - cost, 2)]
+        for day, value, cost in zip(curve['dates'], curve['value'].tolist(), curve['cost'].tolist())
+    )
+
+
+REPORTS = {
+    'trades': _trades,
+    'holdings': _holdings,
+    'equity': _equity,
+}
+
+
+def _json_value(value):
+    return float(value) if isinstance(value, Decimal) else value
+
+
+def _csv_lines(header, rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(header)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def _json_lines(header, rows):
+    yield '['
+    separator = '\n'
+    for row in rows:
+        yield separator + json.dumps(dict(zip(header, map(_json_value, row))))
+        separator = ',\n'
+    yield '\n]\n'
+
+
+def stream(report, fmt, user):
+    """Lazily rendered lines of ``report`` for ``user`` in ``fmt`` ('csv' or 'json')"""
+    if report not in REPORTS:
+        raise ValueError(f'Unknown report {report!r}')
+    if fmt not in FORMATS:
+        raise ValueError(f'Unknown format {fmt!r}')
+    header, rows = REPORTS[report](user)
+    return _csv_lines(header, rows) if fmt == 'csv' else _json_lines(header, rows)
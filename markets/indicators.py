@@ -0,0 +1,215 @@
+"""
+Vectorized technical indicators.
+
+Every function takes closes as a NumPy array with time on the last axis, so a
+single ticker is a 1-D array and a universe of equal-length series is a 2-D
+``(tickers, bars)`` array computed in the same call. Values that are not
+defined yet (the warm-up window) are NaN.
+"""
+import math
+
+import numpy as np
+from django.core.cache import cache
+
+# Largest power of the decay factor a smoothing block may divide by before
+# float64 loses range; blocks are sized so ``decay ** -block`` stays below it.
+_MAX_LOG_SCALE = 250 * math.log(10)
+
+
+def _smooth(values, alpha, period):
+    """
+    Exponential smoothing ``y[t] = (1 - alpha) * y[t-1] + alpha * x[t]`` seeded
+    with the mean of the first ``period`` values.
+
+    The recurrence is solved in closed form over blocks with cumulative sums
+    rather than stepped bar by bar.
+    """
+    values = np.asarray(values, dtype=float)
+    out = np.empty(values.shape)
+    n = values.shape[-1]
+    if n < period:
+        out.fill(np.nan)
+        return out
+
+    out[..., :period - 1] = np.nan
+    level = values[..., :period].mean(axis=-1)
+    out[..., period - 1] = level
+    decay = 1.0 - alpha
+    if decay <= 0:
+        out[..., period:] = values[..., period:]
+        return out
+
+    block = max(1, int(_MAX_LOG_SCALE / -math.log(decay)))
+    start = period
+    while start < n:
+        stop = min(n, start + block)
+        powers = decay ** np.arange(1, stop - start + 1)
+        chunk = out[..., start:stop]
+        np.divide(values[..., start:stop], powers, out=chunk)
+        np.cumsum(chunk, axis=-1, out=chunk)
+        chunk *= alpha
+        chunk += level[..., None]
+        chunk *= powers
+        level = out[..., stop - 1]
+        start = stop
+    return out
+
+
+def _rolling_sum(values, period):
+    csum = np.cumsum(values, axis=-1)
+    out = np.empty(values.shape)
+    if values.shape[-1] < period:
+        out.fill(np.nan)
+        return out
+    out[..., :period - 1] = np.nan
+    out[..., period - 1] = csum[..., period - 1]
+    np.subtract(csum[..., period:], csum[..., :-period], out=out[..., period:])
+    return out
+
+
+def sma(closes, period=20):
+    """Simple moving average"""
+    closes = np.asarray(closes, dtype=float)
+    return _rolling_sum(closes, period) / period
+
+
+def ema(closes, period=20):
+    """Exponential moving average, seeded with the SMA of the first window"""
+    return _smooth(closes, 2.0 / (period + 1), period)
+
+
+def rsi(closes, period=14):
+    """Relative Strength Index with Wilder smoothing"""
+    closes = np.asarray(closes, dtype=float)
+    deltas = np.diff(closes, axis=-1)
+    avg_gain = _smooth(np.maximum(deltas, 0), 1.0 / period, period)
+    np.negative(deltas, out=deltas)
+    avg_loss = _smooth(np.maximum(deltas, 0, out=deltas), 1.0 / period, period)
+
+    # RSI = 100 * gain / (gain + loss), which is 100 when there are no losses
+    out = np.empty(closes.shape)
+    out[..., :1] = np.nan
+    total = avg_gain + avg_loss
+    with np.errstate(divide='ignore', invalid='ignore'):
+        np.divide(avg_gain, total, out=out[..., 1:])
+    out[..., 1:] *= 100
+    out[..., 1:][total == 0] = 50.0
+    return out
+
+
+def macd(closes, fast=12, slow=26, signal=9):
+    """MACD line, signal line and histogram"""
+    closes = np.asarray(closes, dtype=float)
+    line = ema(closes, fast) - ema(closes, slow)
+    signal_line = np.full(closes.shape, np.nan)
+    if closes.shape[-1] >= slow:
+        signal_line[..., slow - 1:] = _smooth(line[..., slow - 1:], 2.0 / (signal + 1), signal)
+    return {
+        'macd': line,
+        'signal': signal_line,
+        'histogram': line - signal_line,
+    }
+
+
+def bollinger(closes, period=20, num_std=2.0):
+    """Bollinger bands around the SMA using the population standard deviation"""
+    closes = np.asarray(closes, dtype=float)
+    # Centre each series on its first close so the sum of squares stays well conditioned
+    centred = closes - closes[..., :1]
+    mean = _rolling_sum(centred, period)
+    mean /= period
+    np.square(centred, out=centred)
+    std = _rolling_sum(centred, period)
+    std /= period
+    std -= mean ** 2
+    np.clip(std, 0, None, out=std)
+    np.sqrt(std, out=std)
+    std *= num_std
+    middle = mean
+    middle += closes[..., :1]
+    return {
+        'upper': middle + std,
+        'middle': middle,
+        'lower': middle - std,
+    }
+
+
+INDICATORS = {
+    'sma': (sma, (20,)),
+    'ema': (ema, (20,)),
+    'rsi': (rsi, (14,)),
+    'macd': (macd, (12, 26, 9)),
+    'bb': (bollinger, (20, 2.0)),
+}
+
+
+def parse_spec(spec):
+    """
+    Parse ``"sma:20,ema:50,rsi,macd:12:26:9,bb:20:2"`` into ``(name, params)``
+    pairs, filling missing parameters with the defaults. Raises ValueError on
+    unknown indicators or bad parameters.
+    """
+    parsed = []
+    for item in filter(None, (part.strip() for part in spec.split(','))):
+        name, *args = item.lower().split(':')
+        if name not in INDICATORS:
+            raise ValueError(f'Unknown indicator: {name}')
+        defaults = INDICATORS[name][1]
+        if len(args) > len(defaults):
+            raise ValueError(f'Too many parameters for {name}')
+        params = tuple(
+            type(default)(arg) if arg else default
+            for arg, default in zip(args + [''] * (len(defaults) - len(args)), defaults)
+        )
+        if any(not math.isfinite(p) or p <= 0 for p in params):
+            raise ValueError(f'Parameters for {name} must be positive numbers')
+        parsed.append((name, params))
+    return parsed
+
+
+def spec_key(name, params):
+    """Stable name for a spec, e.g. ``macd_12_26_9`` or ``bb_20_2.5``"""
+    return '_'.join([name, *(f'{p:g}' for p in params)])
+
+
+def compute(closes, specs):
+    """Run each ``(name, params)`` spec over ``closes``, keyed by ``spec_key``"""
+    closes = np.asarray(closes, dtype=float)
+    return {spec_key(name, params): INDICATORS[name][0](closes, *params) for name, params in specs}
+
+
+def for_ticker(ticker_id, specs):
+    """
+    Indicator series over a ticker's full close history, aligned to its bars.
+
+    Results are cached per (ticker, last bar date, indicator params), so they
+    are recomputed only once a new bar arrives.
+    """
+    from . import pricestore
+    from .models import PriceBar
+
+    series = pricestore.read(ticker_id) if pricestore.is_enabled() else None
+    if series is not None:
+        last_date = str(series.dates[-1]) if len(series) else None
+    else:
+        latest = PriceBar.objects.filter(ticker_id=ticker_id).order_by('-date').values_list('date', flat=True)[:1]
+        last_date = latest[0].isoformat() if latest else None
+
+    if last_date is None:
+        return {spec_key(name, params): np.array([]) for name, params in specs}
+
+    key = 'indicators:{}:{}:{}'.format(
+        ticker_id, last_date, ','.join(spec_key(name, params) for name, params in specs)
+    )
+    results = cache.get(key)
+    if results is None:
+        if series is not None:
+            closes = series.prices('close')
+        else:
+            closes = np.fromiter(
+                PriceBar.objects.filter(ticker_id=ticker_id).order_by('date').values_list('close', flat=True),
+                dtype=float,
+            )
+        results = compute(closes, specs)
+        cache.set(key, results)
+    return results
@@ -0,0 +1,312 @@
+"""
+Bulk OHLCV ingestion into PriceBar.
+
+Files are streamed in chunks with the columns ``symbol, date, open, high, low,
+close, volume``. Each chunk is validated, then upserted in its own transaction,
+so a failure loses at most the chunk in flight. After each commit the number of
+rows consumed is written to a checkpoint file next to the input, and a rerun
+skips straight past them.
+
+Chunks are column-major so validation can parse and check a whole column at
+once with numpy; only rows that fail are looked at one by one, to word their
+error. On backends with ``INSERT ... ON CONFLICT`` the upsert is the statement
+``bulk_create(update_conflicts=True)`` would build, with ``BATCH_ROWS`` rows
+per ``VALUES`` list and sent with ``executemany``. That skips its per-field
+value preparation and most of SQLite's per-statement overhead, which together
+were most of the cost at this volume; other backends go through
+``bulk_create`` itself.
+
+Neither path sends ``post_save``, so callers are expected to
+``pricestore.rebuild`` the tickers returned by ``import_file``.
+"""
+import csv
+import gc
+import json
+import os
+import time
+from contextlib import contextmanager
+from datetime import date
+from decimal import Decimal, InvalidOperation
+from itertools import islice, zip_longest
+from pathlib import Path
+
+import numpy as np
+from django.db import connection, transaction
+
+from .models import PriceBar, Ticker
+
+COLUMNS = ('symbol', 'date', 'open', 'high', 'low', 'close', 'volume')
+BAR_FIELDS = ('ticker', 'date', 'open', 'high', 'low', 'close', 'volume')
+MAX_PRICE = Decimal('99999999.99')
+# Rows per INSERT, inside SQLite's default limit of 999 parameters
+BATCH_ROWS = 140
+
+
+class IngestError(Exception):
+    pass
+
+
+def _csv_chunks(path, chunk_size, skip):
+    with open(path, newline='') as fh:
+        reader = csv.reader(fh)
+        header = [name.strip().lower() for name in next(reader, [])]
+        missing = [name for name in COLUMNS if name not in header]
+        if missing:
+            raise IngestError(f'{path}: missing columns {", ".join(missing)}')
+        positions = [header.index(name) for name in COLUMNS]
+
+        for _ in range(skip):
+            if next(reader, None) is None:
+                return
+        while rows := list(islice(reader, chunk_size)):
+            # Short rows are padded with '' and fail validation
+            columns = list(zip_longest(*rows, fillvalue=''))
+            yield [columns[i] if i < len(columns) else ('',) * len(rows) for i in positions]
+
+
+def _parquet_chunks(path, chunk_size, skip):
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise IngestError('Reading Parquet files requires pyarrow')
+
+    parquet = pq.ParquetFile(path)
+    missing = [name for name in COLUMNS if name not in parquet.schema_arrow.names]
+    if missing:
+        raise IngestError(f'{path}: missing columns {", ".join(missing)}')
+
+    for batch in parquet.iter_batches(batch_size=chunk_size, columns=list(COLUMNS)):
+        if skip >= batch.num_rows:
+            skip -= batch.num_rows
+            continue
+        yield [batch.column(name).to_pylist()[skip:] for name in COLUMNS]
+        skip = 0
+
+
+def read_chunks(path, chunk_size=50000, skip=0):
+    """
+    Yield chunks of up to ``chunk_size`` rows after skipping ``skip`` rows.
+    A chunk is a list of raw columns in ``COLUMNS`` order.
+    """
+    if Path(path).suffix.lower() in ('.parquet', '.pq'):
+        return _parquet_chunks(path, chunk_size, skip)
+    return _csv_chunks(path, chunk_size, skip)
+
+
+def _parse(values, dtype, convert):
+    """
+    ``values`` as a ``dtype`` array, and a mask of the ones that did not parse.
+    numpy converts the whole column in one go; if any value defeats it, each is
+    converted with ``convert`` instead.
+    """
+    try:
+        return np.asarray(values, dtype=dtype), np.zeros(len(values), dtype=bool)
+    except (TypeError, ValueError, OverflowError):
+        pass
+    parsed = np.zeros(len(values), dtype=dtype)
+    failed = np.zeros(len(values), dtype=bool)
+    for index, value in enumerate(values):
+        try:
+            parsed[index] = convert(value)
+        except (TypeError, ValueError, OverflowError, InvalidOperation):
+            failed[index] = True
+    return parsed, failed
+
+
+def _date(value):
+    return value if isinstance(value, date) else date.fromisoformat(str(value).strip())
+
+
+def _dates(values):
+    days, failed = _parse(values, 'datetime64[D]', _date)
+    # numpy also reads '2024-01', 'today' and timestamps, so anything but a
+    # plain YYYY-MM-DD goes back through date.fromisoformat
+    raw = np.asarray(values)
+    if raw.dtype.kind == 'U':
+        loose = np.char.str_len(np.char.strip(raw)) != 10
+    else:
+        loose = np.array([not isinstance(value, date) for value in values], dtype=bool)
+    for index in np.flatnonzero(loose & ~failed).tolist():
+        try:
+            days[index] = _date(values[index])
+        except (TypeError, ValueError):
+            failed[index] = True
+    return days, failed | np.isnat(days)
+
+
+def validate(columns, ticker_ids):
+    """
+    Turn raw ``columns`` into ``(ticker_id, date, open, high, low, close,
+    volume)`` tuples, ordered by ticker and date. Returns ``(bars, errors)``
+    where ``errors`` holds ``(index, message)`` for each row that was dropped.
+    Later rows for the same ticker and date replace earlier ones.
+    """
+    symbols, days, *prices, volumes = columns
+    known = {symbol: ticker_ids.get(str(symbol).strip().upper(), 0) for symbol in set(symbols)}
+    ids = np.fromiter(map(known.__getitem__, symbols), dtype=np.int64, count=len(symbols))
+    parsed_days, bad_days = _dates(days)
+    parsed_prices = []
+    checks = [
+        (ids == 0, lambda index: f'unknown symbol {symbols[index]!r}'),
+        (bad_days, lambda index: f'bad date {days[index]!r}'),
+    ]
+    for values in prices:
+        parsed, failed = _parse(values, np.float64, float)
+        parsed = parsed.round(2)
+        failed |= ~np.isfinite(parsed) | (parsed <= 0) | (parsed > float(MAX_PRICE))
+        parsed_prices.append(parsed)
+        checks.append((failed, lambda index, values=values: f'bad price {values[index]!r}'))
+    parsed_volumes, bad_volumes = _parse(volumes, np.int64, int)
+    open_, high, low, close = parsed_prices
+    checks += [
+        (bad_volumes, lambda index: f'bad volume {volumes[index]!r}'),
+        (parsed_volumes < 0, lambda index: f'negative volume {parsed_volumes[index]}'),
+        ((low > np.minimum(open_, close)) | (high < np.maximum(open_, close)),
+         lambda index: 'open/close outside the low-high range'),
+    ]
+
+    errors = {}
+    for failed, message in checks:
+        for index in np.flatnonzero(failed).tolist():
+            if index not in errors:
+                errors[index] = message(index)
+    valid = np.ones(len(symbols), dtype=bool)
+    valid[list(errors)] = False
+
+    # The last valid row for each (ticker, day), walking the unique index in order
+    rows = np.flatnonzero(valid)[::-1]
+    keys = ids[rows] << 32 | (parsed_days[rows].astype(np.int64) & 0xFFFFFFFF)
+    rows = rows[np.unique(keys, return_index=True)[1]]
+    # ISO strings, as marketgen passes, skip the date adapter; a chunk spans few days
+    unique_days, day_index = np.unique(parsed_days[rows], return_inverse=True)
+    bars = list(zip(
+        ids[rows].tolist(), np.datetime_as_string(unique_days).astype(object)[day_index].tolist(),
+        *(values[rows].tolist() for values in parsed_prices), parsed_volumes[rows].tolist(),
+    ))
+    return bars, sorted(errors.items())
+
+
+def _upsert_sql(rows):
+    quote = connection.ops.quote_name
+    columns = [PriceBar._meta.get_field(name).column for name in BAR_FIELDS]
+    updates = ', '.join(f'{quote(column)} = EXCLUDED.{quote(column)}' for column in columns[2:])
+    values = ', '.join([f'({", ".join(["%s"] * len(columns))})'] * rows)
+    return (
+        f'INSERT INTO {quote(PriceBar._meta.db_table)} ({", ".join(map(quote, columns))}) '
+        f'VALUES {values} '
+        f'ON CONFLICT ({quote(columns[0])}, {quote(columns[1])}) DO UPDATE SET {updates}'
+    )
+
+
+def upsert(bars):
+    """
+    Insert or overwrite ``bars`` in one transaction. A ticker and date may
+    appear only once, as PostgreSQL will not update a row twice in a statement.
+    """
+    bars = list(bars)
+    with transaction.atomic():
+        if connection.features.supports_update_conflicts_with_target:
+            whole = len(bars) - len(bars) % BATCH_ROWS
+            with connection.cursor() as cursor:
+                if whole:
+                    cursor.executemany(_upsert_sql(BATCH_ROWS), [
+                        [value for bar in bars[start:start + BATCH_ROWS] for value in bar]
+                        for start in range(0, whole, BATCH_ROWS)
+                    ])
+                if whole < len(bars):
+                    cursor.execute(_upsert_sql(len(bars) - whole), [value for bar in bars[whole:] for value in bar])
+        else:
+            PriceBar.objects.bulk_create(
+                [PriceBar(**dict(zip(['ticker_id', *BAR_FIELDS[1:]], bar))) for bar in bars],
+                update_conflicts=True,
+                update_fields=list(BAR_FIELDS[2:]),
+            )
+
+
+def _checkpoint_path(path):
+    return Path(f'{path}.checkpoint')
+
+
+def _fingerprint(path):
+    stat = os.stat(path)
+    return {'size': stat.st_size, 'mtime': stat.st_mtime}
+
+
+def load_checkpoint(path):
+    """Rows already imported from ``path``, or 0 if the file changed since"""
+    try:
+        state = json.loads(_checkpoint_path(path).read_text())
+    except (FileNotFoundError, ValueError):
+        return 0
+    if state.get('file') != _fingerprint(path):
+        return 0
+    return state.get('rows', 0)
+
+
+def save_checkpoint(path, rows):
+    checkpoint = _checkpoint_path(path)
+    tmp = checkpoint.with_suffix('.tmp')
+    tmp.write_text(json.dumps({'file': _fingerprint(path), 'rows': rows}))
+    os.replace(tmp, checkpoint)
+
+
+def clear_checkpoint(path):
+    try:
+        _checkpoint_path(path).unlink()
+    except FileNotFoundError:
+        pass
+
+
+@contextmanager
+def _collector_paused():
+    """
+    Hold off the cyclic garbage collector. Each chunk is tens of thousands of
+    row lists that refcounting frees on its own, and collections triggered by
+    allocating them took about a third of the import time.
+    """
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def import_file(path, chunk_size=50000, resume=True, strict=False, progress=None):
+    """
+    Import one file. ``progress`` is called after every committed chunk with
+    the running stats dict. Returns the stats, whose ``ticker_ids`` is the set
+    of tickers that received bars.
+    """
+    ticker_ids = dict(Ticker.objects.values_list('symbol', 'id'))
+    done = load_checkpoint(path) if resume else 0
+    stats = {
+        'skipped': done, 'rows': 0, 'bars': 0, 'errors': [],
+        'ticker_ids': set(), 'seconds': 0.0,
+    }
+    started = time.perf_counter()
+
+    with _collector_paused():
+        for chunk in read_chunks(path, chunk_size, skip=done):
+            rows = len(chunk[0])
+            bars, errors = validate(chunk, ticker_ids)
+            if errors and strict:
+                index, message = errors[0]
+                raise IngestError(f'{path}: row {done + index + 1}: {message}')
+            stats['errors'].extend((done + index + 1, message) for index, message in errors)
+
+            upsert(bars)
+            done += rows
+            save_checkpoint(path, done)
+
+            stats['rows'] += rows
+            stats['bars'] += len(bars)
+            stats['ticker_ids'].update(bar[0] for bar in bars)
+            stats['seconds'] = time.perf_counter() - started
+            if progress:
+                progress(stats)
+
+    clear_checkpoint(path)
+    stats['seconds'] = time.perf_counter() - started
+    return stats
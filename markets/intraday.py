@@ -0,0 +1,165 @@
+"""
+Intraday bars and their rollups.
+
+Bars arrive at the base resolution (one minute) through ``record``, which
+upserts them and then rebuilds every coarser bar they fall in: 5m from 1m,
+15m from 5m, 1h from 15m, and the day's PriceBar from 1h. Each level is
+rebuilt from the level below rather than merged into, so re-recording a bar
+that is still forming (the current minute, flushed again as ticks arrive) is
+idempotent. Buckets are aligned to local time, so every resolution nests
+inside the trading day.
+
+``pick`` chooses the coarsest resolution that still has enough bars for a
+chart, so long ranges are served from PriceBar and never scan minute bars.
+"""
+from datetime import datetime, timedelta
+from functools import partial
+from itertools import groupby
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from . import ingest, pricestore
+from .models import IntradayBar, PriceBar
+
+BASE = '1m'
+DAILY = '1d'
+RESOLUTIONS = {'1m': 60, '5m': 300, '15m': 900, '1h': 3600}
+ROLLUPS = [('1m', '5m'), ('5m', '15m'), ('15m', '1h')]
+BAR_FIELDS = ('ticker', 'resolution', 'start', 'open', 'high', 'low', 'close', 'volume')
+TICKER_BATCH = 2000
+
+
+def bucket_start(moment, resolution):
+    """Start of the ``resolution`` bucket holding ``moment``, in local time"""
+    local = timezone.localtime(moment)
+    midnight = local.replace(hour=0, minute=0, second=0, microsecond=0)
+    size = RESOLUTIONS[resolution]
+    offset = int((local - midnight).total_seconds()) // size * size
+    return midnight + timedelta(seconds=offset)
+
+
+def day_start(day):
+    return timezone.make_aware(datetime.combine(day, datetime.min.time()))
+
+
+def _upsert_sql():
+    quote = connection.ops.quote_name
+    columns = [IntradayBar._meta.get_field(name).column for name in BAR_FIELDS]
+    updates = ', '.join(f'{quote(column)} = EXCLUDED.{quote(column)}' for column in columns[3:])
+    return (
+        f'INSERT INTO {quote(IntradayBar._meta.db_table)} ({", ".join(map(quote, columns))}) '
+        f'VALUES ({", ".join(["%s"] * len(columns))}) '
+        f'ON CONFLICT ({", ".join(map(quote, columns[:3]))}) DO UPDATE SET {updates}'
+    )
+
+
+def _upsert(resolution, bars):
+    if connection.features.supports_update_conflicts_with_target:
+        adapt = connection.ops.adapt_datetimefield_value
+        with connection.cursor() as cursor:
+            cursor.executemany(_upsert_sql(), [
+                (ticker_id, resolution, adapt(start), *values) for ticker_id, start, *values in bars
+            ])
+    else:
+        IntradayBar.objects.bulk_create(
+            [IntradayBar(ticker_id=bar[0], resolution=resolution, **dict(zip(BAR_FIELDS[2:], bar[1:]))) for bar in bars],
+            update_conflicts=True,
+            unique_fields=list(BAR_FIELDS[:3]),
+            update_fields=list(BAR_FIELDS[3:]),
+        )
+
+
+def _children(resolution, ticker_ids, start, end):
+    """``resolution`` bars for ``ticker_ids`` in [start, end), ordered by ticker then time"""
+    ticker_ids = sorted(ticker_ids)
+    for offset in range(0, len(ticker_ids), TICKER_BATCH):
+        yield from IntradayBar.objects.filter(
+            ticker_id__in=ticker_ids[offset:offset + TICKER_BATCH],
+            resolution=resolution, start__gte=start, start__lt=end,
+        ).order_by('ticker_id', 'start').values_list(
+            'ticker_id', 'start', 'open', 'high', 'low', 'close', 'volume',
+        ).iterator(chunk_size=10000)
+
+
+def _aggregate(rows, key, wanted):
+    """Merge consecutive rows sharing ``key(row)`` into one bar, for the keys in ``wanted``"""
+    merged = []
+    for group_key, group in groupby(rows, key=key):
+        if group_key not in wanted:
+            continue
+        group = list(group)
+        merged.append((
+            *group_key, group[0][2], max(row[3] for row in group), min(row[4] for row in group),
+            group[-1][5], sum(row[6] for row in group),
+        ))
+    return merged
+
+
+def _rollup(child, parent, bars):
+    wanted = {(ticker_id, bucket_start(start, parent)) for ticker_id, start, *_ in bars}
+    starts = [start for _, start in wanted]
+    rows = _children(child, {ticker_id for ticker_id, _ in wanted}, min(starts),
+                     max(starts) + timedelta(seconds=RESOLUTIONS[parent]))
+    return _aggregate(rows, lambda row: (row[0], bucket_start(row[1], parent)), wanted)
+
+
+def _rollup_days(bars):
+    wanted = {(ticker_id, timezone.localdate(start)) for ticker_id, start, *_ in bars}
+    days = [day for _, day in wanted]
+    rows = _children('1h', {ticker_id for ticker_id, _ in wanted}, day_start(min(days)),
+                     day_start(max(days) + timedelta(days=1)))
+    return _aggregate(rows, lambda row: (row[0], timezone.localdate(row[1])), wanted)
+
+
+def record(bars):
+    """
+    Upsert base-resolution ``(ticker_id, start, open, high, low, close,
+    volume)`` bars and rebuild the 5m, 15m, 1h and daily bars they fall in.
+    Returns the daily bars written.
+    """
+    if not bars:
+        return []
+    with transaction.atomic():
+        _upsert(BASE, bars)
+        for child, parent in ROLLUPS:
+            bars = _rollup(child, parent, bars)
+            _upsert(parent, bars)
+        daily = _rollup_days(bars)
+        ingest.upsert(daily)
+    if pricestore.is_enabled():
+        for bar in daily:
+            # Immediate unless record() runs inside an outer transaction
+            transaction.on_commit(partial(
+                pricestore.upsert_bar, PriceBar(**dict(zip(['ticker_id', *ingest.BAR_FIELDS[1:]], bar))),
+            ))
+    return daily
+
+
+def pick(ticker_id, since, points):
+    """
+    Coarsest intraday resolution with at least ``points`` bars since
+    ``since``, else the finest one with any; None when there are no bars.
+    """
+    finest = None
+    for resolution in reversed(RESOLUTIONS):
+        # A sliced count stops reading the index once it has enough rows
+        count = IntradayBar.objects.filter(
+            ticker_id=ticker_id, resolution=resolution, start__gte=since,
+        )[:points].count()
+        if count >= points:
+            return resolution
+        if count:
+            finest = resolution
+    return finest
+
+
+def read(ticker_id, resolution, since):
+    """``resolution`` bars since ``since`` as (epoch seconds, open, high, low, close, volume), oldest first"""
+    rows = IntradayBar.objects.filter(
+        ticker_id=ticker_id, resolution=resolution, start__gte=since,
+    ).order_by('start').values_list('start', 'open', 'high', 'low', 'close', 'volume')
+    return [
+        (int(start.timestamp()), float(o), float(h), float(l), float(c), v)
+        for start, o, h, l, c, v in rows
+    ]
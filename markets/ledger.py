@@ -0,0 +1,167 @@
+"""
+Position ledger.
+
+Positions are kept in step with FILLED orders so the portfolio pages can read
+holdings in one query instead of replaying every order on each request.
+"""
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, Count, F, Sum, Value, When
+from django.db.models.functions import Coalesce
+
+from .models import Order, Position
+
+CENT = Decimal('0.01')
+AVG_COST_PLACES = Decimal('0.0001')
+# When an order filled. Order.save stamps filled_at, but bulk_create and
+# queryset updates can leave it NULL, so fall back to when it was placed
+FILLED_AT = Coalesce('filled_at', 'created_at')
+
+
+def apply_fill(position, order_type, quantity, price):
+    """Apply one fill to ``position`` in memory and return the realized P&L"""
+    price = Decimal(str(price))
+    realized = Decimal('0')
+
+    if order_type == 'BUY':
+        position.shares += quantity
+        position.total_cost = (Decimal(position.total_cost) + price * quantity).quantize(CENT)
+        position.avg_cost = (position.total_cost / position.shares).quantize(AVG_COST_PLACES)
+    else:
+        avg_cost = Decimal(position.avg_cost)
+        realized = ((price - avg_cost) * quantity).quantize(CENT)
+        position.realized_pnl = Decimal(position.realized_pnl) + realized
+        position.shares -= quantity
+        if position.shares > 0:
+            position.total_cost = (avg_cost * position.shares).quantize(CENT)
+        else:
+            position.shares = 0
+            position.total_cost = Decimal('0')
+            position.avg_cost = Decimal('0')
+
+    position.trades += 1
+    return realized
+
+
+def order_totals(user, ticker):
+    """
+    Net shares and fill count of the FILLED orders in one SQL aggregate.
+    Average cost is not a sum: each sell realizes against the average of the
+    buys before it, so that still needs ``replay`` in fill order.
+    """
+    sign = Case(When(order_type='SELL', then=Value(-1)), default=Value(1))
+    totals = Order.objects.filter(user=user, ticker=ticker, status='FILLED').aggregate(
+        shares=Sum(sign * F('quantity')),
+        fills=Count('id'),
+    )
+    # SUM over no rows is NULL
+    return {'shares': totals['shares'] or 0, 'fills': totals['fills']}
+
+
+def _replay_into(position):
+    rows = _filled_orders().filter(user_id=position.user_id, ticker_id=position.ticker_id).values_list(
+        'user_id', 'ticker_id', 'order_type', 'quantity', 'price'
+    )
+    rebuilt = replay(rows).get((position.user_id, position.ticker_id)) or Position()
+    for field in ('shares', 'total_cost', 'avg_cost', 'realized_pnl', 'trades'):
+        setattr(position, field, getattr(rebuilt, field))
+
+
+def lock_position(user, ticker):
+    """
+    Fetch (or create) the position row for update; call inside a transaction.
+    The row lock serializes orders on the same holding, and the share count
+    is checked against the order history under it, so orders written around
+    the ledger (e.g. by the seed commands) cannot let a sell through. On
+    return ``position.shares`` equals the aggregate's net shares.
+    """
+    position, _ = Position.objects.select_for_update().get_or_create(user=user, ticker=ticker)
+    totals = order_totals(user, ticker)
+    if (totals['shares'], totals['fills']) != (position.shares, position.trades):
+        _replay_into(position)
+        position.save()
+    return position
+
+
+def book_order(position, order):
+    """Apply a freshly filled order to its locked position and save it"""
+    realized = apply_fill(position, order.order_type, order.quantity, order.price)
+    position.save()
+    return realized
+
+
+class InsufficientShares(ValueError):
+    pass
+
+
+def fill_order(user, ticker, side, quantity, **fields):
+    """
+    Fill an order at the ticker's current price and book it, in one
+    transaction. Returns ``(order, realized P&L)``; a SELL larger than the
+    position raises ``InsufficientShares``. ``fields`` are extra Order fields,
+    e.g. the kind and limit price of a marketable limit order.
+    """
+    with transaction.atomic():
+        # Lock the position so concurrent orders see a consistent share count
+        position = lock_position(user, ticker)
+        if side == 'SELL' and quantity > position.shares:
+            raise InsufficientShares(f'Cannot sell {quantity} shares. Current position: {position.shares}')
+
+        order = Order.objects.create(
+            user=user,
+            ticker=ticker,
+            order_type=side,
+            quantity=quantity,
+            price=ticker.price,
+            status='FILLED',
+            **fields,
+        )
+        return order, book_order(position, order)
+
+
+def _filled_orders():
+    return Order.objects.filter(status='FILLED').order_by('user_id', 'ticker_id', FILLED_AT, 'id')
+
+
+def replay(rows):
+    """
+    Build unsaved positions from ``(user_id, ticker_id, order_type, quantity, price)``
+    rows sorted by user, ticker and fill time.
+    """
+    positions = {}
+    for user_id, ticker_id, order_type, quantity, price in rows:
+        key = (user_id, ticker_id)
+        if key not in positions:
+            positions[key] = Position(user_id=user_id, ticker_id=ticker_id)
+        apply_fill(positions[key], order_type, quantity, price)
+    return positions
+
+
+def rebuild_position(user, ticker):
+    """Recompute one position from its order history"""
+    with transaction.atomic():
+        position, _ = Position.objects.select_for_update().get_or_create(user=user, ticker=ticker)
+        _replay_into(position)
+        if not position.trades:
+            position.delete()
+            return None
+        position.save()
+        return position
+
+
+def rebuild_positions(user_ids=None, batch_size=1000):
+    """Recreate positions from the full FILLED order history; returns the count"""
+    orders = _filled_orders()
+    existing = Position.objects.all()
+    if user_ids is not None:
+        orders = orders.filter(user_id__in=user_ids)
+        existing = existing.filter(user_id__in=user_ids)
+
+    rows = orders.values_list('user_id', 'ticker_id', 'order_type', 'quantity', 'price')
+    positions = replay(rows.iterator(chunk_size=batch_size))
+
+    with transaction.atomic():
+        existing.delete()
+        Position.objects.bulk_create(positions.values(), batch_size=batch_size)
+    return len(positions)
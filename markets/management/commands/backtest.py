@@ -0,0 +1,69 @@
+import json
+import time
+from datetime import date
+from django.core.management.base import BaseCommand, CommandError
+from markets.backtest import run_backtest
+from markets.models import Ticker, TradingStrategy
+
+class Command(BaseCommand):
+    help = 'Backtest a TradingStrategy over a universe of tickers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('strategy_id', type=int)
+        parser.add_argument('--symbols', nargs='*', help='Universe to trade (default: all non-index tickers)')
+        parser.add_argument('--start', type=date.fromisoformat)
+        parser.add_argument('--end', type=date.fromisoformat)
+        parser.add_argument('--capital', type=float, default=100000.0)
+        parser.add_argument('--slippage-bps', type=float, default=0.0)
+        parser.add_argument('--commission', type=float, default=0.0, help='Flat fee per order')
+        parser.add_argument('--commission-bps', type=float, default=0.0)
+        parser.add_argument('--sizing', choices=['percent', 'amount', 'shares'])
+        parser.add_argument('--size', type=float, help='Value for the sizing method')
+        parser.add_argument('--workers', type=int, help='Process pool size (default: CPU count)')
+        parser.add_argument('--output', help='Write the full result as JSON to this file')
+
+    def handle(self, *args, **options):
+        try:
+            strategy = TradingStrategy.objects.get(id=options['strategy_id'])
+        except TradingStrategy.DoesNotExist:
+            raise CommandError(f'Strategy {options["strategy_id"]} does not exist')
+
+        tickers = Ticker.objects.filter(is_index=False)
+        if options['symbols']:
+            tickers = Ticker.objects.filter(symbol__in=options['symbols'])
+
+        sizing = {}
+        if options['sizing']:
+            sizing['method'] = options['sizing']
+        if options['size'] is not None:
+            sizing['value'] = options['size']
+
+        started = time.perf_counter()
+        try:
+            result = run_backtest(
+                strategy.criteria,
+                list(tickers),
+                start=options['start'],
+                end=options['end'],
+                capital=options['capital'],
+                slippage_bps=options['slippage_bps'],
+                commission=options['commission'],
+                commission_bps=options['commission_bps'],
+                sizing=sizing,
+                workers=options['workers'],
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+        elapsed = time.perf_counter() - started
+
+        for key, value in result['stats'].items():
+            self.stdout.write(f'{key:>18}: {value}')
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(result, f, indent=2)
+            self.stdout.write(f'Wrote results to {options["output"]}')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Backtested {strategy.name} on {len(result["symbols"])} tickers in {elapsed:.2f}s'
+        ))
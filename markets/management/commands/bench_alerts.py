@@ -0,0 +1,49 @@
+import time
+import numpy as np
+from django.core.management.base import BaseCommand
+from markets.alerts import ABOVE, BELOW, AlertBook
+
+class Command(BaseCommand):
+    help = 'Time alert evaluation for full-market ticks against a synthetic in-memory alert book'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--alerts', type=int, default=1_000_000)
+        parser.add_argument('--tickers', type=int, default=5000)
+        parser.add_argument('--ticks', type=int, default=50)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(options['seed'])
+        n_alerts, n_tickers = options['alerts'], options['tickers']
+
+        prices = rng.uniform(50, 5000, n_tickers).round(2)
+        ticker_ids = np.arange(1, n_tickers + 1)
+        alert_tickers = rng.integers(0, n_tickers, n_alerts)
+        above = rng.random(n_alerts) < 0.5
+        # Targets within +/-20% of the current price, on the side that has not fired yet
+        distance = rng.uniform(0.001, 0.2, n_alerts)
+        targets = (prices[alert_tickers] * np.where(above, 1 + distance, 1 - distance)).round(2)
+        rows = zip(
+            range(1, n_alerts + 1), ticker_ids[alert_tickers].tolist(),
+            np.where(above, ABOVE, BELOW).tolist(), targets.tolist(),
+        )
+
+        started = time.perf_counter()
+        book = AlertBook()
+        book.load(rows)
+        self.stdout.write(f'Loaded {len(book)} alerts on {n_tickers} tickers in {time.perf_counter() - started:.2f}s')
+
+        timings, fired = [], 0
+        for _ in range(options['ticks']):
+            # A random walk of up to ~1% per tick across the whole market
+            prices = (prices * (1 + rng.normal(0, 0.005, n_tickers))).round(2)
+            started = time.perf_counter()
+            fired += len(book.evaluate(ticker_ids, prices))
+            timings.append(time.perf_counter() - started)
+
+        timings = np.array(timings) * 1000
+        self.stdout.write(
+            f'{options["ticks"]} ticks: median {np.median(timings):.2f}ms, '
+            f'p99 {np.percentile(timings, 99):.2f}ms, max {timings.max():.2f}ms; '
+            f'{fired} alerts fired, {len(book)} still active'
+        )
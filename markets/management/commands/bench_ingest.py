@@ -0,0 +1,56 @@
+import csv
+import os
+import tempfile
+from datetime import date
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from markets import ingest
+from markets.models import Ticker
+
+PREFIX = 'ZZINGEST'
+
+class Command(BaseCommand):
+    help = 'Time import_bars on a synthetic CSV, first into an empty table and then over the same bars'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tickers', type=int, default=500)
+        parser.add_argument('--days', type=int, default=2000)
+        parser.add_argument('--chunk-size', type=int, default=50000)
+
+    def handle(self, *args, **options):
+        tickers, days = options['tickers'], options['days']
+
+        # Everything below runs against throwaway tickers and is rolled back
+        with tempfile.TemporaryDirectory() as root, transaction.atomic():
+            Ticker.objects.bulk_create([
+                Ticker(symbol=f'{PREFIX}{i}', name=f'Ingest Benchmark {i}', exchange='BENCH', sector='Benchmark')
+                for i in range(tickers)
+            ])
+            path = os.path.join(root, 'bars.csv')
+            self._write(path, tickers, days)
+            self.stdout.write(f'{tickers * days} rows, {tickers} tickers x {days} days')
+
+            for label in ('insert', 'overwrite'):
+                stats = ingest.import_file(path, chunk_size=options['chunk_size'], resume=False)
+                rate = stats['rows'] / stats['seconds']
+                self.stdout.write(f'{label:>10} {stats["seconds"]:>8.2f}s {rate:>12,.0f} rows/s')
+
+            transaction.set_rollback(True)
+
+    def _write(self, path, tickers, days):
+        rng = np.random.default_rng(0)
+        dates = (np.datetime64(date(2000, 1, 3)) + np.arange(days)).astype(str)
+        with open(path, 'w', newline='') as fh:
+            writer = csv.writer(fh)
+            writer.writerow(ingest.COLUMNS)
+            for i in range(tickers):
+                closes = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, days)))
+                opens = np.concatenate([[100.0], closes[:-1]])
+                highs = np.maximum(opens, closes) * 1.005
+                lows = np.minimum(opens, closes) * 0.995
+                writer.writerows(zip(
+                    [f'{PREFIX}{i}'] * days, dates,
+                    *(np.char.mod('%.2f', values) for values in (opens, highs, lows, closes)),
+                    rng.integers(1000, 1000000, days).tolist(),
+                ))
@@ -0,0 +1,66 @@
+import time
+import numpy as np
+from django.core.management.base import BaseCommand
+from markets.matching import BUY, LIMIT, SELL, STOP, OrderBook
+
+class Command(BaseCommand):
+    help = 'Replay a synthetic stream of order adds, cancels and price ticks through an in-memory order book'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--events', type=int, default=1_000_000)
+        parser.add_argument('--tickers', type=int, default=500)
+        parser.add_argument('--cancel-ratio', type=float, default=0.25, help='Share of events that cancel a resting order')
+        parser.add_argument('--tick-ratio', type=float, default=0.15, help='Share of events that are price updates')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(options['seed'])
+        n_events, n_tickers = options['events'], options['tickers']
+
+        # Draw every random number up front so the timed loop only drives the book
+        roll = rng.random(n_events)
+        tickers = rng.integers(1, n_tickers + 1, n_events).tolist()
+        buy = (rng.random(n_events) < 0.5).tolist()
+        stop = (rng.random(n_events) < 0.3).tolist()
+        offsets = rng.uniform(0.001, 0.05, n_events)
+        moves = rng.normal(0, 0.01, n_events)
+        picks = rng.random(n_events).tolist()
+        tick_ratio, cancel_ratio = options['tick_ratio'], options['cancel_ratio']
+        kinds = np.where(roll < tick_ratio, 0, np.where(roll < tick_ratio + cancel_ratio, 1, 2)).tolist()
+        prices = rng.uniform(50, 5000, n_tickers + 1)
+
+        events = []
+        for i, kind in enumerate(kinds):
+            ticker_id = tickers[i]
+            if kind == 0:
+                prices[ticker_id] *= 1 + moves[i]
+                events.append((0, ticker_id, round(float(prices[ticker_id]), 2)))
+            elif kind == 1:
+                events.append((1, picks[i], None))
+            else:
+                side = BUY if buy[i] else SELL
+                # Resting orders sit on the side that has not crossed yet
+                below = (side == BUY) != stop[i]
+                trigger = float(prices[ticker_id]) * (1 - offsets[i] if below else 1 + offsets[i])
+                events.append((2, (ticker_id, side, STOP if stop[i] else LIMIT), round(trigger, 2)))
+
+        book = OrderBook()
+        order_ids, next_id, fills = [], 1, 0
+        started = time.perf_counter()
+        for kind, subject, value in events:
+            if kind == 0:
+                fills += len(book.match(subject, value))
+            elif kind == 1:
+                if order_ids:
+                    book.cancel(order_ids[int(subject * len(order_ids))])
+            else:
+                ticker_id, side, order_kind = subject
+                book.add(next_id, ticker_id, side, order_kind, value)
+                order_ids.append(next_id)
+                next_id += 1
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(
+            f'{n_events} events on {n_tickers} tickers in {elapsed:.2f}s: {n_events / elapsed:,.0f} events/s; '
+            f'{next_id - 1} orders added, {fills} filled, {len(book)} still resting'
+        )
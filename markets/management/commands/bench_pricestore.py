@@ -0,0 +1,82 @@
+import random
+import tempfile
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test.utils import override_settings
+from markets import pricestore
+from markets.models import Ticker, PriceBar
+
+RANGES = (('1y', 1), ('5y', 5), ('20y', 20))
+
+class Command(BaseCommand):
+    help = 'Compare ORM and columnar store reads of PriceBar history for 1y/5y/20y ranges'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        repeat = options['repeat']
+
+        # Everything below runs against a throwaway ticker and is rolled back
+        with tempfile.TemporaryDirectory() as root, override_settings(PRICE_STORE_DIR=root):
+            with transaction.atomic():
+                ticker = self._seed(years=max(years for _, years in RANGES))
+                pricestore.rebuild(ticker.id)
+                last = PriceBar.objects.filter(ticker=ticker).latest('date').date
+
+                self.stdout.write(f'{"range":>6} {"bars":>6} {"orm objects":>12} {"orm values":>12} {"columnar":>12}')
+                for label, years in RANGES:
+                    start = last - timedelta(days=365 * years)
+                    bars = PriceBar.objects.filter(ticker=ticker, date__gte=start)
+
+                    timings = [
+                        self._time(repeat, lambda: [
+                            (b.date.isoformat(), float(b.open), float(b.high),
+                             float(b.low), float(b.close), b.volume)
+                            for b in bars.all()
+                        ]),
+                        self._time(repeat, lambda: [
+                            (d.isoformat(), float(o), float(h), float(l), float(c), v)
+                            for d, o, h, l, c, v in bars.values_list(*pricestore.FIELDS)
+                        ]),
+                        self._time(repeat, lambda: pricestore.read(ticker.id, start=start).rows()),
+                    ]
+                    count = bars.count()
+                    self.stdout.write(f'{label:>6} {count:>6} ' + ' '.join(f'{t * 1000:>10.2f}ms' for t in timings))
+
+                transaction.set_rollback(True)
+
+    def _time(self, repeat, fn):
+        best = float('inf')
+        for _ in range(repeat):
+            started = time.perf_counter()
+            fn()
+            best = min(best, time.perf_counter() - started)
+        return best
+
+    def _seed(self, years):
+        ticker = Ticker.objects.create(
+            symbol='ZZBENCH', name='Benchmark Ticker', exchange='BENCH', sector='Benchmark'
+        )
+        day = date.today() - timedelta(days=365 * years)
+        close = 100.0
+        bars = []
+        while day <= date.today():
+            if day.weekday() < 5:
+                open_price = close
+                close = max(1.0, close * (1 + random.gauss(0, 0.01)))
+                bars.append(PriceBar(
+                    ticker=ticker,
+                    date=day,
+                    open=Decimal(f'{open_price:.2f}'),
+                    high=Decimal(f'{max(open_price, close) * 1.005:.2f}'),
+                    low=Decimal(f'{min(open_price, close) * 0.995:.2f}'),
+                    close=Decimal(f'{close:.2f}'),
+                    volume=random.randint(100000, 1000000),
+                ))
+            day += timedelta(days=1)
+        PriceBar.objects.bulk_create(bars, batch_size=5000)
+        return ticker
@@ -0,0 +1,75 @@
+import asyncio
+import random
+import time
+import tracemalloc
+from django.core.management.base import BaseCommand
+from markets import realtime
+
+class Command(BaseCommand):
+    help = 'Time fanning Ticker deltas out to simulated WebSocket subscribers in one worker process'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--subscribers', type=int, default=10000)
+        parser.add_argument('--symbols', type=int, default=500, help='Size of the symbol universe')
+        parser.add_argument('--follow', type=int, default=20, help='Symbols each subscriber follows')
+        parser.add_argument('--moving', type=int, default=100, help='Symbols that change on each tick')
+        parser.add_argument('--ticks', type=int, default=10)
+
+    def handle(self, *args, **options):
+        asyncio.run(self._run(**{key: options[key] for key in ('subscribers', 'symbols', 'follow', 'moving', 'ticks')}))
+
+    async def _run(self, subscribers, symbols, follow, moving, ticks):
+        rng = random.Random(0)
+        universe = [f'SYM{i}' for i in range(symbols)]
+        broker = realtime.LocalBroker()
+        sent = {'frames': 0, 'bytes': 0}
+        done = asyncio.Event()
+        expected = 0
+
+        async def send(message):
+            sent['frames'] += 1
+            sent['bytes'] += len(message['text'])
+            if sent['frames'] >= expected:
+                done.set()
+
+        # Each connection is a Subscriber and its pump task, as in ticker_socket
+        tracemalloc.start()
+        pumps = []
+        for _ in range(subscribers):
+            subscriber = realtime.Subscriber()
+            broker.subscribe(subscriber, rng.sample(universe, min(follow, symbols)))
+            pumps.append(asyncio.create_task(realtime._pump(subscriber, send)))
+        await asyncio.sleep(0)
+        memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        self.stdout.write(
+            f'{subscribers} subscribers following {follow} of {symbols} symbols: '
+            f'{memory / 2 ** 20:.1f} MB ({memory / max(subscribers, 1) / 1024:.1f} KB each)'
+        )
+
+        timings = []
+        for tick in range(ticks):
+            deltas = {
+                symbol: {'price': round(rng.uniform(10, 1000), 2), 'volume': tick}
+                for symbol in rng.sample(universe, min(moving, symbols))
+            }
+            expected = sum(1 for subscriber in broker.subscribers if subscriber.symbols & deltas.keys())
+            sent['frames'] = sent['bytes'] = 0
+            done.clear()
+            started = time.perf_counter()
+            broker.publish(deltas)
+            if expected:
+                await done.wait()
+            timings.append(time.perf_counter() - started)
+            self.stdout.write(
+                f'  tick {tick + 1}: {len(deltas)} symbols to {expected} subscribers in '
+                f'{timings[-1] * 1000:.0f}ms ({sent["bytes"] / 2 ** 20:.1f} MB of frames)'
+            )
+
+        for pump in pumps:
+            pump.cancel()
+        await asyncio.gather(*pumps, return_exceptions=True)
+        if timings:
+            self.stdout.write(self.style.SUCCESS(
+                f'Fan-out: median {sorted(timings)[len(timings) // 2] * 1000:.0f}ms, max {max(timings) * 1000:.0f}ms per tick'
+            ))
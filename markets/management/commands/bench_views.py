@@ -0,0 +1,80 @@
+import json
+import platform
+import subprocess
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.utils import timezone
+from markets import benchmarks
+
+class Command(BaseCommand):
+    help = 'Measure latency and query counts of the markets pages and APIs on seeded datasets and record them as JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scales', nargs='+', choices=list(benchmarks.SCALES), default=['small'])
+        parser.add_argument('--endpoints', nargs='+', choices=list(benchmarks.ENDPOINTS), help='Only measure these')
+        parser.add_argument('--repeat', type=int, default=10, help='Warm requests per endpoint')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='Write the results to this JSON file')
+        parser.add_argument('--baseline', help='Earlier --output file to compare against')
+        parser.add_argument('--tolerance', type=float, default=0.25,
+                            help='Allowed growth of warm p50 latency over the baseline before it counts as a regression')
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options['baseline']:
+            try:
+                with open(options['baseline']) as fh:
+                    baseline = json.load(fh)
+            except (OSError, ValueError) as exc:
+                raise CommandError(f'Cannot read baseline: {exc}')
+
+        results = {
+            'recorded_at': timezone.now().isoformat(),
+            'commit': self._commit(),
+            'backend': connection.vendor,
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'repeat': options['repeat'],
+            'scales': {},
+        }
+        # Lets the test client through ALLOWED_HOSTS and records rendered templates, as under the test runner
+        setup_test_environment()
+        try:
+            for scale in options['scales']:
+                self.stdout.write(f'{scale}: seeding {benchmarks.SCALES[scale]}')
+                self.stdout.write(f'  {"endpoint":<16} {"status":>6} {"cold":>10} {"p50":>10} {"p95":>10} {"queries":>8}')
+                results['scales'][scale] = benchmarks.run_suite(
+                    scale, repeat=options['repeat'], endpoints=options['endpoints'], seed=options['seed'],
+                    progress=self._progress,
+                )
+        finally:
+            teardown_test_environment()
+
+        if options['output']:
+            with open(options['output'], 'w') as fh:
+                json.dump(results, fh, indent=2)
+            self.stdout.write(f'Wrote {options["output"]}')
+
+        if baseline is not None:
+            regressions = benchmarks.compare(results, baseline, options['tolerance'])
+            for scale, name, field, before, after in regressions:
+                self.stdout.write(self.style.WARNING(f'{scale} {name}: {field} {before} -> {after}'))
+            if regressions:
+                raise CommandError(f'{len(regressions)} regressions against {options["baseline"]}')
+            self.stdout.write(self.style.SUCCESS(f'No regressions against {options["baseline"]}'))
+
+    def _progress(self, name, result):
+        self.stdout.write(
+            f'  {name:<16} {result["status"]:>6} {result["cold_ms"]:>8.1f}ms '
+            f'{result.get("p50_ms", 0):>8.1f}ms {result.get("p95_ms", 0):>8.1f}ms {result["queries"]:>8}'
+        )
+
+    def _commit(self):
+        try:
+            return subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
@@ -0,0 +1,28 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from markets import pricestore
+from markets.models import Ticker
+
+class Command(BaseCommand):
+    help = 'Rebuild the columnar PriceBar store from the database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('symbols', nargs='*', help='Only rebuild these symbols')
+
+    def handle(self, *args, **options):
+        if not pricestore.is_enabled():
+            raise CommandError('PRICE_STORE_DIR is not set')
+
+        tickers = Ticker.objects.all()
+        if options['symbols']:
+            tickers = tickers.filter(symbol__in=options['symbols'])
+
+        total = 0
+        for ticker_id, symbol in tickers.values_list('id', 'symbol'):
+            count = pricestore.rebuild(ticker_id)
+            total += count
+            self.stdout.write(f'{symbol}: {count} bars')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Wrote {total} bars to {settings.PRICE_STORE_DIR}'
+        ))
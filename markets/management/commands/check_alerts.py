@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from markets import alerts
+from markets.models import Ticker
+
+class Command(BaseCommand):
+    help = 'Evaluate active price alerts against current ticker prices and stamp the ones that fired'
+
+    def handle(self, *args, **options):
+        ticker_ids, prices = [], []
+        for ticker_id, price in Ticker.objects.values_list('id', 'price').iterator(chunk_size=5000):
+            ticker_ids.append(ticker_id)
+            prices.append(price)
+
+        fired = alerts.process_tick(ticker_ids, prices)
+        self.stdout.write(self.style.SUCCESS(f'{len(fired)} price alerts triggered'))
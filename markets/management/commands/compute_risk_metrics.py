@@ -0,0 +1,30 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from markets import risk
+from markets.models import Ticker
+
+class Command(BaseCommand):
+    help = 'Materialize beta, volatility, Sharpe and max drawdown for every ticker (run nightly)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--benchmark', default=settings.RISK_BENCHMARK_SYMBOL,
+                            help='Symbol of the index ticker to measure against')
+        parser.add_argument('--lookback', type=int, default=risk.TRADING_DAYS,
+                            help='Number of sessions of history to use')
+        parser.add_argument('--risk-free-rate', type=float, default=settings.RISK_FREE_RATE,
+                            help='Annual risk-free rate as a fraction, e.g. 0.065')
+
+    def handle(self, *args, **options):
+        try:
+            benchmark = Ticker.objects.get(symbol=options['benchmark'], is_index=True)
+        except Ticker.DoesNotExist:
+            raise CommandError(f'No index ticker named {options["benchmark"]}')
+
+        count = risk.materialize(
+            benchmark,
+            lookback=options['lookback'],
+            risk_free_rate=options['risk_free_rate'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Computed risk metrics for {count} tickers against {benchmark.symbol}'
+        ))
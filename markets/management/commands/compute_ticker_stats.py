@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from markets import screener
+from markets.models import Ticker
+
+class Command(BaseCommand):
+    help = 'Recompute RSI, 52-week range, average volume and market cap for the screener (run after prices update)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('symbols', nargs='*', help='Only these symbols')
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Tickers loaded per batch')
+
+    def handle(self, *args, **options):
+        tickers = Ticker.objects.all()
+        if options['symbols']:
+            tickers = tickers.filter(symbol__in=options['symbols'])
+
+        count = screener.compute_stats(tickers, chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f'Computed screener stats for {count} tickers'))
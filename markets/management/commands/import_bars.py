@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand, CommandError
+from markets import ingest, pricestore
+
+class Command(BaseCommand):
+    help = 'Bulk import daily OHLCV bars from CSV or Parquet files into PriceBar'
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='+', help='CSV or Parquet files with symbol,date,open,high,low,close,volume columns')
+        parser.add_argument('--chunk-size', type=int, default=50000, help='Rows per transaction')
+        parser.add_argument('--restart', action='store_true', help='Ignore any checkpoint and import from the first row')
+        parser.add_argument('--strict', action='store_true', help='Abort on the first invalid row instead of skipping it')
+
+    def handle(self, *args, **options):
+        touched = set()
+        for path in options['paths']:
+            try:
+                stats = ingest.import_file(
+                    path,
+                    chunk_size=options['chunk_size'],
+                    resume=not options['restart'],
+                    strict=options['strict'],
+                    progress=self._progress,
+                )
+            except (OSError, ingest.IngestError) as exc:
+                raise CommandError(str(exc))
+            touched |= stats['ticker_ids']
+
+            if stats['skipped']:
+                self.stdout.write(f'{path}: resumed after {stats["skipped"]} rows')
+            for line, message in stats['errors'][:10]:
+                self.stderr.write(f'{path}: row {line}: {message}')
+            if len(stats['errors']) > 10:
+                self.stderr.write(f'{path}: ... {len(stats["errors"]) - 10} more invalid rows')
+
+            rate = stats['rows'] / stats['seconds'] if stats['seconds'] else 0
+            self.stdout.write(self.style.SUCCESS(
+                f'{path}: {stats["bars"]} bars from {stats["rows"]} rows, '
+                f'{len(stats["errors"])} rejected, {stats["seconds"]:.1f}s ({rate:,.0f} rows/s)'
+            ))
+
+        if pricestore.is_enabled():
+            for ticker_id in touched:
+                pricestore.rebuild(ticker_id)
+            self.stdout.write(f'Rebuilt price store for {len(touched)} tickers')
+
+    def _progress(self, stats):
+        rate = stats['rows'] / stats['seconds'] if stats['seconds'] else 0
+        self.stdout.write(f'  {stats["skipped"] + stats["rows"]} rows ({rate:,.0f} rows/s)')
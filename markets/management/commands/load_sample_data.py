@@ -45,6 +45,8 @@ class Command(BaseCommand):
             base_price = random.uniform(20, 500)
             change = random.uniform(-10, 10)
             change_pct = (change / base_price) * 100
+            # Spans the screener's small, mid and large market-cap buckets
+            shares_outstanding = None if stock_data.get('is_index') else random.randint(10 ** 8, 10 ** 10)
             
             ticker, created = Ticker.objects.get_or_create(
                 symbol=stock_data['symbol'],
@@ -56,7 +58,8 @@ class Command(BaseCommand):
                     'change': Decimal(str(round(change, 2))),
                     'change_pct': Decimal(str(round(change_pct, 2))),
                     'volume': random.randint(1000000, 100000000),
-                    'is_index': stock_data.get('is_index', False)
+                    'is_index': stock_data.get('is_index', False),
+                    'shares_outstanding': shares_outstanding,
                 }
             )
             
@@ -70,6 +73,8 @@ class Command(BaseCommand):
                 ticker.change = Decimal(str(round(change, 2)))
                 ticker.change_pct = Decimal(str(round(change_pct, 2)))
                 ticker.volume = random.randint(1000000, 100000000)
+                if ticker.shares_outstanding is None:
+                    ticker.shares_outstanding = shares_outstanding
                 ticker.save()
                 self.stdout.write(
                     self.style.WARNING(f'Updated existing {ticker.symbol}')
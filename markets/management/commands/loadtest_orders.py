@@ -0,0 +1,86 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+import numpy as np
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, connection
+from markets import ledger
+from markets.models import Ticker
+
+PREFIX = 'loadtest'
+
+class Command(BaseCommand):
+    help = 'Measure order-placement throughput with concurrent writers against the configured database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, nargs='+', default=[1, 4, 16],
+                            help='Concurrent writer counts to try in turn')
+        parser.add_argument('--orders', type=int, default=200, help='Orders per worker')
+        parser.add_argument('--contended', action='store_true',
+                            help='All workers trade one shared position instead of one each')
+        parser.add_argument('--keep', action='store_true', help='Leave the load-test users and ticker behind')
+
+    def handle(self, *args, **options):
+        vendor = connection.vendor
+        settings_dict = connection.settings_dict
+        self.stdout.write(
+            f'Backend: {vendor} ({settings_dict["NAME"]}), '
+            f'CONN_MAX_AGE={settings_dict["CONN_MAX_AGE"]}, pool={bool(settings_dict["OPTIONS"].get("pool"))}'
+        )
+
+        ticker, _ = Ticker.objects.get_or_create(
+            symbol='ZZLOAD', defaults={'name': 'Load Test', 'exchange': 'TEST', 'sector': 'Test', 'price': Decimal('100.00')},
+        )
+        users = [
+            User.objects.get_or_create(username=f'{PREFIX}{i}')[0]
+            for i in range(1 if options['contended'] else max(options['workers']))
+        ]
+
+        try:
+            self.stdout.write(f'{"workers":>8} {"orders":>8} {"errors":>7} {"orders/s":>10} {"p50":>9} {"p99":>9}')
+            for workers in options['workers']:
+                self._run(workers, options['orders'], ticker, users)
+        finally:
+            if not options['keep']:
+                # Cascades to the orders and positions written above
+                User.objects.filter(id__in=[user.id for user in users]).delete()
+                ticker.delete()
+
+    def _run(self, workers, orders, ticker, users):
+        barrier = threading.Barrier(workers)
+
+        def writer(index):
+            user = users[index % len(users)]
+            latencies, errors = [], 0
+            try:
+                barrier.wait()
+                for i in range(orders):
+                    # Two buys for every sell keeps the position long
+                    side = 'SELL' if i % 3 == 2 else 'BUY'
+                    started = time.perf_counter()
+                    try:
+                        ledger.fill_order(user, ticker, side, 1)
+                    except (DatabaseError, ledger.InsufficientShares):
+                        errors += 1
+                        continue
+                    latencies.append(time.perf_counter() - started)
+            finally:
+                connection.close()
+            return latencies, errors
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(workers) as pool:
+            results = list(pool.map(writer, range(workers)))
+        elapsed = time.perf_counter() - started
+
+        latencies = np.array([t for result, _ in results for t in result]) * 1000
+        errors = sum(errors for _, errors in results)
+        if not len(latencies):
+            self.stdout.write(f'{workers:>8} {0:>8} {errors:>7} {"-":>10}')
+            return
+        self.stdout.write(
+            f'{workers:>8} {len(latencies):>8} {errors:>7} {len(latencies) / elapsed:>10.1f} '
+            f'{np.percentile(latencies, 50):>7.2f}ms {np.percentile(latencies, 99):>7.2f}ms'
+        )
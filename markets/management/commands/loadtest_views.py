@@ -0,0 +1,52 @@
+import json
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from markets import benchmarks
+from markets.models import Ticker
+
+class Command(BaseCommand):
+    help = 'Drive concurrent virtual users through the markets pages and APIs of a running server'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000', help='Base URL of the server, e.g. runserver')
+        parser.add_argument('--users', type=int, default=10, help='Concurrent virtual users')
+        parser.add_argument('--duration', type=float, default=30, help='Seconds to run')
+        parser.add_argument('--spawn-rate', type=float, default=5, help='Virtual users started per second')
+        parser.add_argument('--think-time', type=float, default=0.5, help='Longest pause between requests, in seconds')
+        parser.add_argument('--username', default='loadtest-views', help='Account the virtual users browse as')
+        parser.add_argument('--output', help='Write the results to this JSON file')
+
+    def handle(self, *args, **options):
+        if options['users'] < 1 or options['duration'] <= 0:
+            raise CommandError('--users and --duration must be positive')
+        symbols = list(Ticker.objects.order_by('symbol').values_list('symbol', flat=True)[:50])
+        if not symbols:
+            raise CommandError('No tickers to browse; seed some first, e.g. with generate_market')
+
+        # The server must share this database so it accepts the session
+        user, _ = User.objects.get_or_create(username=options['username'])
+        self.stdout.write(
+            f'{options["users"]} users against {options["url"]} for {options["duration"]:.0f}s '
+            f'as {user.username}, across {len(symbols)} symbols'
+        )
+        result = benchmarks.load_test(
+            options['url'], benchmarks.session_cookie(user), symbols,
+            users=options['users'], duration=options['duration'],
+            spawn_rate=options['spawn_rate'], think_time=options['think_time'],
+        )
+
+        self.stdout.write(f'{"endpoint":<16} {"requests":>8} {"errors":>7} {"p50":>10} {"p95":>10} {"p99":>10}')
+        for name, stats in [*result['endpoints'].items(), ('total', result['total'])]:
+            if not stats['count']:
+                self.stdout.write(f'{name:<16} {0:>8} {stats["errors"]:>7}')
+                continue
+            self.stdout.write(
+                f'{name:<16} {stats["count"]:>8} {stats["errors"]:>7} {stats["p50_ms"]:>8.1f}ms '
+                f'{stats["p95_ms"]:>8.1f}ms {stats["p99_ms"]:>8.1f}ms'
+            )
+        self.stdout.write(self.style.SUCCESS(f'{result["total"]["rps"]:.1f} requests/s over {result["duration"]:.1f}s'))
+
+        if options['output']:
+            with open(options['output'], 'w') as fh:
+                json.dump(result, fh, indent=2)
+            self.stdout.write(f'Wrote {options["output"]}')
@@ -0,0 +1,69 @@
+from django.core.management.base import BaseCommand, CommandError
+from markets import pricefeed
+
+class Command(BaseCommand):
+    help = 'Consume price ticks and write coalesced Ticker updates and minute bars with their rollups on a fixed cadence'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--source', choices=['replay', 'synthetic', 'socket'], default='synthetic')
+        parser.add_argument('--file', help='timestamp,symbol,price,size CSV for --source replay')
+        parser.add_argument('--speed', type=float, default=0,
+                            help='Replay at this multiple of real time (0 replays as fast as possible)')
+        parser.add_argument('--rate', type=int, default=50000,
+                            help='Synthetic ticks per second (0 generates as fast as possible)')
+        parser.add_argument('--host', default='127.0.0.1', help='Listen address for --source socket')
+        parser.add_argument('--port', type=int, default=9009, help='Listen port for --source socket')
+        parser.add_argument('--flush-interval', type=float, default=pricefeed.FLUSH_SECONDS,
+                            help='Seconds between Ticker flushes')
+        parser.add_argument('--bar-interval', type=float, default=pricefeed.BAR_SECONDS,
+                            help='Seconds between bar rollups')
+        parser.add_argument('--duration', type=float, help='Stop after this many seconds')
+
+    def handle(self, *args, **options):
+        if options['source'] == 'replay':
+            if not options['file']:
+                raise CommandError('--source replay needs --file')
+            try:
+                source = pricefeed.ReplaySource(options['file'], speed=options['speed'])
+            except OSError as exc:
+                raise CommandError(str(exc))
+        elif options['source'] == 'socket':
+            try:
+                source = pricefeed.SocketSource(options['host'], options['port'])
+            except OSError as exc:
+                raise CommandError(str(exc))
+            self.stdout.write(f'Listening for symbol,price,size lines on {options["host"]}:{options["port"]}')
+        else:
+            source = pricefeed.SyntheticSource(rate=options['rate'])
+
+        coalescer = pricefeed.Coalescer()
+        self._reported = (0, 0.0)
+        try:
+            seconds = pricefeed.run(
+                coalescer,
+                source,
+                flush_seconds=options['flush_interval'],
+                bar_seconds=options['bar_interval'],
+                duration=options['duration'],
+                report=self._report,
+            )
+        except KeyboardInterrupt:
+            seconds = None
+
+        summary = (
+            f'{coalescer.ticks} ticks, {coalescer.ticker_writes} ticker rows and '
+            f'{coalescer.bar_writes} bars written, {coalescer.unknown} ticks for unknown symbols dropped'
+        )
+        if seconds:
+            summary += f' ({coalescer.ticks / seconds:,.0f} ticks/s)'
+        self.stdout.write(self.style.SUCCESS(summary))
+
+    def _report(self, coalescer, seconds):
+        ticks, at = self._reported
+        if seconds - at >= 5:
+            rate = (coalescer.ticks - ticks) / (seconds - at)
+            self.stdout.write(
+                f'{seconds:7.1f}s  {rate:>10,.0f} ticks/s  '
+                f'{coalescer.ticker_writes} ticker rows, {coalescer.bar_writes} bars written'
+            )
+            self._reported = (coalescer.ticks, seconds)
@@ -0,0 +1,42 @@
+import time
+from datetime import date
+from django.core.management.base import BaseCommand, CommandError
+from markets import valuation
+
+class Command(BaseCommand):
+    help = 'Value every portfolio from its filled orders and write PortfolioSnapshot rows for the admin'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--as-of', help='Snapshot date (YYYY-MM-DD); defaults to today')
+        parser.add_argument('--workers', type=int, help='Worker processes (defaults to the CPU count)')
+        parser.add_argument('--chunk-size', type=int, default=valuation.CHUNK_USERS, help='Users valued per job')
+
+    def handle(self, *args, **options):
+        try:
+            as_of = date.fromisoformat(options['as_of']) if options['as_of'] else None
+        except ValueError:
+            raise CommandError('--as-of must be YYYY-MM-DD')
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size must be at least 1')
+
+        started = time.perf_counter()
+        summary = valuation.value_portfolios(
+            as_of=as_of,
+            workers=options['workers'],
+            chunk_size=options['chunk_size'],
+            progress=self._progress,
+        )
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(
+            f'Market value ₹{summary["market_value"]:,.2f}, cost ₹{summary["cost_basis"]:,.2f}, '
+            f'unrealized ₹{summary["unrealized_pnl"]:,.2f}, realized ₹{summary["realized_pnl"]:,.2f}'
+        )
+        for sector, value in summary['sector_exposure'].items():
+            share = value / summary['market_value'] * 100 if summary['market_value'] else 0
+            self.stdout.write(f'  {sector:<24} ₹{value:>18,.2f} {share:6.2f}%')
+        self.stdout.write(self.style.SUCCESS(f'Valued {summary["users"]} portfolios in {elapsed:.1f}s'))
+
+    def _progress(self, users, done, chunks):
+        if done % 10 == 0 or done == chunks:
+            self.stdout.write(f'{done}/{chunks} chunks, {users} portfolios valued')
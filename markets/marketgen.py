@@ -0,0 +1,255 @@
+"""
+Synthetic daily markets for load and scaling tests.
+
+Log returns follow a jump diffusion with a factor structure, so tickers move
+together the way real ones do without an N x N covariance matrix:
+
+    r = (mu - sigma^2 / 2) dt + sqrt(dt) (beta m + gamma s + eps) + J
+
+``m`` is one market-wide shock per day, ``s`` one shock per sector and day,
+``eps`` the ticker's own noise and ``J`` a compound Poisson jump. Each
+ticker's drift, total volatility, betas, jump rate, base volume and share
+count are drawn once from the seed, and the idiosyncratic part is sized so the total
+volatility comes out as drawn.
+
+Bars are generated a block of days at a time for every ticker at once, so
+memory stays bounded by the block however long the history is. Each random
+component draws from its own stream spawned from the seed, so the same seed
+gives the same market whatever the block size. Jumps and part of the diffusion land
+overnight as the gap between the previous close and the open; the high and
+low stretch past the open and close by a draw scaled to the day's
+volatility, and volume rises with the size of the move.
+"""
+import json
+from datetime import date, timedelta
+
+import numpy as np
+from django.db import transaction
+from django.utils import timezone
+
+from . import ingest, pricestore, search, snapshot
+from .models import Ticker
+
+TRADING_DAYS = 252
+SECTORS = ['Banking', 'Technology', 'Energy', 'Pharma', 'FMCG', 'Auto', 'Metals', 'Telecom', 'Realty', 'Infra']
+CHUNK_ROWS = 200000
+OVERNIGHT_SHARE = 0.3       # of the day's diffusion, realised between close and open
+MARKET_VOL = 0.16
+SECTOR_VOL = 0.10
+JUMP_MEAN = -0.01
+JUMP_VOL = 0.06
+MIN_PRICE, MAX_PRICE = 0.01, 1_000_000.0
+MAX_VOLUME = 2_000_000_000  # PriceBar.volume is a 32-bit integer
+
+
+def trading_days(end, count):
+    """The last ``count`` weekdays up to and including ``end``"""
+    first = end - timedelta(days=count * 7 // 5 + 7)
+    days = np.arange(np.datetime64(first), np.datetime64(end + timedelta(days=1)))
+    return days[np.is_busday(days)][-count:]
+
+
+def draw_tickers(rng, sectors):
+    """Per-ticker model parameters for tickers in the given sector indices"""
+    n = len(sectors)
+    vol = rng.uniform(0.15, 0.55, n)
+    beta = rng.uniform(0.5, 1.5, n)
+    gamma = rng.uniform(0.3, 1.0, n)
+    systematic = (beta * MARKET_VOL) ** 2 + (gamma * SECTOR_VOL) ** 2
+    return {
+        'sector': np.asarray(sectors),
+        'drift': rng.normal(0.08, 0.10, n),
+        'vol': np.sqrt(np.maximum(vol ** 2, systematic + 0.05 ** 2)),
+        'beta': beta * MARKET_VOL,
+        'gamma': gamma * SECTOR_VOL,
+        'idio': np.sqrt(np.maximum(vol ** 2 - systematic, 0.05 ** 2)),
+        'jumps': rng.uniform(0.5, 4.0, n),     # expected jumps per year
+        'volume': np.exp(rng.normal(np.log(500_000), 1.0, n)),
+        'price': np.exp(rng.uniform(np.log(10), np.log(5000), n)),
+        'shares': np.exp(rng.uniform(np.log(1e7), np.log(1e10), n)).astype(np.int64),
+    }
+
+
+def _streams(seed):
+    """Generators for the ticker parameters and for each random component of ``simulate``"""
+    return [np.random.default_rng(child) for child in np.random.SeedSequence(seed).spawn(8)]
+
+
+def simulate(params, days, streams, chunk_days):
+    """
+    Yield ``(days, open, high, low, close, volume)`` blocks of at most
+    ``chunk_days`` days; price arrays are (days, tickers), rounded to paise.
+    """
+    market_rng, sector_rng, idio_rng, count_rng, jump_rng, reach_rng, volume_rng = streams
+    dt = 1 / TRADING_DAYS
+    n, n_sectors = len(params['sector']), int(params['sector'].max()) + 1
+    drift = (params['drift'] - params['vol'] ** 2 / 2) * dt
+    close = params['price'].copy()
+
+    for offset in range(0, len(days), chunk_days):
+        block = days[offset:offset + chunk_days]
+        d = len(block)
+        market = market_rng.standard_normal((d, 1))
+        sector = sector_rng.standard_normal((d, n_sectors))[:, params['sector']]
+        diffusion = np.sqrt(dt) * (
+            params['beta'] * market + params['gamma'] * sector + params['idio'] * idio_rng.standard_normal((d, n))
+        )
+        counts = count_rng.poisson(params['jumps'] * dt, (d, n))
+        jumps = counts * JUMP_MEAN + np.sqrt(counts) * JUMP_VOL * jump_rng.standard_normal((d, n))
+
+        overnight = OVERNIGHT_SHARE * diffusion + jumps
+        intraday = drift + (1 - OVERNIGHT_SHARE) * diffusion
+        log_close = np.log(close) + np.cumsum(overnight + intraday, axis=0)
+        log_open = np.vstack([np.log(close)[None, :], log_close[:-1]]) + overnight
+        log_open = np.clip(log_open, np.log(MIN_PRICE), np.log(MAX_PRICE))
+        log_close = np.clip(log_close, np.log(MIN_PRICE), np.log(MAX_PRICE))
+
+        day_vol = params['vol'] * np.sqrt(dt)
+        reach = np.abs(reach_rng.standard_normal((d, 2 * n))) * np.tile(day_vol, 2) * 0.5
+        reach = reach[:, :n], reach[:, n:]
+        opens, closes = np.exp(log_open).round(2), np.exp(log_close).round(2)
+        highs = np.maximum(np.exp(np.maximum(log_open, log_close) + reach[0]).round(2), np.maximum(opens, closes))
+        lows = np.minimum(np.exp(np.minimum(log_open, log_close) - reach[1]).round(2), np.minimum(opens, closes))
+        lows = np.maximum(lows, MIN_PRICE)
+
+        move = np.abs(overnight + intraday) / day_vol
+        volume = params['volume'] * np.exp(0.3 * volume_rng.standard_normal((d, n))) * (1 + move)
+        volume = np.minimum(volume, MAX_VOLUME).astype(np.int64)
+
+        close = np.exp(log_close[-1])
+        yield block, opens, highs, lows, closes, volume
+
+
+def ensure_tickers(count, prefix):
+    """Ids and sector indices of ``count`` synthetic tickers, creating any that are missing"""
+    width = max(5, len(str(count)))
+    if len(prefix) + width > Ticker._meta.get_field('symbol').max_length:
+        raise ValueError(f'Prefix {prefix!r} is too long for {count} tickers')
+    symbols = [f'{prefix}{i:0{width}d}' for i in range(1, count + 1)]
+    Ticker.objects.bulk_create(
+        [
+            Ticker(symbol=symbol, name=f'Synthetic {symbol}', exchange='SYN', sector=SECTORS[i % len(SECTORS)])
+            for i, symbol in enumerate(symbols)
+        ],
+        batch_size=1000,
+        ignore_conflicts=True,
+    )
+    # bulk_create skips the receivers that index new tickers
+    search.invalidate()
+    ids = dict(Ticker.objects.filter(symbol__in=symbols).values_list('symbol', 'id'))
+    return np.array([ids[symbol] for symbol in symbols]), np.arange(count) % len(SECTORS)
+
+
+def _rows(ticker_ids, block, opens, highs, lows, closes, volume):
+    # Ticker-major, so inserts walk the (ticker, date) unique index in order
+    return list(zip(
+        np.repeat(ticker_ids, len(block)).tolist(), np.tile(block.astype(str), len(ticker_ids)).tolist(),
+        *(values.T.ravel().tolist() for values in (opens, highs, lows, closes, volume)),
+    ))
+
+
+def _chunk_days(n_tickers, chunk_rows):
+    return max(1, chunk_rows // max(n_tickers, 1))
+
+
+def _quotes(closes, volume):
+    """Price, day change, change % and volume per ticker from the last two rows of closes"""
+    previous, last = closes[0], closes[-1]
+    change = last - previous
+    change_pct = np.divide(change, previous, out=np.zeros_like(change), where=previous > 0) * 100
+    return zip(last.tolist(), change.tolist(), np.clip(change_pct, -999.99, 999.99).tolist(), volume.tolist())
+
+
+def _mark_tickers(ticker_ids, closes, volume, shares):
+    # bulk_update skips auto_now and the receivers, so stamp last_updated for
+    # realtime polling and bump the market snapshot here
+    now = timezone.now()
+    tickers = [
+        Ticker(
+            id=ticker_id, price=f'{price:.2f}', change=f'{delta:.2f}', change_pct=f'{pct:.2f}', volume=vol,
+            shares_outstanding=count, last_updated=now,
+        )
+        for ticker_id, (price, delta, pct, vol), count in zip(
+            ticker_ids.tolist(), _quotes(closes, volume), shares.tolist(),
+        )
+    ]
+    Ticker.objects.bulk_update(
+        tickers, ['price', 'change', 'change_pct', 'volume', 'shares_outstanding', 'last_updated'], batch_size=500,
+    )
+    snapshot.invalidate()
+
+
+def generate(tickers, days, end=None, seed=0, prefix='SYN', chunk_rows=CHUNK_ROWS, progress=None):
+    """
+    Write ``days`` trading days of bars for ``tickers`` synthetic tickers
+    straight into PriceBar, one transaction per block, and mark each ticker
+    to its last close. Reruns overwrite the same dates. Returns the number of
+    bars written. ``progress(bars_written, days_done)`` is called per block.
+    """
+    streams = _streams(seed)
+    ticker_ids, sectors = ensure_tickers(tickers, prefix)
+    params = draw_tickers(streams[0], sectors)
+    calendar = trading_days(end or date.today(), days)
+
+    written, done = 0, 0
+    tail = params['price'][None, :]
+    for block, opens, highs, lows, closes, volume in simulate(params, calendar, streams[1:], _chunk_days(tickers, chunk_rows)):
+        ingest.upsert(_rows(ticker_ids, block, opens, highs, lows, closes, volume))
+        written += opens.size
+        done += len(block)
+        tail = np.vstack([tail, closes])[-2:]
+        if progress:
+            progress(written, done)
+
+    with transaction.atomic():
+        _mark_tickers(ticker_ids, tail, volume[-1], params['shares'])
+    if pricestore.is_enabled():
+        for ticker_id in ticker_ids.tolist():
+            pricestore.rebuild(ticker_id)
+    return written
+
+
+def write_fixture(path, tickers, days, end=None, seed=0, prefix='SYN', chunk_rows=CHUNK_ROWS, progress=None):
+    """
+    Stream the same market as ``generate`` into a loaddata fixture for an
+    empty database. Tickers get primary keys 1..``tickers`` and come last so
+    their prices can be the final closes; loaddata checks foreign keys at
+    the end. Returns the number of bars written.
+    """
+    streams = _streams(seed)
+    width = max(5, len(str(tickers)))
+    sectors = np.arange(tickers) % len(SECTORS)
+    params = draw_tickers(streams[0], sectors)
+    calendar = trading_days(end or date.today(), days)
+    ticker_ids = np.arange(1, tickers + 1)
+
+    written, done = 0, 0
+    tail = params['price'][None, :]
+    bar = (
+        '{{"model": "markets.pricebar", "fields": {{"ticker": {}, "date": "{}", '
+        '"open": {:.2f}, "high": {:.2f}, "low": {:.2f}, "close": {:.2f}, "volume": {}}}}}'
+    )
+    with open(path, 'w') as fh:
+        fh.write('[\n')
+        for block in simulate(params, calendar, streams[1:], _chunk_days(tickers, chunk_rows)):
+            fh.write(',\n'.join(bar.format(*row) for row in _rows(ticker_ids, *block)))
+            fh.write(',\n')
+            written += block[1].size
+            done += len(block[0])
+            tail = np.vstack([tail, block[4]])[-2:]
+            if progress:
+                progress(written, done)
+        objects = (
+            {'model': 'markets.ticker', 'pk': pk, 'fields': {
+                'symbol': f'{prefix}{pk:0{width}d}', 'name': f'Synthetic {prefix}{pk:0{width}d}',
+                'exchange': 'SYN', 'sector': SECTORS[sector], 'price': f'{price:.2f}', 'change': f'{delta:.2f}',
+                'change_pct': f'{pct:.2f}', 'volume': vol, 'last_updated': f'{calendar[-1]}T00:00:00Z',
+                'shares_outstanding': shares,
+            }}
+            for pk, sector, (price, delta, pct, vol), shares in zip(
+                ticker_ids.tolist(), sectors.tolist(), _quotes(tail, block[5][-1]), params['shares'].tolist(),
+            )
+        )
+        fh.write(',\n'.join(json.dumps(obj) for obj in objects))
+        fh.write('\n]\n')
+    return written
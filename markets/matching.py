@@ -0,0 +1,282 @@
+"""
+Order matching for resting LIMIT and STOP orders.
+
+MARKET orders fill at once through ``ledger.fill_order``, as do LIMIT and
+STOP orders that are already marketable when placed. The rest are saved as
+PENDING and held in memory in per-ticker books, one heap per side and kind in
+price-time priority: the best limit or nearest stop first, then the oldest
+order. Each price update pops the orders it crosses:
+
+==========  =========================  ======================
+Order       Fires when the price is    Heap order
+==========  =========================  ======================
+BUY LIMIT   at or below the limit      highest limit first
+SELL LIMIT  at or above the limit      lowest limit first
+BUY STOP    at or above the stop       lowest stop first
+SELL STOP   at or below the stop       highest stop first
+==========  =========================  ======================
+
+Crossed orders fill in full at the update's price. Cancels only mark the
+order dead; its heap entry is skipped when it reaches the top.
+
+Each process builds its book on first use and picks up orders placed by
+other processes before every match. Fills and cancels are conditional on the
+row still being PENDING, so several processes matching the same prices never
+fill an order twice, and an order canceled elsewhere is dropped when it
+fires. Status changes are written in bulk per tick; no order is deleted.
+"""
+import heapq
+import threading
+from collections import defaultdict
+from decimal import Decimal, InvalidOperation
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
+
+from . import ledger
+from .models import Order, Position, Ticker
+
+MARKET, LIMIT, STOP = 'MARKET', 'LIMIT', 'STOP'
+BUY, SELL = 'BUY', 'SELL'
+
+
+def _paise(price):
+    return int(round(float(price) * 100))
+
+
+class _TickerBook:
+    """The resting orders of one ticker, as four heaps of ``(key, order id)``"""
+
+    def __init__(self):
+        # Keys are negated where the heap must pop the highest price first
+        self.buy_limits = []     # (-limit, id)
+        self.sell_limits = []    # (limit, id)
+        self.buy_stops = []      # (stop, id)
+        self.sell_stops = []     # (-stop, id)
+
+    def add(self, order_id, side, kind, paise):
+        if kind == LIMIT:
+            if side == BUY:
+                heapq.heappush(self.buy_limits, (-paise, order_id))
+            else:
+                heapq.heappush(self.sell_limits, (paise, order_id))
+        elif side == BUY:
+            heapq.heappush(self.buy_stops, (paise, order_id))
+        else:
+            heapq.heappush(self.sell_stops, (-paise, order_id))
+
+    @staticmethod
+    def _pop_while(heap, bound, live, fired):
+        # Pop entries whose key is at or below ``bound``
+        while heap and heap[0][0] <= bound:
+            order_id = heapq.heappop(heap)[1]
+            if live.pop(order_id, None) is not None:
+                fired.append(order_id)
+
+    def cross(self, paise, live):
+        """Ids of the orders ``paise`` crosses, in priority order, removed from the book"""
+        fired = []
+        self._pop_while(self.buy_limits, -paise, live, fired)
+        self._pop_while(self.sell_limits, paise, live, fired)
+        self._pop_while(self.buy_stops, paise, live, fired)
+        self._pop_while(self.sell_stops, -paise, live, fired)
+        return fired
+
+
+class OrderBook:
+
+    def __init__(self):
+        self.tickers = defaultdict(_TickerBook)
+        self.live = {}          # order id -> ticker id for orders still resting
+        self.last_id = 0        # highest order id loaded from the database
+        self.lock = threading.Lock()
+
+    def add(self, order_id, ticker_id, side, kind, trigger):
+        """Rest an order; ``trigger`` is its limit or stop price"""
+        if kind not in (LIMIT, STOP):
+            raise ValueError(f'Only LIMIT and STOP orders rest in the book, not {kind!r}')
+        with self.lock:
+            if order_id in self.live:
+                return
+            self.live[order_id] = ticker_id
+            self.tickers[ticker_id].add(order_id, side, kind, _paise(trigger))
+            self.last_id = max(self.last_id, order_id)
+
+    def cancel(self, order_id):
+        with self.lock:
+            return self.live.pop(order_id, None) is not None
+
+    def match(self, ticker_id, price):
+        """Ids of the resting orders on ``ticker_id`` that ``price`` fills, best first"""
+        with self.lock:
+            book = self.tickers.get(ticker_id)
+            return book.cross(_paise(price), self.live) if book else []
+
+    def __len__(self):
+        return len(self.live)
+
+
+_book = None
+_build_lock = threading.Lock()
+
+
+def _pending(after_id=0):
+    return Order.objects.filter(status='PENDING', id__gt=after_id).order_by('id').values_list(
+        'id', 'ticker_id', 'order_type', 'kind', 'limit_price', 'stop_price',
+    )
+
+
+def _load(book, rows):
+    for order_id, ticker_id, side, kind, limit_price, stop_price in rows:
+        if kind in (LIMIT, STOP):
+            book.add(order_id, ticker_id, side, kind, limit_price if kind == LIMIT else stop_price)
+        book.last_id = max(book.last_id, order_id)
+
+
+def build():
+    book = OrderBook()
+    _load(book, _pending().iterator(chunk_size=10000))
+    return book
+
+
+def get_book():
+    global _book
+    if _book is None:
+        with _build_lock:
+            if _book is None:
+                _book = build()
+    return _book
+
+
+def sync(book):
+    """Load orders placed since the book last looked, e.g. by another process"""
+    _load(book, _pending(book.last_id))
+
+
+def invalidate():
+    global _book
+    _book = None
+
+
+def _price(value, name):
+    try:
+        price = Decimal(str(value)).quantize(Decimal('0.01'))
+    except (InvalidOperation, TypeError, ValueError):
+        raise ValueError(f'{name} must be a positive number')
+    if not price.is_finite() or not price > 0:
+        raise ValueError(f'{name} must be a positive number')
+    return price
+
+
+def _marketable(side, kind, trigger, price):
+    if kind == LIMIT:
+        return price <= trigger if side == BUY else price >= trigger
+    return price >= trigger if side == BUY else price <= trigger
+
+
+def submit(user, ticker, side, quantity, kind=MARKET, trigger=None):
+    """
+    Place an order. Returns ``(order, realized P&L)``, with P&L None for an
+    order left PENDING. ``trigger`` is the limit or stop price.
+    """
+    if side not in (BUY, SELL):
+        raise ValueError('Order side must be BUY or SELL')
+    if kind not in (MARKET, LIMIT, STOP):
+        raise ValueError('Order kind must be MARKET, LIMIT or STOP')
+    if quantity <= 0:
+        raise ValueError('Quantity must be positive')
+
+    fields = {'kind': kind}
+    if kind != MARKET:
+        trigger = _price(trigger, 'Limit price' if kind == LIMIT else 'Stop price')
+        fields['limit_price' if kind == LIMIT else 'stop_price'] = trigger
+    if kind == MARKET or _marketable(side, kind, trigger, ticker.price):
+        return ledger.fill_order(user, ticker, side, quantity, **fields)
+
+    if side == SELL:
+        held = Position.objects.filter(user=user, ticker=ticker).values_list('shares', flat=True).first() or 0
+        if quantity > held:
+            raise ledger.InsufficientShares(f'Cannot sell {quantity} shares. Current position: {held}')
+    order = Order.objects.create(
+        user=user, ticker=ticker, order_type=side, quantity=quantity, price=trigger, status='PENDING', **fields,
+    )
+    if _book is not None:
+        _book.add(order.id, ticker.id, side, kind, trigger)
+    return order, None
+
+
+def cancel(user, order_ids=None):
+    """Cancel the user's PENDING orders (all of them, or ``order_ids``); returns how many"""
+    orders = Order.objects.filter(user=user, status='PENDING')
+    if order_ids is not None:
+        orders = orders.filter(id__in=order_ids)
+    with transaction.atomic():
+        ids = list(orders.select_for_update().values_list('id', flat=True))
+        Order.objects.filter(id__in=ids).update(status='CANCELED')
+    if _book is not None:
+        for order_id in ids:
+            _book.cancel(order_id)
+    return len(ids)
+
+
+def fill(order_ids, prices, when=None):
+    """
+    Fill the given orders, still PENDING, at their ticker's price in
+    ``prices`` (ticker id -> price), booking each against its position in
+    ``order_ids`` order. A SELL larger than the position by then is canceled.
+    Returns ``(filled ids, canceled ids)``.
+    """
+    when = when or timezone.now()
+    with transaction.atomic():
+        rows = {
+            row[0]: row for row in Order.objects.select_for_update().filter(
+                id__in=order_ids, status='PENDING',
+            ).values_list('id', 'user_id', 'ticker_id', 'order_type', 'quantity')
+        }
+        if not rows:
+            return [], []
+        users = User.objects.in_bulk({row[1] for row in rows.values()})
+        tickers = Ticker.objects.in_bulk({row[2] for row in rows.values()})
+
+        groups = defaultdict(list)
+        for order_id in order_ids:
+            if order_id in rows:
+                groups[rows[order_id][1:3]].append(rows[order_id])
+
+        filled, rejected = defaultdict(list), []
+        for (user_id, ticker_id), orders in groups.items():
+            position = ledger.lock_position(users[user_id], tickers[ticker_id])
+            price = Decimal(str(prices[ticker_id])).quantize(Decimal('0.01'))
+            for order_id, _, _, side, quantity in orders:
+                if side == SELL and quantity > position.shares:
+                    rejected.append(order_id)
+                    continue
+                ledger.apply_fill(position, side, quantity, price)
+                filled[price].append(order_id)
+            position.save()
+
+        for price, ids in filled.items():
+            Order.objects.filter(id__in=ids).update(status='FILLED', price=price, filled_at=when)
+        if rejected:
+            Order.objects.filter(id__in=rejected).update(status='CANCELED')
+    return [order_id for ids in filled.values() for order_id in ids], rejected
+
+
+def process_tick(ticker_ids, prices, when=None):
+    """Match a price update for several tickers against the resting orders and fill what it crosses"""
+    book = get_book()
+    sync(book)
+    fired, fill_prices = [], {}
+    for ticker_id, price in zip(ticker_ids, prices):
+        crossed = book.match(int(ticker_id), price)
+        if crossed:
+            fired.extend(crossed)
+            fill_prices[int(ticker_id)] = price
+    if not fired:
+        return [], []
+    return fill(fired, fill_prices, when)
+
+
+def ticker_saved(ticker):
+    process_tick([ticker.id], [ticker.price])
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('markets', '0003_tradingstrategy'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RiskMetric',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('as_of', models.DateField()),
+                ('lookback_days', models.IntegerField()),
+                ('beta', models.FloatField(null=True)),
+                ('volatility', models.FloatField(null=True)),
+                ('sharpe', models.FloatField(null=True)),
+                ('max_drawdown', models.FloatField(null=True)),
+                ('computed_at', models.DateTimeField(auto_now=True)),
+                ('benchmark', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='markets.ticker')),
+                ('ticker', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='risk_metrics', to='markets.ticker')),
+            ],
+            options={
+                'unique_together': {('ticker', 'benchmark')},
+            },
+        ),
+    ]
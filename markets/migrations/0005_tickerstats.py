@@ -0,0 +1,73 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:36
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('markets', '0004_riskmetric'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TickerStats',
+            fields=[
+                ('ticker', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='markets.ticker')),
+                ('as_of', models.DateField()),
+                ('rsi_14', models.FloatField(null=True)),
+                ('high_52w', models.DecimalField(decimal_places=2, max_digits=10, null=True)),
+                ('low_52w', models.DecimalField(decimal_places=2, max_digits=10, null=True)),
+                ('pct_from_high', models.FloatField(null=True)),
+                ('pct_from_low', models.FloatField(null=True)),
+                ('avg_volume_20', models.BigIntegerField(null=True)),
+                ('market_cap', models.DecimalField(decimal_places=2, max_digits=20, null=True)),
+                ('computed_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name_plural': 'ticker stats',
+            },
+        ),
+        migrations.AddField(
+            model_name='ticker',
+            name='shares_outstanding',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='ticker',
+            index=models.Index(condition=models.Q(('is_index', False)), fields=['-change_pct'], name='ticker_movers_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ticker',
+            index=models.Index(condition=models.Q(('is_index', False)), fields=['sector', '-change_pct'], name='ticker_sector_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ticker',
+            index=models.Index(condition=models.Q(('is_index', False)), fields=['price'], name='ticker_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ticker',
+            index=models.Index(condition=models.Q(('is_index', False)), fields=['volume'], name='ticker_volume_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tickerstats',
+            index=models.Index(fields=['rsi_14'], name='stats_rsi_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tickerstats',
+            index=models.Index(fields=['pct_from_high'], name='stats_from_high_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tickerstats',
+            index=models.Index(fields=['pct_from_low'], name='stats_from_low_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tickerstats',
+            index=models.Index(fields=['avg_volume_20'], name='stats_avg_volume_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tickerstats',
+            index=models.Index(fields=['market_cap'], name='stats_market_cap_idx'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:05
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('markets', '0009_intradaybar'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PortfolioSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('as_of', models.DateField()),
+                ('holdings', models.IntegerField()),
+                ('market_value', models.DecimalField(decimal_places=2, max_digits=16)),
+                ('cost_basis', models.DecimalField(decimal_places=2, max_digits=16)),
+                ('unrealized_pnl', models.DecimalField(decimal_places=2, max_digits=16)),
+                ('realized_pnl', models.DecimalField(decimal_places=2, max_digits=16)),
+                ('sector_exposure', models.JSONField(default=dict)),
+                ('computed_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='portfolio_snapshots', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['as_of', '-market_value'], name='snapshot_as_of_value_idx')],
+                'unique_together': {('user', 'as_of')},
+            },
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:11
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_filled_at(apps, schema_editor):
+    # Every fill so far happened when its order was placed
+    Order = apps.get_model('markets', 'Order')
+    Order.objects.filter(status='FILLED', filled_at__isnull=True).update(filled_at=models.F('created_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('markets', '0010_portfoliosnapshot'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='order',
+            name='order_user_status_idx',
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='filled_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='kind',
+            field=models.CharField(choices=[('MARKET', 'Market'), ('LIMIT', 'Limit'), ('STOP', 'Stop')], default='MARKET', max_length=6),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='limit_price',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='stop_price',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True),
+        ),
+        migrations.RunPython(backfill_filled_at, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['user', 'status', 'filled_at'], name='order_user_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(condition=models.Q(('status', 'PENDING')), fields=['id'], name='order_pending_idx'),
+        ),
+    ]
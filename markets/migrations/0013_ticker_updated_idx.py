@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('markets', '0012_pricealert_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='ticker',
+            index=models.Index(fields=['last_updated'], name='ticker_updated_idx'),
+        ),
+    ]
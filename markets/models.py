@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils import timezone
 from decimal import Decimal
 
 class Ticker(models.Model):
@@ -13,6 +14,39 @@ class Ticker(models.Model):
     volume = models.BigIntegerField(default=0)
     last_updated = models.DateTimeField(auto_now=True)
     is_index = models.BooleanField(default=False)
+    shares_outstanding = models.BigIntegerField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Screener and market-overview access paths. Partial on stocks only:
+            # ``is_index=False`` compiles to ``NOT is_index``, which a plain
+            # (is_index, ...) index cannot seek on.
+            models.Index(fields=['-change_pct'], name='ticker_movers_idx', condition=models.Q(is_index=False)),
+            models.Index(fields=['sector', '-change_pct'], name='ticker_sector_idx', condition=models.Q(is_index=False)),
+            models.Index(fields=['price'], name='ticker_price_idx', condition=models.Q(is_index=False)),
+            models.Index(fields=['volume'], name='ticker_volume_idx', condition=models.Q(is_index=False)),
+            # Sector list and related stocks, which include indices
+            models.Index(fields=['sector'], name='ticker_sector_list_idx'),
+            # Snapshot versions and realtime polling look for the newest writes
+            models.Index(fields=['last_updated'], name='ticker_updated_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        ticker = super().from_db(db, field_names, values)
+        # The price as loaded, so a save can tell whether it moved
+        ticker._loaded_price = ticker.__dict__.get('price')
+        return ticker
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'price' in update_fields:
+            self._loaded_price = self.price
+
+    def price_changed(self):
+        """Whether ``price`` differs from the value last loaded or saved"""
+        return getattr(self, '_loaded_price', None) != self.price
 
     def __str__(self):
         return f"{self.symbol} - {self.name}"
@@ -33,6 +67,30 @@ class PriceBar(models.Model):
     def __str__(self):
         return f"{self.ticker.symbol} - {self.date}"
 
+class IntradayBar(models.Model):
+    RESOLUTION_CHOICES = [
+        ('1m', '1 minute'),
+        ('5m', '5 minutes'),
+        ('15m', '15 minutes'),
+        ('1h', '1 hour'),
+    ]
+
+    ticker = models.ForeignKey(Ticker, on_delete=models.CASCADE, related_name='intraday_bars')
+    resolution = models.CharField(max_length=3, choices=RESOLUTION_CHOICES)
+    start = models.DateTimeField()
+    open = models.DecimalField(max_digits=10, decimal_places=2)
+    high = models.DecimalField(max_digits=10, decimal_places=2)
+    low = models.DecimalField(max_digits=10, decimal_places=2)
+    close = models.DecimalField(max_digits=10, decimal_places=2)
+    volume = models.BigIntegerField()
+
+    class Meta:
+        unique_together = ('ticker', 'resolution', 'start')
+        ordering = ['start']
+
+    def __str__(self):
+        return f"{self.ticker.symbol} {self.resolution} - {self.start}"
+
 class Watchlist(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='watchlist_items')
     ticker = models.ForeignKey(Ticker, on_delete=models.CASCADE, related_name='watchlist_items')
@@ -54,14 +112,158 @@ class Order(models.Model):
         ('CANCELED', 'Canceled'),
         ('PENDING', 'Pending'),
     ]
+    KIND_CHOICES = [
+        ('MARKET', 'Market'),
+        ('LIMIT', 'Limit'),
+        ('STOP', 'Stop'),
+    ]
 
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='orders')
     ticker = models.ForeignKey(Ticker, on_delete=models.CASCADE, related_name='orders')
     order_type = models.CharField(max_length=4, choices=ORDER_TYPE_CHOICES)
+    kind = models.CharField(max_length=6, choices=KIND_CHOICES, default='MARKET')
     quantity = models.IntegerField()
+    # Fill price once FILLED; the limit or stop price while PENDING
     price = models.DecimalField(max_digits=10, decimal_places=2)
+    limit_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    stop_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
     status = models.CharField(max_length=8, choices=STATUS_CHOICES, default='PENDING')
     created_at = models.DateTimeField(auto_now_add=True)
+    filled_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # A user's fills in fill order: portfolio, analytics, equity curve
+            models.Index(fields=['user', 'status', 'filled_at'], name='order_user_status_idx'),
+            # Newest-first across statuses with the keyset tiebreak: trade history, recent orders
+            models.Index(fields=['user', '-created_at', '-id'], name='order_user_recent_idx'),
+            # Resting orders for the matching engine's book
+            models.Index(fields=['id'], condition=models.Q(status='PENDING'), name='order_pending_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        if self.status == 'FILLED' and self.filled_at is None:
+            self.filled_at = timezone.now()
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.order_type} {self.quantity} {self.ticker.symbol} @ {self.price}"
+
+class Position(models.Model):
+    """Running per-(user, ticker) holding, updated as fills are booked."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='positions')
+    ticker = models.ForeignKey(Ticker, on_delete=models.CASCADE, related_name='positions')
+    shares = models.IntegerField(default=0)
+    total_cost = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    avg_cost = models.DecimalField(max_digits=14, decimal_places=4, default=0)
+    realized_pnl = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    trades = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('user', 'ticker')
+        constraints = [
+            # Last line of defence against overselling; place_order checks first
+            models.CheckConstraint(condition=models.Q(shares__gte=0), name='position_shares_non_negative'),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} - {self.ticker.symbol}: {self.shares}"
+
+class TradingStrategy(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='strategies')
+    name = models.CharField(max_length=100)
+    description = models.TextField(blank=True)
+    criteria = models.JSONField()  # Entry/exit rules, see markets.backtest
+    is_active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.user.username} - {self.name}"
+
+class RiskMetric(models.Model):
+    """Nightly risk statistics for a ticker measured against a benchmark index."""
+    ticker = models.ForeignKey(Ticker, on_delete=models.CASCADE, related_name='risk_metrics')
+    benchmark = models.ForeignKey(Ticker, on_delete=models.CASCADE, related_name='+')
+    as_of = models.DateField()
+    lookback_days = models.IntegerField()
+    beta = models.FloatField(null=True)
+    volatility = models.FloatField(null=True)
+    sharpe = models.FloatField(null=True)
+    max_drawdown = models.FloatField(null=True)
+    computed_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('ticker', 'benchmark')
+
+    def __str__(self):
+        return f"{self.ticker.symbol} vs {self.benchmark.symbol} ({self.as_of})"
+
+
+class TickerStats(models.Model):
+    """Screening statistics derived from PriceBar history, refreshed by compute_ticker_stats."""
+    ticker = models.OneToOneField(Ticker, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    as_of = models.DateField()
+    rsi_14 = models.FloatField(null=True)
+    high_52w = models.DecimalField(max_digits=10, decimal_places=2, null=True)
+    low_52w = models.DecimalField(max_digits=10, decimal_places=2, null=True)
+    pct_from_high = models.FloatField(null=True)
+    pct_from_low = models.FloatField(null=True)
+    avg_volume_20 = models.BigIntegerField(null=True)
+    market_cap = models.DecimalField(max_digits=20, decimal_places=2, null=True)
+    computed_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = 'ticker stats'
+        indexes = [
+            models.Index(fields=['rsi_14'], name='stats_rsi_idx'),
+            models.Index(fields=['pct_from_high'], name='stats_from_high_idx'),
+            models.Index(fields=['pct_from_low'], name='stats_from_low_idx'),
+            models.Index(fields=['avg_volume_20'], name='stats_avg_volume_idx'),
+            models.Index(fields=['market_cap'], name='stats_market_cap_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.ticker.symbol} stats ({self.as_of})"
+
+
+class PriceAlert(models.Model):
+    """Fires once when the ticker trades at or through target_price; see markets.alerts."""
+    ALERT_TYPE_CHOICES = [
+        ('ABOVE', 'Above'),
+        ('BELOW', 'Below'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='price_alerts')
+    ticker = models.ForeignKey(Ticker, on_delete=models.CASCADE, related_name='price_alerts')
+    target_price = models.DecimalField(max_digits=10, decimal_places=2)
+    alert_type = models.CharField(max_length=10, choices=ALERT_TYPE_CHOICES)
+    is_active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+    triggered_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.user.username} - {self.ticker.symbol} {self.alert_type.lower()} {self.target_price}"
+
+
+class PortfolioSnapshot(models.Model):
+    """One user's holdings valued at current prices, written by value_portfolios; see markets.valuation."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='portfolio_snapshots')
+    as_of = models.DateField()
+    holdings = models.IntegerField()
+    market_value = models.DecimalField(max_digits=16, decimal_places=2)
+    cost_basis = models.DecimalField(max_digits=16, decimal_places=2)
+    unrealized_pnl = models.DecimalField(max_digits=16, decimal_places=2)
+    realized_pnl = models.DecimalField(max_digits=16, decimal_places=2)
+    sector_exposure = models.JSONField(default=dict)
+    computed_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('user', 'as_of')
+        indexes = [
+            models.Index(fields=['as_of', '-market_value'], name='snapshot_as_of_value_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} portfolio ({self.as_of})"
@@ -0,0 +1,408 @@
+"""
+Tick ingestion for the run_price_feed service.
+
+A source yields batches of ticks as ``(symbols, prices, sizes, when)``, where
+``when`` is the aware datetime of the batch's last tick. ``Coalescer.apply``
+folds each batch into per-symbol NumPy state (last price, day volume and
+the current minute's bar) without touching the database. On a fixed cadence
+``flush_tickers`` writes only the symbols that traded since the previous
+flush with one batched UPDATE, and ``flush_bars`` hands the minute bars of
+symbols that traded since the last rollup to ``intraday.record``, which
+rebuilds the 5m, 15m, 1h and daily PriceBar rollups from them. Writes are
+therefore bounded by the number of symbols per interval, however fast ticks
+arrive.
+
+Batched writes skip model signals, so a Ticker flush refreshes the market
+snapshot, evaluates price alerts and matches resting orders itself. It stamps
+``last_updated`` so the WebSocket feed in ``markets.realtime`` picks the
+changes up.
+
+Sources:
+
+``ReplaySource``
+    CSV of ``timestamp,symbol,price,size`` rows in time order, with epoch
+    seconds or ISO 8601 timestamps.
+``SyntheticSource``
+    Random walks over every ticker at a target rate.
+``SocketSource``
+    Newline-delimited ``symbol,price,size`` from TCP clients on a local port.
+"""
+import csv
+import selectors
+import socket
+import time
+from datetime import datetime, timezone as dt_timezone
+from decimal import Decimal
+
+import numpy as np
+from django.db import connection, transaction
+from django.db.models import OuterRef, Subquery
+from django.utils import timezone
+
+from . import alerts, intraday, matching, snapshot
+from .models import IntradayBar, PriceBar, Ticker
+
+FLUSH_SECONDS = 1.0
+BAR_SECONDS = 60.0
+BATCH_SIZE = 10000
+MAX_CHANGE_PCT = 999.99     # Ticker.change_pct is DecimalField(5, 2)
+TICKER_FIELDS = ['price', 'change', 'change_pct', 'volume', 'last_updated']
+
+
+def _money(value):
+    return Decimal(f'{value:.2f}')
+
+
+def _update_sql():
+    # A keyed executemany: bulk_update's CASE WHEN statements take seconds
+    # to compile for a few thousand rows, longer than a flush interval
+    quote = connection.ops.quote_name
+    columns = ', '.join(f'{quote(Ticker._meta.get_field(name).column)} = %s' for name in TICKER_FIELDS)
+    return f'UPDATE {quote(Ticker._meta.db_table)} SET {columns} WHERE {quote("id")} = %s'
+
+
+class Coalescer:
+    """Latest price, day volume and running minute bar per symbol, flushed to the database on demand"""
+
+    def __init__(self):
+        rows = list(Ticker.objects.order_by('id').values_list('id', 'symbol', 'price', 'change', 'volume'))
+        self.ids = np.array([row[0] for row in rows], dtype=np.int64)
+        self.slots = {symbol: slot for slot, (_, symbol, *_) in enumerate(rows)}
+        self.slot_of_id = {row[0]: slot for slot, row in enumerate(rows)}
+        self.last = np.array([float(row[2]) for row in rows])
+        self.prev_close = np.array([float(row[2] - row[3]) for row in rows])
+        self.day = None
+        self.minute = None
+        self.volume = np.zeros(len(rows), dtype=np.int64)
+        self.ticker_dirty = np.zeros(len(rows), dtype=bool)
+        self.bar_dirty = np.zeros(len(rows), dtype=bool)
+        self.sealed = []            # finished minute bars waiting for the next flush_bars
+        self.ticks = 0
+        self.unknown = 0
+        self.ticker_writes = 0
+        self.bar_writes = 0
+        self._reset_minute()
+
+    def _reset_minute(self):
+        size = len(self.ids)
+        self.open = np.full(size, np.nan)
+        self.high = np.full(size, -np.inf)
+        self.low = np.full(size, np.inf)
+        self.close = np.full(size, np.nan)
+        self.bar_volume = np.zeros(size, dtype=np.int64)
+
+    def _start_day(self, day):
+        """Roll to ``day``, resuming its volume from any bar already stored for it"""
+        if self.day is not None:
+            self.flush_tickers()
+            self.flush_bars()
+            self.prev_close = self.last.copy()
+        else:
+            # Change is measured from the last close before the day, when there is one
+            previous = PriceBar.objects.filter(ticker=OuterRef('pk'), date__lt=day).order_by('-date')
+            for ticker_id, close in Ticker.objects.annotate(
+                prev_close=Subquery(previous.values('close')[:1])
+            ).filter(prev_close__isnull=False).values_list('id', 'prev_close'):
+                slot = self.slot_of_id.get(ticker_id)
+                if slot is not None:
+                    self.prev_close[slot] = float(close)
+        self.day = day
+        self.volume[:] = 0
+        for ticker_id, volume in PriceBar.objects.filter(date=day).values_list('ticker_id', 'volume'):
+            slot = self.slot_of_id.get(ticker_id)
+            if slot is not None:
+                self.volume[slot] = volume
+
+    def _start_minute(self, minute):
+        """Seal the current minute's bars and roll to ``minute``, resuming any bars stored for it"""
+        resume = self.minute is None
+        self._seal()
+        self.minute = minute
+        if resume:
+            for ticker_id, open_, high, low, close, volume in IntradayBar.objects.filter(
+                resolution=intraday.BASE, start=minute,
+            ).values_list('ticker_id', 'open', 'high', 'low', 'close', 'volume'):
+                slot = self.slot_of_id.get(ticker_id)
+                if slot is not None:
+                    self.open[slot], self.high[slot], self.low[slot] = float(open_), float(high), float(low)
+                    self.close[slot], self.bar_volume[slot] = float(close), volume
+
+    def _minute_bars(self, slots):
+        return [
+            (ticker_id, self.minute, _money(open_), _money(high), _money(low), _money(close), volume)
+            for ticker_id, open_, high, low, close, volume in zip(
+                self.ids[slots].tolist(), self.open[slots].tolist(), self.high[slots].tolist(),
+                self.low[slots].tolist(), self.close[slots].tolist(), self.bar_volume[slots].tolist(),
+            )
+        ]
+
+    def _seal(self):
+        slots = np.flatnonzero(self.bar_dirty)
+        if len(slots):
+            self.sealed.extend(self._minute_bars(slots))
+            self.bar_dirty[slots] = False
+        self._reset_minute()
+
+    def apply(self, symbols, prices, sizes, when):
+        day = timezone.localdate(when)
+        if day != self.day:
+            self._start_day(day)
+        minute = intraday.bucket_start(when, intraday.BASE)
+        if minute != self.minute:
+            self._start_minute(minute)
+
+        slots = np.fromiter((self.slots.get(symbol, -1) for symbol in symbols), dtype=np.int64, count=len(symbols))
+        prices = np.asarray(prices, dtype=np.float64)
+        sizes = np.asarray(sizes, dtype=np.int64)
+        known = (slots >= 0) & np.isfinite(prices) & (prices > 0) & (sizes >= 0)
+        self.unknown += int(len(slots) - known.sum())
+        if not known.all():
+            slots, prices, sizes = slots[known], prices[known], sizes[known]
+        if not len(slots):
+            return
+        self.ticks += len(slots)
+
+        touched, first = np.unique(slots, return_index=True)
+        _, from_end = np.unique(slots[::-1], return_index=True)
+        self.last[touched] = prices[len(slots) - 1 - from_end]
+        self.close[touched] = self.last[touched]
+        opening = np.isnan(self.open[touched])
+        self.open[touched[opening]] = prices[first[opening]]
+        np.maximum.at(self.high, slots, prices)
+        np.minimum.at(self.low, slots, prices)
+        traded = np.bincount(slots, weights=sizes, minlength=len(self.ids)).astype(np.int64)
+        self.volume += traded
+        self.bar_volume += traded
+        self.ticker_dirty[touched] = True
+        self.bar_dirty[touched] = True
+
+    def flush_tickers(self):
+        """Write price, change and day volume for symbols that traded since the last flush"""
+        slots = np.flatnonzero(self.ticker_dirty)
+        if not len(slots):
+            return 0
+        self.ticker_dirty[slots] = False
+
+        now = timezone.now()
+        last = self.last[slots]
+        change = last - self.prev_close[slots]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            change_pct = np.where(self.prev_close[slots] > 0, change / self.prev_close[slots] * 100, 0.0)
+        change_pct = np.clip(change_pct, -MAX_CHANGE_PCT, MAX_CHANGE_PCT)
+        stamp = connection.ops.adapt_datetimefield_value(now)
+        rows = [
+            (_money(price), _money(delta), _money(pct), volume, stamp, ticker_id)
+            for ticker_id, price, delta, pct, volume in zip(
+                self.ids[slots].tolist(), last.tolist(), change.tolist(),
+                change_pct.tolist(), self.volume[slots].tolist(),
+            )
+        ]
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.executemany(_update_sql(), rows)
+        self.ticker_writes += len(rows)
+
+        snapshot.invalidate()
+        alerts.process_tick(self.ids[slots], last, when=now)
+        matching.process_tick(self.ids[slots], last, when=now)
+        return len(rows)
+
+    def flush_bars(self):
+        """
+        Record the minute bars of symbols that traded since the last rollup,
+        including the unfinished current minute, and rebuild their rollups
+        """
+        slots = np.flatnonzero(self.bar_dirty)
+        bars, self.sealed = self.sealed + self._minute_bars(slots), []
+        self.bar_dirty[slots] = False
+        if not bars:
+            return 0
+        intraday.record(bars)
+        self.bar_writes += len(bars)
+        return len(bars)
+
+
+def run(coalescer, source, flush_seconds=FLUSH_SECONDS, bar_seconds=BAR_SECONDS, duration=None, report=None):
+    """
+    Feed ``source`` into ``coalescer`` until it is exhausted, ``duration``
+    seconds pass or the process is interrupted, flushing on the way out.
+    ``report(coalescer, seconds)`` is called after every Ticker flush.
+    """
+    started = time.monotonic()
+    next_flush = started + flush_seconds
+    next_bars = started + bar_seconds
+    try:
+        for symbols, prices, sizes, when in source.batches():
+            if len(symbols):
+                coalescer.apply(symbols, prices, sizes, when)
+            now = time.monotonic()
+            if now >= next_flush:
+                coalescer.flush_tickers()
+                next_flush = now + flush_seconds
+                if report:
+                    report(coalescer, now - started)
+            if now >= next_bars:
+                coalescer.flush_bars()
+                next_bars = now + bar_seconds
+            if duration is not None and now - started >= duration:
+                break
+    finally:
+        source.close()
+        coalescer.flush_tickers()
+        coalescer.flush_bars()
+    return time.monotonic() - started
+
+
+def _timestamp(value):
+    try:
+        return float(value)
+    except ValueError:
+        moment = datetime.fromisoformat(value)
+        if timezone.is_naive(moment):
+            moment = timezone.make_aware(moment)
+        return moment.timestamp()
+
+
+class ReplaySource:
+    """Replay a ``timestamp,symbol,price,size`` CSV as fast as it can be read, or at ``speed`` x real time"""
+
+    def __init__(self, path, speed=0, batch_size=BATCH_SIZE):
+        self.file = open(path, newline='')
+        self.speed = speed
+        self.batch_size = batch_size
+
+    def _rows(self):
+        """(timestamp, symbol, price, size) per row, skipping malformed rows as SocketSource does"""
+        reader = csv.reader(self.file)
+        for row in reader:
+            if len(row) < 4 or row[0] == 'timestamp':
+                continue
+            try:
+                yield _timestamp(row[0]), row[1].strip().upper(), float(row[2]), int(row[3])
+            except ValueError:
+                continue
+
+    def batches(self):
+        rows = self._rows()
+        wall_start = replay_start = None
+        minute = intraday.RESOLUTIONS[intraday.BASE]
+        while True:
+            chunk = [row for _, row in zip(range(self.batch_size), rows)]
+            if not chunk:
+                return
+            stamps = np.array([row[0] for row in chunk])
+            symbols = [row[1] for row in chunk]
+            prices = np.array([row[2] for row in chunk])
+            sizes = np.array([row[3] for row in chunk], dtype=np.int64)
+
+            start = 0
+            while start < len(chunk):
+                # Split at minute boundaries so each batch belongs to one minute bar
+                # (and so one trading day, since UTC offsets are whole minutes)
+                end = start + int(np.searchsorted(stamps[start:], (stamps[start] // minute + 1) * minute))
+                if self.speed:
+                    if wall_start is None:
+                        wall_start, replay_start = time.monotonic(), stamps[start]
+                    delay = (stamps[end - 1] - replay_start) / self.speed - (time.monotonic() - wall_start)
+                    if delay > 0:
+                        time.sleep(delay)
+                when = datetime.fromtimestamp(stamps[end - 1], tz=dt_timezone.utc)
+                yield symbols[start:end], prices[start:end], sizes[start:end], when
+                start = end
+
+    def close(self):
+        self.file.close()
+
+
+class SyntheticSource:
+    """Random-walk ticks over every ticker at ``rate`` ticks per second (0 for as fast as possible)"""
+
+    def __init__(self, rate=50000, interval=0.05, seed=None):
+        rows = list(Ticker.objects.filter(price__gt=0).values_list('symbol', 'price'))
+        self.symbols = np.array([symbol for symbol, _ in rows], dtype=object)
+        self.prices = np.array([float(price) for _, price in rows])
+        self.rate = rate
+        self.interval = interval
+        self.rng = np.random.default_rng(seed)
+
+    def batches(self):
+        if not len(self.symbols):
+            return
+        size = max(1, int(self.rate * self.interval)) if self.rate else BATCH_SIZE
+        next_at = time.monotonic()
+        while True:
+            slots = self.rng.integers(0, len(self.symbols), size)
+            # Roughly 2% daily volatility spread over a trading day of ticks
+            steps = np.exp(self.rng.normal(0, 0.0002, size))
+            np.multiply.at(self.prices, slots, steps)
+            np.maximum(self.prices, 0.01, out=self.prices)
+            yield self.symbols[slots].tolist(), self.prices[slots].round(2), self.rng.integers(1, 500, size), timezone.now()
+            if self.rate:
+                next_at += self.interval
+                delay = next_at - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+
+    def close(self):
+        pass
+
+
+class SocketSource:
+    """Ticks written as ``symbol,price,size`` lines by any number of TCP clients"""
+
+    def __init__(self, host='127.0.0.1', port=9009, interval=0.1):
+        self.server = socket.create_server((host, port))
+        self.server.setblocking(False)
+        self.selector = selectors.DefaultSelector()
+        self.selector.register(self.server, selectors.EVENT_READ)
+        self.buffers = {}
+        self.interval = interval
+
+    def _accept(self):
+        conn, _ = self.server.accept()
+        conn.setblocking(False)
+        self.buffers[conn] = b''
+        self.selector.register(conn, selectors.EVENT_READ)
+
+    def _read(self, conn, lines):
+        data = conn.recv(65536)
+        if not data:
+            self.selector.unregister(conn)
+            conn.close()
+            lines.append(self.buffers.pop(conn))
+            return
+        *complete, self.buffers[conn] = (self.buffers[conn] + data).split(b'\n')
+        lines.extend(complete)
+
+    def batches(self):
+        while True:
+            deadline = time.monotonic() + self.interval
+            lines = []
+            while len(lines) < BATCH_SIZE:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                for key, _ in self.selector.select(timeout):
+                    if key.fileobj is self.server:
+                        self._accept()
+                    else:
+                        self._read(key.fileobj, lines)
+
+            symbols, prices, sizes = [], [], []
+            for line in lines:
+                parts = line.split(b',')
+                if len(parts) < 3:
+                    continue
+                try:
+                    price, size = float(parts[1]), int(parts[2])
+                except ValueError:
+                    continue
+                symbols.append(parts[0].strip().upper().decode('ascii', 'replace'))
+                prices.append(price)
+                sizes.append(size)
+            yield symbols, np.array(prices), np.array(sizes, dtype=np.int64), timezone.now()
+
+    def close(self):
+        for conn in list(self.buffers):
+            conn.close()
+        self.selector.close()
+        self.server.close()
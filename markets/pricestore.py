@@ -0,0 +1,261 @@
+"""
+Columnar, memory-mapped store for daily PriceBar data.
+
+Each ticker's bars live in ``settings.PRICE_STORE_DIR/<ticker_id>.npy`` as a
+single ``(6, n)`` int64 array whose rows are date (days since epoch), open,
+high, low, close and volume. Prices are scaled by ``PRICE_SCALE`` so they stay
+exact for the two decimal places ``PriceBar`` stores. The array is stored in
+Fortran order, so each bar is contiguous: a date-range read is one block of a
+memory map and never touches the ORM, and a new last bar is appended in place
+without rewriting the history.
+
+The store is optional: it is enabled by setting ``PRICE_STORE_DIR`` and kept
+in sync with ``PriceBar`` saves and deletes by the receivers in
+``markets.signals``, once the transaction that wrote them commits. Bulk writes
+that bypass signals should call ``rebuild``.
+
+Writers take an exclusive lock on ``<ticker_id>.lock`` next to the array, so
+writes from several processes are applied one at a time. Replacing a bar or
+appending one only touches that bar; inserting into the middle of the
+history or deleting rewrites the file, atomically. Readers do not lock. An
+append writes the bar before the header that makes it visible, and ``_load``
+retries a header it caught half-written.
+"""
+import io
+import os
+import tempfile
+from contextlib import contextmanager
+from datetime import date
+from decimal import Decimal
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+
+try:
+    import fcntl
+except ImportError:     # Windows
+    import msvcrt
+    fcntl = None
+
+PRICE_SCALE = 100
+DATE, OPEN, HIGH, LOW, CLOSE, VOLUME = range(6)
+FIELDS = ('date', 'open', 'high', 'low', 'close', 'volume')
+EPOCH = date(1970, 1, 1)
+LOAD_ATTEMPTS = 3
+
+
+def is_enabled():
+    return bool(getattr(settings, 'PRICE_STORE_DIR', None))
+
+
+def _path(ticker_id):
+    return Path(settings.PRICE_STORE_DIR) / f'{ticker_id}.npy'
+
+
+def to_day(value):
+    return (value - EPOCH).days
+
+
+def _to_scaled(value):
+    return int((Decimal(str(value)) * PRICE_SCALE).to_integral_value())
+
+
+class PriceSeries:
+    """A read-only slice of one ticker's bars"""
+
+    def __init__(self, data):
+        self.data = data
+
+    def __len__(self):
+        return self.data.shape[1]
+
+    @property
+    def dates(self):
+        return self.data[DATE].astype('datetime64[D]')
+
+    def prices(self, field):
+        return self.data[FIELDS.index(field)] / PRICE_SCALE
+
+    @property
+    def volume(self):
+        return self.data[VOLUME]
+
+    def rows(self):
+        """(iso date, open, high, low, close, volume) tuples, oldest first"""
+        return list(zip(
+            np.datetime_as_string(self.dates).tolist(),
+            self.prices('open').tolist(),
+            self.prices('high').tolist(),
+            self.prices('low').tolist(),
+            self.prices('close').tolist(),
+            self.volume.tolist(),
+        ))
+
+
+@contextmanager
+def _locked(ticker_id):
+    """Hold the ticker's write lock, which also excludes other processes"""
+    root = Path(settings.PRICE_STORE_DIR)
+    root.mkdir(parents=True, exist_ok=True)
+    with open(root / f'{ticker_id}.lock', 'a+b') as fh:
+        if fcntl:
+            fcntl.flock(fh, fcntl.LOCK_EX)
+        else:
+            fh.seek(0)
+            msvcrt.locking(fh.fileno(), msvcrt.LK_LOCK, 1)
+        # Closing the file releases the lock
+        yield
+
+
+def _load(ticker_id, mmap=True):
+    path = _path(ticker_id)
+    for attempt in range(LOAD_ATTEMPTS):
+        try:
+            return np.load(path, mmap_mode='r' if mmap else None)
+        except FileNotFoundError:
+            return None
+        except ValueError:
+            # The header of an append in progress claims a bar not yet in the file
+            if attempt == LOAD_ATTEMPTS - 1:
+                raise
+
+
+def read(ticker_id, start=None, end=None, limit=None):
+    """
+    Return the bars for ``ticker_id`` between ``start`` and ``end`` (inclusive
+    dates), keeping only the last ``limit`` of them. Returns None when the
+    ticker has not been written to the store.
+    """
+    data = _load(ticker_id)
+    if data is None:
+        return None
+
+    days = data[DATE]
+    lo = 0 if start is None else int(np.searchsorted(days, to_day(start), 'left'))
+    hi = len(days) if end is None else int(np.searchsorted(days, to_day(end), 'right'))
+    if limit is not None:
+        lo = max(lo, hi - limit)
+    return PriceSeries(data[:, lo:hi])
+
+
+def _replace(ticker_id, data):
+    root = Path(settings.PRICE_STORE_DIR)
+    root.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=root, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as fh:
+            np.save(fh, np.asfortranarray(data, dtype=np.int64))
+        os.replace(tmp, _path(ticker_id))
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def write(ticker_id, data):
+    """Atomically replace the stored array for ``ticker_id``"""
+    with _locked(ticker_id):
+        _replace(ticker_id, data)
+
+
+def _append(ticker_id, column):
+    """
+    Append one bar to a Fortran-ordered file in place. Returns False when the
+    file is not laid out for it, e.g. it was written in C order by an older
+    version, or its header has no room for the longer shape.
+    """
+    with open(_path(ticker_id), 'r+b') as fh:
+        version = np.lib.format.read_magic(fh)
+        if version != (1, 0):
+            return False
+        shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(fh)
+        offset = fh.tell()
+        if not fortran_order or dtype != np.int64 or shape[0] != len(FIELDS):
+            return False
+
+        header = io.BytesIO()
+        np.lib.format.write_array_header_1_0(header, {
+            'descr': np.lib.format.dtype_to_descr(dtype), 'fortran_order': True, 'shape': (shape[0], shape[1] + 1),
+        })
+        if len(header.getvalue()) != offset:
+            return False
+
+        # Write after the last bar the header knows about, in case an earlier
+        # append died between its bar and its header
+        fh.seek(offset + shape[1] * column.nbytes)
+        fh.write(np.ascontiguousarray(column, dtype=np.int64).tobytes())
+        fh.truncate()
+        fh.flush()
+        fh.seek(0)
+        fh.write(header.getvalue())
+    return True
+
+
+def from_rows(rows):
+    """Build a store array from (date, open, high, low, close, volume) rows"""
+    rows = list(rows)
+    data = np.empty((len(FIELDS), len(rows)), dtype=np.int64)
+    for i, (day, open_, high, low, close, volume) in enumerate(rows):
+        data[:, i] = (
+            to_day(day), _to_scaled(open_), _to_scaled(high),
+            _to_scaled(low), _to_scaled(close), volume,
+        )
+    return data
+
+
+def _rebuild(ticker_id):
+    from .models import PriceBar
+
+    rows = PriceBar.objects.filter(ticker_id=ticker_id).order_by('date').values_list(*FIELDS)
+    data = from_rows(rows.iterator(chunk_size=5000))
+    _replace(ticker_id, data)
+    return data.shape[1]
+
+
+def rebuild(ticker_id):
+    """Rewrite one ticker's arrays from the database; returns the bar count"""
+    # Locked across the query too, so a bar upserted meanwhile lands on top
+    with _locked(ticker_id):
+        return _rebuild(ticker_id)
+
+
+def upsert_bar(bar):
+    """Insert or replace a single saved PriceBar"""
+    column = from_rows([(bar.date, bar.open, bar.high, bar.low, bar.close, bar.volume)])[:, 0]
+    with _locked(bar.ticker_id):
+        data = _load(bar.ticker_id)
+        if data is None:
+            _rebuild(bar.ticker_id)
+            return
+
+        days = data[DATE]
+        pos = int(np.searchsorted(days, column[DATE]))
+        if pos < len(days) and days[pos] == column[DATE]:
+            stored = np.load(_path(bar.ticker_id), mmap_mode='r+')
+            stored[:, pos] = column
+            del stored
+        elif pos < len(days) or not _append(bar.ticker_id, column):
+            merged = np.insert(data, pos, column, axis=1)
+            # Unmap before the file is replaced, which Windows requires
+            del data, days
+            _replace(bar.ticker_id, merged)
+
+
+def delete_bar(bar):
+    """Drop a deleted PriceBar from the store"""
+    with _locked(bar.ticker_id):
+        data = _load(bar.ticker_id, mmap=False)
+        if data is None:
+            return
+        pos = int(np.searchsorted(data[DATE], to_day(bar.date)))
+        if pos < data.shape[1] and data[DATE, pos] == to_day(bar.date):
+            _replace(bar.ticker_id, np.delete(data, pos, axis=1))
+
+
+def remove(ticker_id):
+    """Forget a ticker entirely"""
+    with _locked(ticker_id):
+        try:
+            _path(ticker_id).unlink()
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,277 @@
+"""
+Request profiling for ``ProfilingMiddleware``.
+
+The middleware times every request and files it under its URL name. A
+``PROFILE_SAMPLE_RATE`` share of requests is also profiled. For those it
+records the count and time of SQL statements (through a database execute
+wrapper), the time spent rendering templates, and the top cProfile frames
+by own time. Template time is the cumulative time of the template backend's
+``render``, so includes and nested tags are counted once.
+
+Profiling inflates a sampled request's own wall time, so the latency
+figures come from every request and the breakdown only from the samples.
+
+Results go to an in-process ``Registry``, which feeds the Prometheus
+``/metrics`` endpoint and the staff slow-endpoints page. Every sampled request
+is also written as one JSON line to ``PROFILE_LOG`` when that is set, which
+rotates at ``PROFILE_LOG_MAX_BYTES``. Each server process keeps its own
+registry, and the log is where the processes meet.
+"""
+import cProfile
+import heapq
+import json
+import logging
+import os
+import pstats
+import random
+import threading
+import time
+from collections import deque
+from contextlib import ExitStack
+from logging.handlers import RotatingFileHandler
+
+import numpy as np
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+RECENT = 1000           # wall times kept per view for percentiles
+TOP_FRAMES = 15
+SLOWEST = 50            # sampled requests kept for the slow-endpoints page
+TEMPLATE_RENDER = ('django/template/backends/django.py', 'render')
+
+
+class _ViewStats:
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.max = 0.0
+        self.buckets = [0] * len(BUCKETS)
+        self.recent = deque(maxlen=RECENT)
+        self.errors = 0
+        self.sampled = 0
+        self.sql_queries = 0
+        self.sql_seconds = 0.0
+        self.template_seconds = 0.0
+
+
+class Registry:
+    """Per-view request statistics and the slowest sampled requests, shared by all threads"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.views = {}
+        self.slowest = []   # min-heap of (wall seconds, sequence, record)
+        self.sequence = 0
+
+    def observe(self, view, seconds, status):
+        with self.lock:
+            stats = self.views.get(view)
+            if stats is None:
+                stats = self.views[view] = _ViewStats()
+            stats.count += 1
+            stats.seconds += seconds
+            stats.max = max(stats.max, seconds)
+            stats.recent.append(seconds)
+            if status >= 500:
+                stats.errors += 1
+            for i, bound in enumerate(BUCKETS):
+                if seconds <= bound:
+                    stats.buckets[i] += 1
+                    break
+
+    def observe_sample(self, record):
+        with self.lock:
+            stats = self.views[record['view']]
+            stats.sampled += 1
+            stats.sql_queries += record['sql_queries']
+            stats.sql_seconds += record['sql_seconds']
+            stats.template_seconds += record['template_seconds']
+            self.sequence += 1
+            entry = (record['seconds'], self.sequence, record)
+            if len(self.slowest) < getattr(settings, 'PROFILE_SLOWEST', SLOWEST):
+                heapq.heappush(self.slowest, entry)
+            else:
+                heapq.heappushpop(self.slowest, entry)
+
+    def summary(self):
+        """One dict per view, slowest mean first, with times in milliseconds"""
+        with self.lock:
+            rows = []
+            for view, stats in self.views.items():
+                recent = np.array(stats.recent) * 1000
+                sampled = stats.sampled or 1
+                rows.append({
+                    'view': view,
+                    'count': stats.count,
+                    'errors': stats.errors,
+                    'mean_ms': stats.seconds / stats.count * 1000,
+                    'p50_ms': float(np.percentile(recent, 50)),
+                    'p95_ms': float(np.percentile(recent, 95)),
+                    'max_ms': stats.max * 1000,
+                    'sampled': stats.sampled,
+                    'sql_queries': stats.sql_queries / sampled,
+                    'sql_ms': stats.sql_seconds / sampled * 1000,
+                    'template_ms': stats.template_seconds / sampled * 1000,
+                })
+        return sorted(rows, key=lambda row: -row['mean_ms'])
+
+    def slowest_requests(self):
+        with self.lock:
+            return [record for _, _, record in sorted(self.slowest, reverse=True)]
+
+    def prometheus(self):
+        """The registry in the Prometheus text exposition format"""
+        lines = [
+            '# HELP markets_request_duration_seconds Request wall time by view.',
+            '# TYPE markets_request_duration_seconds histogram',
+        ]
+        with self.lock:
+            views = sorted(self.views.items())
+            for view, stats in views:
+                label = view.replace('\\', '\\\\').replace('"', '\\"')
+                cumulative = 0
+                for bound, count in zip(BUCKETS, stats.buckets):
+                    cumulative += count
+                    lines.append(f'markets_request_duration_seconds_bucket{{view="{label}",le="{bound}"}} {cumulative}')
+                lines.append(f'markets_request_duration_seconds_bucket{{view="{label}",le="+Inf"}} {stats.count}')
+                lines.append(f'markets_request_duration_seconds_sum{{view="{label}"}} {stats.seconds:.6f}')
+                lines.append(f'markets_request_duration_seconds_count{{view="{label}"}} {stats.count}')
+            counters = [
+                ('markets_request_errors_total', 'Responses with a 5xx status.', 'errors'),
+                ('markets_profiled_requests_total', 'Requests sampled for profiling.', 'sampled'),
+                ('markets_profiled_sql_queries_total', 'SQL statements run by sampled requests.', 'sql_queries'),
+                ('markets_profiled_sql_seconds_total', 'SQL time of sampled requests.', 'sql_seconds'),
+                ('markets_profiled_template_seconds_total', 'Template render time of sampled requests.', 'template_seconds'),
+            ]
+            for name, help_text, field in counters:
+                lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+                for view, stats in views:
+                    label = view.replace('\\', '\\\\').replace('"', '\\"')
+                    lines.append(f'{name}{{view="{label}"}} {getattr(stats, field)}')
+        return '\n'.join(lines) + '\n'
+
+    def reset(self):
+        with self.lock:
+            self.views.clear()
+            self.slowest.clear()
+
+
+registry = Registry()
+
+
+def _frame_name(filename, line, function):
+    root = str(settings.BASE_DIR)
+    if filename.startswith(root):
+        filename = os.path.relpath(filename, root)
+    elif os.sep in filename:
+        filename = os.path.join(*filename.split(os.sep)[-3:])
+    return f'{filename}:{line}({function})'
+
+
+def _breakdown(profiler, limit):
+    """Template render seconds and the ``limit`` frames with the most own time"""
+    stats = pstats.Stats(profiler).stats
+    template = sum(
+        cumulative for (filename, _, function), (_, _, _, cumulative, _) in stats.items()
+        if function == TEMPLATE_RENDER[1] and filename.replace(os.sep, '/').endswith(TEMPLATE_RENDER[0])
+    )
+    top = heapq.nlargest(limit, stats.items(), key=lambda item: item[1][2])
+    frames = [
+        {'frame': _frame_name(*key), 'calls': calls, 'own_ms': own * 1000, 'cumulative_ms': cumulative * 1000}
+        for key, (_, calls, own, cumulative, _) in top
+    ]
+    return template, frames
+
+
+class _SqlTimer:
+
+    def __init__(self):
+        self.queries = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - started
+            self.queries += 1
+
+
+def _log_handler(path):
+    handler = RotatingFileHandler(
+        path, maxBytes=getattr(settings, 'PROFILE_LOG_MAX_BYTES', 10 * 1024 * 1024), backupCount=3,
+    )
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    return handler
+
+
+class ProfilingMiddleware:
+    """Times every request and profiles a ``PROFILE_SAMPLE_RATE`` share of them"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.rate = getattr(settings, 'PROFILE_SAMPLE_RATE', 0.01)
+        self.top_frames = getattr(settings, 'PROFILE_TOP_FRAMES', TOP_FRAMES)
+        self.log = None
+        path = getattr(settings, 'PROFILE_LOG', None)
+        if path:
+            self.log = logging.getLogger(f'{__name__}.requests')
+            self.log.propagate = False
+            self.log.setLevel(logging.INFO)
+            if not self.log.handlers:
+                self.log.addHandler(_log_handler(path))
+
+    def __call__(self, request):
+        if self.rate and random.random() < self.rate:
+            return self._profile(request)
+        started = time.perf_counter()
+        response = self.get_response(request)
+        registry.observe(self._view(request), time.perf_counter() - started, response.status_code)
+        return response
+
+    def _view(self, request):
+        match = getattr(request, 'resolver_match', None)
+        return match.view_name if match else '<unresolved>'
+
+    def _profile(self, request):
+        timer = _SqlTimer()
+        profiler = cProfile.Profile()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(timer))
+            try:
+                profiler.enable()
+            except ValueError:
+                # Another profiler is already running on this thread
+                profiler = None
+            started = time.perf_counter()
+            try:
+                response = self.get_response(request)
+            finally:
+                seconds = time.perf_counter() - started
+                if profiler:
+                    profiler.disable()
+
+        view = self._view(request)
+        registry.observe(view, seconds, response.status_code)
+        template, frames = _breakdown(profiler, self.top_frames) if profiler else (0.0, [])
+        record = {
+            'at': timezone.now().isoformat(),
+            'view': view,
+            'method': request.method,
+            'path': request.get_full_path(),
+            'status': response.status_code,
+            'seconds': seconds,
+            'sql_queries': timer.queries,
+            'sql_seconds': timer.seconds,
+            'template_seconds': template,
+            'frames': frames,
+        }
+        registry.observe_sample(record)
+        if self.log:
+            self.log.info(json.dumps(record))
+        return response
@@ -0,0 +1,230 @@
+"""
+Live Ticker updates pushed to browsers over a raw ASGI WebSocket.
+
+Clients connect to ``/ws/tickers/`` and send ``{"action": "subscribe",
+"symbols": [...]}`` (or ``"unsubscribe"``). While anyone is connected, one
+``TickerFeed`` per worker polls the Ticker table every
+``REALTIME_TICK_SECONDS`` and publishes only the price, change, change_pct
+and volume fields that moved since the last tick. The broker fans each tick
+out to the symbols' subscribers, and every subscriber receives at most one
+``{"type": "ticks", "data": {symbol: fields}}`` frame per tick. A client that
+falls behind has pending deltas merged per symbol instead of queued, so its
+memory stays bounded by the symbols it follows.
+
+The broker is chosen by ``REALTIME_BROKER``. ``LocalBroker`` keeps everything
+inside the worker process; a cross-process broker only needs the same
+``subscribe`` / ``unsubscribe`` / ``publish`` methods.
+"""
+import asyncio
+import json
+import logging
+from collections import defaultdict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+FIELDS = ('price', 'change', 'change_pct', 'volume')
+logger = logging.getLogger(__name__)
+MAX_SYMBOLS = 500
+
+
+class Subscriber:
+    """One connection's pending deltas, merged per symbol until sent"""
+    __slots__ = ('symbols', 'pending', 'ready')
+
+    def __init__(self):
+        self.symbols = set()
+        self.pending = {}
+        self.ready = asyncio.Event()
+
+    def push(self, symbol, fields, encoded):
+        previous = self.pending.get(symbol)
+        if previous is None:
+            self.pending[symbol] = (fields, encoded)
+        else:
+            self.pending[symbol] = ({**previous[0], **fields}, None)
+        self.ready.set()
+
+    def drain(self):
+        parts = [
+            f'{json.dumps(symbol)}:{encoded or json.dumps(fields)}'
+            for symbol, (fields, encoded) in self.pending.items()
+        ]
+        self.pending = {}
+        self.ready.clear()
+        return '{"type":"ticks","data":{' + ','.join(parts) + '}}'
+
+
+class LocalBroker:
+    """In-process pub/sub keyed by symbol"""
+
+    def __init__(self):
+        self.channels = defaultdict(set)
+        self.subscribers = set()
+
+    def subscribe(self, subscriber, symbols):
+        self.subscribers.add(subscriber)
+        for symbol in symbols:
+            self.channels[symbol].add(subscriber)
+        subscriber.symbols.update(symbols)
+
+    def unsubscribe(self, subscriber, symbols=None):
+        leaving = symbols is None
+        symbols = set(subscriber.symbols if leaving else symbols)
+        for symbol in symbols:
+            channel = self.channels.get(symbol)
+            if channel is not None:
+                channel.discard(subscriber)
+                if not channel:
+                    del self.channels[symbol]
+        subscriber.symbols -= symbols
+        if leaving:
+            self.subscribers.discard(subscriber)
+
+    def publish(self, deltas):
+        """Deliver ``{symbol: changed fields}`` to everyone following those symbols"""
+        for symbol, fields in deltas.items():
+            channel = self.channels.get(symbol)
+            if channel:
+                encoded = json.dumps(fields)
+                for subscriber in channel:
+                    subscriber.push(symbol, fields, encoded)
+
+    def __len__(self):
+        return len(self.subscribers)
+
+
+_broker = None
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        _broker = import_string(getattr(settings, 'REALTIME_BROKER', 'markets.realtime.LocalBroker'))()
+    return _broker
+
+
+class TickerFeed:
+    """Polls Ticker for changed rows and publishes field-level deltas"""
+
+    def __init__(self, broker):
+        self.broker = broker
+        self.state = {}
+        self.since = None
+        self.task = None
+
+    def _changed_rows(self):
+        from .models import Ticker
+
+        tickers = Ticker.objects.all()
+        if self.since is not None:
+            # >= so rows saved within the same timestamp as the last poll are
+            # seen again; unchanged fields are dropped by the diff below
+            tickers = tickers.filter(last_updated__gte=self.since)
+        return list(tickers.values_list('symbol', 'last_updated', *FIELDS))
+
+    def diff(self, rows):
+        deltas = {}
+        for symbol, last_updated, price, change, change_pct, volume in rows:
+            if self.since is None or last_updated > self.since:
+                self.since = last_updated
+            current = {
+                'price': float(price), 'change': float(change),
+                'change_pct': float(change_pct), 'volume': volume,
+            }
+            known = self.state.get(symbol)
+            if known is None:
+                changed = current
+            else:
+                changed = {field: value for field, value in current.items() if known[field] != value}
+            if changed:
+                self.state[symbol] = current
+                deltas[symbol] = changed
+        return deltas
+
+    async def poll(self):
+        deltas = self.diff(await sync_to_async(self._changed_rows)())
+        if deltas:
+            self.broker.publish(deltas)
+
+    async def run(self):
+        interval = getattr(settings, 'REALTIME_TICK_SECONDS', 0.5)
+        try:
+            while len(self.broker):
+                try:
+                    await self.poll()
+                except Exception:
+                    # A failed poll (say, the database restarting) is retried
+                    # on the next tick rather than ending the feed
+                    logger.exception('Ticker poll failed')
+                await asyncio.sleep(interval)
+        finally:
+            self.task = None
+
+    def start(self):
+        if self.task is None:
+            self.task = asyncio.get_running_loop().create_task(self.run())
+
+
+_feed = None
+
+
+def get_feed():
+    global _feed
+    if _feed is None:
+        _feed = TickerFeed(get_broker())
+    return _feed
+
+
+async def _pump(subscriber, send):
+    while True:
+        await subscriber.ready.wait()
+        await send({'type': 'websocket.send', 'text': subscriber.drain()})
+
+
+def _handle(message, subscriber, broker, feed):
+    try:
+        request = json.loads(message)
+        action = request['action']
+        symbols = {str(symbol).upper() for symbol in request.get('symbols', [])}
+    except (ValueError, KeyError, TypeError, AttributeError):
+        return {'type': 'error', 'error': 'Expected {"action": ..., "symbols": [...]}'}
+
+    if action == 'subscribe':
+        symbols = set(list(symbols - subscriber.symbols)[:max(MAX_SYMBOLS - len(subscriber.symbols), 0)])
+        broker.subscribe(subscriber, symbols)
+        # Newcomers get the current values of anything the feed already knows
+        for symbol in symbols:
+            if symbol in feed.state:
+                subscriber.push(symbol, feed.state[symbol], None)
+        feed.start()
+    elif action == 'unsubscribe':
+        broker.unsubscribe(subscriber, symbols & subscriber.symbols)
+    else:
+        return {'type': 'error', 'error': f'Unknown action {action!r}'}
+    return {'type': 'subscribed', 'symbols': sorted(subscriber.symbols)}
+
+
+async def ticker_socket(scope, receive, send):
+    """ASGI application for ``/ws/tickers/``"""
+    message = await receive()
+    if message['type'] != 'websocket.connect':
+        return
+    await send({'type': 'websocket.accept'})
+
+    broker = get_broker()
+    feed = get_feed()
+    subscriber = Subscriber()
+    pump = asyncio.create_task(_pump(subscriber, send))
+    try:
+        while True:
+            message = await receive()
+            if message['type'] == 'websocket.disconnect':
+                break
+            if message['type'] == 'websocket.receive' and message.get('text'):
+                reply = _handle(message['text'], subscriber, broker, feed)
+                await send({'type': 'websocket.send', 'text': json.dumps(reply)})
+    finally:
+        pump.cancel()
+        broker.unsubscribe(subscriber)
@@ -0,0 +1,183 @@
+"""
+Risk statistics over daily close histories.
+
+Functions accept closes with time on the last axis, so a universe of tickers
+is a 2-D ``(tickers, days)`` array and is handled in one vectorized pass.
+Missing closes are NaN; each statistic only uses the days a ticker traded.
+"""
+import math
+
+import numpy as np
+
+TRADING_DAYS = 252
+
+
+def daily_returns(closes):
+    """Simple returns between consecutive closes; NaN where either close is missing"""
+    closes = np.asarray(closes, dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return closes[..., 1:] / closes[..., :-1] - 1
+
+
+# np.nanmean and np.nanstd warn through the warnings module on empty and
+# one-value rows, which np.errstate cannot silence; these reduce by hand, as
+# beta does, and leave NaN for such rows
+
+def _nanmean(returns):
+    valid = ~np.isnan(returns)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(valid, returns, 0.0).sum(axis=-1) / valid.sum(axis=-1)
+
+
+def _nanstd(returns):
+    valid = ~np.isnan(returns)
+    count = valid.sum(axis=-1)
+    deviations = np.where(valid, returns - _nanmean(returns)[..., np.newaxis], 0.0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        std = np.sqrt((deviations ** 2).sum(axis=-1) / (count - 1))
+    return np.where(count > 1, std, np.nan)
+
+
+def annualized_volatility(returns):
+    """Annualized standard deviation of daily returns"""
+    with np.errstate(invalid='ignore'):
+        return _nanstd(returns) * math.sqrt(TRADING_DAYS)
+
+
+def sharpe_ratio(returns, risk_free_rate=0.0):
+    """Annualized Sharpe ratio of daily returns against an annual risk-free rate"""
+    with np.errstate(invalid='ignore', divide='ignore'):
+        excess = _nanmean(returns - risk_free_rate / TRADING_DAYS)
+        std = _nanstd(returns)
+        return np.where(std > 0, excess / std * math.sqrt(TRADING_DAYS), np.nan)
+
+
+def max_drawdown(closes):
+    """Largest peak-to-trough fall as a fraction of the peak"""
+    closes = np.asarray(closes, dtype=float)
+    peaks = np.fmax.accumulate(closes, axis=-1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        drawdown = 1 - closes / peaks
+    valid = ~np.isnan(drawdown)
+    return np.where(valid.any(axis=-1), np.nanmax(np.where(valid, drawdown, -np.inf), axis=-1), np.nan)
+
+
+def beta(returns, benchmark_returns):
+    """Beta of each return series against the benchmark over shared days"""
+    returns = np.asarray(returns, dtype=float)
+    benchmark = np.broadcast_to(benchmark_returns, returns.shape)
+    valid = ~np.isnan(returns) & ~np.isnan(benchmark)
+    count = valid.sum(axis=-1)
+
+    r = np.where(valid, returns, 0.0)
+    m = np.where(valid, benchmark, 0.0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        r_mean = r.sum(axis=-1) / count
+        m_mean = m.sum(axis=-1) / count
+        covariance = (r * m).sum(axis=-1) / count - r_mean * m_mean
+        variance = (m * m).sum(axis=-1) / count - m_mean ** 2
+        return np.where((count > 1) & (variance > 0), covariance / variance, np.nan)
+
+
+def metrics(closes, benchmark_closes, risk_free_rate=0.0):
+    """
+    Beta, annualized volatility, Sharpe ratio and max drawdown for every row
+    of ``closes``, aligned day-for-day with ``benchmark_closes``.
+    """
+    closes = np.asarray(closes, dtype=float)
+    returns = daily_returns(closes)
+    return {
+        'beta': beta(returns, daily_returns(benchmark_closes)),
+        'volatility': annualized_volatility(returns),
+        'sharpe': sharpe_ratio(returns, risk_free_rate),
+        'max_drawdown': max_drawdown(closes),
+    }
+
+
+def close_matrix(ticker_ids, dates):
+    """
+    Closes for each ticker (rows) on each of the sorted ``dates`` (columns),
+    NaN where a ticker has no bar that day.
+    """
+    from django.db.models import FloatField
+    from django.db.models.functions import Cast
+
+    from . import pricestore
+    from .models import PriceBar
+
+    matrix = np.full((len(ticker_ids), len(dates)), np.nan)
+    if not dates:
+        return matrix
+
+    rows = {ticker_id: i for i, ticker_id in enumerate(ticker_ids)}
+    missing = []
+    if pricestore.is_enabled():
+        wanted = np.array([pricestore.to_day(d) for d in dates])
+        for ticker_id, row in rows.items():
+            series = pricestore.read(ticker_id, start=dates[0], end=dates[-1])
+            if series is None:
+                missing.append(ticker_id)
+                continue
+            days = series.data[pricestore.DATE]
+            pos = np.searchsorted(days, wanted).clip(max=max(len(days) - 1, 0))
+            found = (days[pos] == wanted) if len(days) else np.zeros(len(wanted), dtype=bool)
+            matrix[row, found] = series.prices('close')[pos[found]]
+    else:
+        missing = list(ticker_ids)
+
+    if missing:
+        columns = {d: i for i, d in enumerate(dates)}
+        bars = PriceBar.objects.filter(
+            ticker_id__in=missing, date__gte=dates[0], date__lte=dates[-1]
+        ).annotate(close_f=Cast('close', FloatField())).values_list('ticker_id', 'date', 'close_f')
+        for ticker_id, day, close in bars.iterator(chunk_size=10000):
+            column = columns.get(day)
+            if column is not None:
+                matrix[rows[ticker_id], column] = close
+    return matrix
+
+
+def materialize(benchmark, lookback=TRADING_DAYS, risk_free_rate=0.0, tickers=None):
+    """
+    Compute metrics for every ticker against ``benchmark`` over its last
+    ``lookback`` sessions and upsert them into RiskMetric. Returns the count.
+    """
+    from .models import PriceBar, RiskMetric, Ticker
+
+    dates = list(reversed(
+        PriceBar.objects.filter(ticker=benchmark).order_by('-date').values_list('date', flat=True)[:lookback + 1]
+    ))
+    if len(dates) < 2:
+        return 0
+
+    if tickers is None:
+        tickers = Ticker.objects.filter(is_index=False)
+    ticker_ids = list(tickers.exclude(id=benchmark.id).values_list('id', flat=True))
+    closes = close_matrix(ticker_ids, dates)
+    benchmark_closes = close_matrix([benchmark.id], dates)[0]
+    results = metrics(closes, benchmark_closes, risk_free_rate)
+
+    def clean(value):
+        return None if np.isnan(value) else round(float(value), 6)
+
+    rows = [
+        RiskMetric(
+            ticker_id=ticker_id,
+            benchmark=benchmark,
+            as_of=dates[-1],
+            lookback_days=len(dates) - 1,
+            beta=clean(results['beta'][i]),
+            volatility=clean(results['volatility'][i]),
+            sharpe=clean(results['sharpe'][i]),
+            max_drawdown=clean(results['max_drawdown'][i]),
+        )
+        for i, ticker_id in enumerate(ticker_ids)
+    ]
+    RiskMetric.objects.bulk_create(
+        rows,
+        batch_size=1000,
+        update_conflicts=True,
+        unique_fields=['ticker', 'benchmark'],
+        update_fields=['as_of', 'lookback_days', 'beta', 'volatility', 'sharpe', 'max_drawdown', 'computed_at'],
+    )
+    return len(rows)
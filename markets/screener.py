@@ -0,0 +1,266 @@
+"""
+Declarative stock screener.
+
+A screen is a dict::
+
+    {
+        'filters': [['rsi', 'lt', 30], ['sector', 'in', ['IT', 'Banking']]],
+        'sort': '-change_pct',
+        'page': 1,
+        'page_size': 50,
+    }
+
+``compile_spec`` turns it into one Ticker query joined to TickerStats, where
+every filterable field is backed by an index (see the ``Ticker`` and
+``TickerStats`` Meta). Indicator-style fields such as RSI, distance from the
+52-week range and average volume are precomputed by ``compute_stats`` so a
+screen never touches PriceBar.
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+import numpy as np
+from django.core.paginator import Paginator
+from django.db.models import F, FloatField, Q
+from django.db.models.functions import Cast
+
+from . import indicators, pricestore
+from .models import PriceBar, Ticker, TickerStats
+
+# Public field name -> ORM lookup path
+FIELDS = {
+    'price': 'price',
+    'change_pct': 'change_pct',
+    'volume': 'volume',
+    'sector': 'sector',
+    'rsi': 'stats__rsi_14',
+    'pct_from_high': 'stats__pct_from_high',
+    'pct_from_low': 'stats__pct_from_low',
+    'avg_volume': 'stats__avg_volume_20',
+    'market_cap': 'stats__market_cap',
+}
+TEXT_FIELDS = {'sector'}
+OPERATORS = {'eq': 'exact', 'gt': 'gt', 'gte': 'gte', 'lt': 'lt', 'lte': 'lte', 'in': 'in'}
+
+# Market-cap buckets in rupees (1 crore = 10^7)
+CRORE = 10 ** 7
+MARKET_CAP_BUCKETS = {
+    'large': (20000 * CRORE, None),
+    'mid': (5000 * CRORE, 20000 * CRORE),
+    'small': (None, 5000 * CRORE),
+}
+
+DEFAULT_SORT = '-change_pct'
+MAX_PAGE_SIZE = 200
+STATS_WINDOW_DAYS = 365
+AVG_VOLUME_BARS = 20
+
+
+class ScreenerError(ValueError):
+    pass
+
+
+def _value(field, value):
+    if field in TEXT_FIELDS:
+        return str(value)
+    try:
+        number = Decimal(str(value))
+    except ArithmeticError:
+        number = None
+    if number is None or not number.is_finite():
+        raise ScreenerError(f'{field} needs a number, got {value!r}')
+    return number
+
+
+def compile_spec(spec):
+    """The ordered Ticker queryset for a screen spec"""
+    if not isinstance(spec, dict):
+        raise ScreenerError('A screen spec is an object')
+    filters = spec.get('filters', [])
+    if not isinstance(filters, (list, tuple)):
+        raise ScreenerError('filters must be a list')
+    queryset = Ticker.objects.filter(is_index=False)
+    conditions = []
+    for item in filters:
+        if not isinstance(item, (list, tuple)) or len(item) != 3:
+            raise ScreenerError(f'Filters are [field, op, value] triples, got {item!r}')
+        field, op, value = item
+        if not isinstance(field, str) or field not in FIELDS:
+            raise ScreenerError(f'Unknown field {field!r}')
+        if not isinstance(op, str) or op not in OPERATORS:
+            raise ScreenerError(f'Unknown operator {op!r}')
+        if op == 'in':
+            if not isinstance(value, (list, tuple)):
+                raise ScreenerError(f'{field} in needs a list')
+            value = [_value(field, v) for v in value]
+        else:
+            value = _value(field, value)
+        # ANDed, so two bounds on one field (e.g. min_market_cap and a
+        # market_cap bucket) both apply and the stricter one wins
+        conditions.append(Q(**{f'{FIELDS[field]}__{OPERATORS[op]}': value}))
+    queryset = queryset.filter(*conditions)
+
+    sort = spec.get('sort') or DEFAULT_SORT
+    if not isinstance(sort, str) or sort.lstrip('-') not in FIELDS:
+        raise ScreenerError(f'Cannot sort by {sort!r}')
+    path = FIELDS[sort.lstrip('-')]
+    if path.startswith('stats__'):
+        # Tickers without stats sort last either way
+        column = F(path)
+        ordering = column.desc(nulls_last=True) if sort.startswith('-') else column.asc(nulls_last=True)
+    else:
+        # Plain columns are never NULL, and a bare ORDER BY can walk their index
+        ordering = sort.lstrip('-') if not sort.startswith('-') else '-' + path
+    return queryset.select_related('stats').order_by(ordering, 'id')
+
+
+def run(spec):
+    """Compile and paginate a screen; returns a Django ``Page``"""
+    queryset = compile_spec(spec)
+    try:
+        page_size = min(max(int(spec.get('page_size', 50)), 1), MAX_PAGE_SIZE)
+    except (TypeError, ValueError):
+        raise ScreenerError('page_size must be a number')
+    return Paginator(queryset, page_size).get_page(spec.get('page', 1))
+
+
+def spec_from_query(params):
+    """
+    Build a spec from query-string parameters: ``min_<field>`` / ``max_<field>``
+    for any numeric field, ``sector``, ``market_cap`` (large/mid/small),
+    ``sort``, ``page`` and ``page_size``.
+    """
+    filters = []
+    for field in FIELDS:
+        if field in TEXT_FIELDS:
+            continue
+        for prefix, op in (('min', 'gte'), ('max', 'lte')):
+            value = params.get(f'{prefix}_{field}', '')
+            if value != '':
+                filters.append([field, op, value])
+
+    if params.get('sector'):
+        filters.append(['sector', 'eq', params['sector']])
+
+    bucket = params.get('market_cap', '')
+    if bucket:
+        if bucket not in MARKET_CAP_BUCKETS:
+            raise ScreenerError(f'Unknown market cap bucket {bucket!r}')
+        low, high = MARKET_CAP_BUCKETS[bucket]
+        if low is not None:
+            filters.append(['market_cap', 'gte', low])
+        if high is not None:
+            filters.append(['market_cap', 'lt', high])
+
+    return {
+        'filters': filters,
+        'sort': params.get('sort') or DEFAULT_SORT,
+        'page': params.get('page', 1),
+        'page_size': params.get('page_size', 50),
+    }
+
+
+def row(ticker):
+    """JSON-ready screener row"""
+    stats = getattr(ticker, 'stats', None)
+
+    def number(value):
+        return None if value is None else float(value)
+
+    return {
+        'symbol': ticker.symbol,
+        'name': ticker.name,
+        'sector': ticker.sector,
+        'price': float(ticker.price),
+        'change_pct': float(ticker.change_pct),
+        'volume': ticker.volume,
+        'rsi': number(stats and stats.rsi_14),
+        'high_52w': number(stats and stats.high_52w),
+        'low_52w': number(stats and stats.low_52w),
+        'pct_from_high': number(stats and stats.pct_from_high),
+        'pct_from_low': number(stats and stats.pct_from_low),
+        'avg_volume': stats and stats.avg_volume_20,
+        'market_cap': number(stats and stats.market_cap),
+    }
+
+
+def _history(ticker_ids, start):
+    """``{ticker_id: (closes, highs, lows, volumes, last date)}`` from ``start`` on, oldest first"""
+    history = {}
+    missing = []
+    if pricestore.is_enabled():
+        for ticker_id in ticker_ids:
+            series = pricestore.read(ticker_id, start=start)
+            if series is None:
+                missing.append(ticker_id)
+            elif len(series):
+                history[ticker_id] = (
+                    series.prices('close'), series.prices('high'), series.prices('low'),
+                    series.volume, series.dates[-1].item(),
+                )
+    else:
+        missing = list(ticker_ids)
+
+    if missing:
+        rows = PriceBar.objects.filter(ticker_id__in=missing, date__gte=start).order_by('ticker_id', 'date').annotate(
+            close_f=Cast('close', FloatField()),
+            high_f=Cast('high', FloatField()),
+            low_f=Cast('low', FloatField()),
+        ).values_list('ticker_id', 'date', 'close_f', 'high_f', 'low_f', 'volume')
+        grouped = {}
+        for ticker_id, day, close, high, low, volume in rows.iterator(chunk_size=10000):
+            grouped.setdefault(ticker_id, []).append((day, close, high, low, volume))
+        for ticker_id, bars in grouped.items():
+            days, closes, highs, lows, volumes = zip(*bars)
+            history[ticker_id] = (
+                np.array(closes), np.array(highs), np.array(lows), np.array(volumes), days[-1],
+            )
+    return history
+
+
+def compute_stats(tickers=None, chunk_size=2000):
+    """
+    Recompute TickerStats from each ticker's last year of bars, ``chunk_size``
+    tickers at a time. Returns the number of rows written.
+    """
+    if tickers is None:
+        tickers = Ticker.objects.all()
+    latest = PriceBar.objects.order_by('-date').values_list('date', flat=True).first()
+    if latest is None:
+        return 0
+    start = latest - timedelta(days=STATS_WINDOW_DAYS)
+
+    ticker_rows = list(tickers.order_by('id').values_list('id', 'shares_outstanding'))
+    written = 0
+    for offset in range(0, len(ticker_rows), chunk_size):
+        chunk = dict(ticker_rows[offset:offset + chunk_size])
+        history = _history(list(chunk), start)
+        stats = []
+        for ticker_id, (closes, highs, lows, volumes, as_of) in history.items():
+            last = closes[-1]
+            high, low = highs.max(), lows.min()
+            rsi = indicators.rsi(closes)[-1]
+            shares = chunk[ticker_id]
+            stats.append(TickerStats(
+                ticker_id=ticker_id,
+                as_of=as_of,
+                rsi_14=None if np.isnan(rsi) else round(float(rsi), 4),
+                high_52w=Decimal(f'{high:.2f}'),
+                low_52w=Decimal(f'{low:.2f}'),
+                pct_from_high=round(float((last / high - 1) * 100), 4) if high > 0 else None,
+                pct_from_low=round(float((last / low - 1) * 100), 4) if low > 0 else None,
+                avg_volume_20=int(volumes[-AVG_VOLUME_BARS:].mean()),
+                market_cap=Decimal(f'{last * shares:.2f}') if shares else None,
+            ))
+        TickerStats.objects.bulk_create(
+            stats,
+            batch_size=1000,
+            update_conflicts=True,
+            unique_fields=['ticker'],
+            update_fields=[
+                'as_of', 'rsi_14', 'high_52w', 'low_52w', 'pct_from_high',
+                'pct_from_low', 'avg_volume_20', 'market_cap', 'computed_at',
+            ],
+        )
+        written += len(stats)
+    return written
@@ -0,0 +1,242 @@
+"""
+In-process search index over Ticker symbols and names.
+
+Results are ranked in tiers: an exact symbol match, then symbols starting with
+the query (shortest first), then names with a word starting with the query,
+then fuzzy matches on shared trigrams. Only symbol, name and is_index are
+indexed, so price updates never touch it.
+
+Each process builds its index on first use and keeps it current through the
+Ticker receivers in ``markets.signals``. Writes that skip signals, such as
+``bulk_create``, should call ``invalidate()``. At most every ``SYNC_SECONDS``
+a lookup also runs ``sync``, which indexes tickers created since, e.g. by
+another process, and rebuilds the index when the ticker count shows some were
+deleted elsewhere; lookups in between never query the database. A rename made
+in another process is only picked up by a rebuild.
+"""
+import heapq
+import math
+import threading
+import time
+from bisect import bisect_left, insort
+from collections import defaultdict
+from itertools import islice
+
+MIN_SIMILARITY = 0.6
+MAX_CANDIDATES = 500
+MAX_PREFIX_SCAN = 2000
+SYNC_SECONDS = 30
+
+
+def _append(keys, item):
+    keys.append(item)
+
+
+def _normalize(text):
+    return ' '.join(str(text).lower().split())
+
+
+def _trigrams(text):
+    padded = f'  {text} '
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+def _name_keys(name):
+    """Every word-aligned suffix, so multi-word queries match from any word"""
+    words = name.split()
+    return {' '.join(words[i:]) for i in range(len(words))}
+
+
+class SearchIndex:
+
+    def __init__(self):
+        self.entries = {}           # id -> (symbol, name, is_index)
+        self.symbols = {}           # lowercased symbol -> id
+        self.symbol_keys = []       # sorted (lowercased symbol, id)
+        self.name_keys = []         # sorted (name suffix, id)
+        self.grams = {}             # id -> trigrams of symbol and name
+        self.postings = defaultdict(set)
+        self.last_id = 0            # highest ticker id indexed
+        self.synced = time.monotonic()
+        self.lock = threading.Lock()
+
+    def load(self, rows):
+        """Bulk-load ``(id, symbol, name, is_index)`` rows, sorting the keys once"""
+        with self.lock:
+            for ticker_id, symbol, name, is_index in rows:
+                self._index(ticker_id, _normalize(symbol), _normalize(name), is_index, _append)
+            self.symbol_keys.sort()
+            self.name_keys.sort()
+
+    def add(self, ticker_id, symbol, name, is_index=False):
+        symbol, name = _normalize(symbol), _normalize(name)
+        with self.lock:
+            if self.entries.get(ticker_id) == (symbol, name, is_index):
+                return
+            self._remove(ticker_id)
+            self._index(ticker_id, symbol, name, is_index, insort)
+
+    def _index(self, ticker_id, symbol, name, is_index, put):
+        self.entries[ticker_id] = (symbol, name, is_index)
+        self.last_id = max(self.last_id, ticker_id)
+        self.symbols[symbol] = ticker_id
+        put(self.symbol_keys, (symbol, ticker_id))
+        for key in _name_keys(name):
+            put(self.name_keys, (key, ticker_id))
+        grams = _trigrams(symbol) | _trigrams(name)
+        self.grams[ticker_id] = grams
+        for gram in grams:
+            self.postings[gram].add(ticker_id)
+
+    def remove(self, ticker_id):
+        with self.lock:
+            self._remove(ticker_id)
+
+    def _remove(self, ticker_id):
+        entry = self.entries.pop(ticker_id, None)
+        if entry is None:
+            return
+        symbol, name, _ = entry
+        if self.symbols.get(symbol) == ticker_id:
+            del self.symbols[symbol]
+        self._discard(self.symbol_keys, (symbol, ticker_id))
+        for key in _name_keys(name):
+            self._discard(self.name_keys, (key, ticker_id))
+        for gram in self.grams.pop(ticker_id):
+            self.postings[gram].discard(ticker_id)
+            if not self.postings[gram]:
+                del self.postings[gram]
+
+    @staticmethod
+    def _discard(keys, item):
+        pos = bisect_left(keys, item)
+        if pos < len(keys) and keys[pos] == item:
+            del keys[pos]
+
+    @staticmethod
+    def _prefixed(keys, query):
+        start = bisect_left(keys, (query,))
+        end = bisect_left(keys, (query + '\uffff',), lo=start, hi=min(len(keys), start + MAX_PREFIX_SCAN))
+        return keys[start:end]
+
+    def _fuzzy(self, query):
+        wanted = _trigrams(query)
+        needed = math.ceil(len(wanted) * MIN_SIMILARITY)
+        # Any match shares at least one of the len - needed + 1 rarest trigrams
+        rarest = sorted(wanted, key=lambda gram: len(self.postings.get(gram, ())))
+        candidates = set()
+        for gram in rarest[:len(wanted) - needed + 1]:
+            # A posting this common means the query barely narrows anything down;
+            # an arbitrary slice of it is as good as the whole
+            candidates.update(islice(self.postings.get(gram, ()), MAX_CANDIDATES - len(candidates)))
+            if len(candidates) >= MAX_CANDIDATES:
+                break
+        grams = self.grams
+        scored = [(len(wanted & grams[ticker_id]), ticker_id) for ticker_id in candidates]
+        scored = [(-shared, self.entries[ticker_id][0], ticker_id) for shared, ticker_id in scored if shared >= needed]
+        scored.sort()
+        return [ticker_id for _, _, ticker_id in scored]
+
+    def lookup(self, query, limit=10, include_indices=True):
+        """Ticker ids matching ``query``, best first"""
+        query = _normalize(query)
+        if not query:
+            return []
+        # Writers mutate the key lists and postings in place
+        with self.lock:
+            return self._lookup(query, limit, include_indices)
+
+    def _lookup(self, query, limit, include_indices):
+        results = []
+        seen = set()
+
+        def take(ticker_ids):
+            for ticker_id in ticker_ids:
+                if ticker_id in seen:
+                    continue
+                seen.add(ticker_id)
+                if include_indices or not self.entries[ticker_id][2]:
+                    results.append(ticker_id)
+                    if limit is not None and len(results) >= limit:
+                        return True
+            return False
+
+        exact = self.symbols.get(query)
+        if take([exact] if exact is not None else []):
+            return results
+        symbols = self._prefixed(self.symbol_keys, query)
+        if limit is not None:
+            # Head room for matches that are skipped as seen or as indices
+            symbols = heapq.nsmallest(limit * 4, symbols, key=lambda item: (len(item[0]), item[0]))
+        else:
+            symbols.sort(key=lambda item: (len(item[0]), item[0]))
+        if take(ticker_id for _, ticker_id in symbols):
+            return results
+        if take(ticker_id for _, ticker_id in self._prefixed(self.name_keys, query)):
+            return results
+        if len(query) >= 3:
+            take(self._fuzzy(query))
+        return results
+
+    def __len__(self):
+        return len(self.entries)
+
+
+_index = None
+_build_lock = threading.Lock()
+
+
+def build():
+    from .models import Ticker
+
+    index = SearchIndex()
+    index.load(Ticker.objects.values_list('id', 'symbol', 'name', 'is_index').iterator(chunk_size=5000))
+    return index
+
+
+def get_index():
+    global _index
+    if _index is None:
+        with _build_lock:
+            if _index is None:
+                _index = build()
+    return _index
+
+
+def sync(index):
+    """
+    Index tickers created since ``index`` last looked, e.g. by another
+    process. Returns the index to use, a fresh one if tickers were deleted.
+    """
+    from .models import Ticker
+
+    # Claimed up front, so concurrent lookups do not all sync at once
+    index.synced = time.monotonic()
+    for row in Ticker.objects.filter(id__gt=index.last_id).order_by('id').values_list('id', 'symbol', 'name', 'is_index'):
+        index.add(*row)
+    if Ticker.objects.count() != len(index):
+        return build()
+    return index
+
+
+def lookup(query, limit=10, include_indices=True):
+    global _index
+    index = get_index()
+    if time.monotonic() - index.synced >= SYNC_SECONDS:
+        index = _index = sync(index)
+    return index.lookup(query, limit, include_indices)
+
+
+def ticker_saved(ticker):
+    if _index is not None:
+        _index.add(ticker.id, ticker.symbol, ticker.name, ticker.is_index)
+
+
+def ticker_deleted(ticker):
+    if _index is not None:
+        _index.remove(ticker.id)
+
+
+def invalidate():
+    global _index
+    _index = None
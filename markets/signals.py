@@ -0,0 +1,79 @@
+"""Receivers that keep derived market data in step with model writes."""
+from copy import copy
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from . import alerts, matching, pricestore, search, snapshot
+from .models import PriceAlert, PriceBar, Ticker
+
+
+# The price store is outside the database, so it only follows writes that
+# commit; a copy keeps later changes to the instance out of the deferred write
+
+@receiver(post_save, sender=PriceBar)
+def store_price_bar(sender, instance, raw=False, **kwargs):
+    if pricestore.is_enabled() and not raw:
+        transaction.on_commit(partial(pricestore.upsert_bar, copy(instance)))
+
+
+@receiver(post_delete, sender=PriceBar)
+def drop_price_bar(sender, instance, **kwargs):
+    if pricestore.is_enabled():
+        transaction.on_commit(partial(pricestore.delete_bar, copy(instance)))
+
+
+@receiver(pre_delete, sender=Ticker)
+def drop_ticker_bars(sender, instance, **kwargs):
+    # Registered before the cascaded PriceBar deletes, so it runs first and
+    # they find nothing to rewrite
+    if pricestore.is_enabled():
+        transaction.on_commit(partial(pricestore.remove, instance.id))
+
+
+@receiver(post_save, sender=Ticker)
+@receiver(post_delete, sender=Ticker)
+def refresh_market_snapshot(sender, **kwargs):
+    snapshot.invalidate()
+
+
+@receiver(post_save, sender=Ticker)
+def index_ticker(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search.ticker_saved(instance)
+
+
+@receiver(post_delete, sender=Ticker)
+def unindex_ticker(sender, instance, **kwargs):
+    search.ticker_deleted(instance)
+
+
+def _price_moved(ticker, update_fields):
+    # Only a new price can cross an alert or a resting order; other saves
+    # would pay for a book sync and match for nothing
+    return (update_fields is None or 'price' in update_fields) and ticker.price_changed()
+
+
+@receiver(post_save, sender=Ticker)
+def check_price_alerts(sender, instance, raw=False, update_fields=None, **kwargs):
+    if not raw and _price_moved(instance, update_fields):
+        alerts.ticker_saved(instance)
+
+
+@receiver(post_save, sender=Ticker)
+def match_resting_orders(sender, instance, created=False, raw=False, update_fields=None, **kwargs):
+    if not raw and not created and _price_moved(instance, update_fields):
+        matching.ticker_saved(instance)
+
+
+@receiver(post_save, sender=PriceAlert)
+def book_price_alert(sender, instance, raw=False, **kwargs):
+    if not raw:
+        alerts.alert_saved(instance)
+
+
+@receiver(post_delete, sender=PriceAlert)
+def unbook_price_alert(sender, instance, **kwargs):
+    alerts.alert_deleted(instance)
@@ -0,0 +1,75 @@
+"""
+Cached market overview shared by the home, dashboard, stocks and
+screener pages.
+
+Indices, the biggest movers and the sector list only change when prices do,
+so they are computed once and kept in the cache under a key that embeds a
+version. Saving or deleting a Ticker bumps the version counter (see
+``markets.signals``), so the next read rebuilds the snapshot. A rebuild that
+was already in flight can only write under the old version, which nobody
+reads any more.
+
+The default cache is per process, while prices are moved by the
+run_price_feed process. So the version also carries the newest
+``last_updated``, one probe of its index that is itself cached for
+``CHECK_SECONDS``: a write in any process is seen within that long, and
+requests in between do not touch the database. A ticker deleted by another
+process is only noticed with the next price write.
+"""
+import time
+
+from django.core.cache import cache
+from django.db.models import Max
+
+from .models import Ticker
+
+VERSION_KEY = 'market-snapshot:version'
+UPDATED_KEY = 'market-snapshot:updated'
+SNAPSHOT_KEY = 'market-snapshot:{}'
+CHECK_SECONDS = 2
+MOVERS = 10
+# Superseded versions are never read again; let them age out
+SNAPSHOT_TIMEOUT = 24 * 60 * 60
+
+
+def _version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # Seed from the clock so an evicted counter never reuses an old key
+        cache.add(VERSION_KEY, time.time_ns(), None)
+        version = cache.get(VERSION_KEY)
+    updated = cache.get(UPDATED_KEY)
+    if updated is None:
+        updated = Ticker.objects.aggregate(updated=Max('last_updated'))['updated']
+        updated = updated.timestamp() if updated else 0
+        cache.set(UPDATED_KEY, updated, CHECK_SECONDS)
+    return f'{version}:{updated}'
+
+
+def build():
+    stocks = Ticker.objects.filter(is_index=False)
+    return {
+        'indices': list(Ticker.objects.filter(is_index=True).order_by('symbol')),
+        'top_gainers': list(stocks.order_by('-change_pct')[:MOVERS]),
+        'top_losers': list(stocks.order_by('change_pct')[:MOVERS]),
+        'sectors': list(
+            Ticker.objects.exclude(sector='').order_by('sector').values_list('sector', flat=True).distinct()
+        ),
+    }
+
+
+def get():
+    """The current snapshot, rebuilding it if prices changed since it was cached"""
+    key = SNAPSHOT_KEY.format(_version())
+    snapshot = cache.get(key)
+    if snapshot is None:
+        snapshot = build()
+        cache.set(key, snapshot, SNAPSHOT_TIMEOUT)
+    return snapshot
+
+
+def invalidate():
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.add(VERSION_KEY, time.time_ns(), None)
@@ -19,12 +19,21 @@ urlpatterns = [
     path('analytics/', views.analytics, name='analytics'),
     path('advanced-trading/', views.advanced_trading, name='advanced_trading'),
     path('trade-history/', views.trade_history, name='trade_history'),
+    path('export/<str:report>/', views.export_report, name='export_report'),
     
     # API endpoints
     path('api/chart-data/<str:symbol>/', views.get_chart_data, name='chart_data'),
     path('api/orders/<int:order_id>/cancel/', views.cancel_order, name='cancel_order'),
     path('api/orders/cancel-all/', views.cancel_all_orders, name='cancel_all_orders'),
     path('api/search-stocks/', views.search_stocks, name='search_stocks'),
+    path('api/alerts/', views.price_alerts, name='price_alerts'),
+    path('api/alerts/<int:alert_id>/delete/', views.delete_price_alert, name='delete_price_alert'),
+    path('api/screener/', views.screener_api, name='screener_api'),
+    path('api/strategies/<int:strategy_id>/backtest/', views.backtest_strategy, name='backtest_strategy'),
+    
+    # Request profiling (markets.profiling)
+    path('metrics', views.metrics, name='metrics'),
+    path('profiling/', views.slow_endpoints, name='slow_endpoints'),
     
     # Authentication URLs
     path('login/', views.user_login, name='login'),
@@ -0,0 +1,130 @@
+"""
+Firm-wide portfolio valuation for the value_portfolios command.
+
+Users are split into chunks of consecutive ids. Each chunk is one query over
+its FILLED orders sorted by user, ticker and fill time, replayed through
+``ledger.replay`` so cost basis and realized P&L match the Position ledger,
+then marked to the current Ticker price. Chunks run in a process pool and the
+parent upserts each chunk's PortfolioSnapshot rows as it arrives, so memory
+stays bounded by the chunk size however many users there are.
+"""
+import os
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.utils import timezone
+
+from . import ledger
+from .models import Order, PortfolioSnapshot, Ticker
+
+CHUNK_USERS = 2000
+CENT = Decimal('0.01')
+SNAPSHOT_FIELDS = [
+    'holdings', 'market_value', 'cost_basis', 'unrealized_pnl', 'realized_pnl', 'sector_exposure', 'computed_at',
+]
+
+
+def _user_ranges(chunk_size):
+    """Inclusive (first, last) user id ranges of ``chunk_size`` users each"""
+    ids = list(User.objects.order_by('id').values_list('id', flat=True))
+    return [(chunk[0], chunk[-1]) for chunk in (ids[i:i + chunk_size] for i in range(0, len(ids), chunk_size))]
+
+
+def value_users(first_id, last_id, prices):
+    """
+    Valuation of every user in ``first_id..last_id`` with filled orders, as
+    dicts of PortfolioSnapshot fields. ``prices`` maps ticker id to
+    ``(price, sector)``.
+    """
+    rows = Order.objects.filter(
+        status='FILLED', user_id__gte=first_id, user_id__lte=last_id,
+    ).order_by('user_id', 'ticker_id', ledger.FILLED_AT, 'id').values_list(
+        'user_id', 'ticker_id', 'order_type', 'quantity', 'price',
+    )
+    totals = {}
+    for (user_id, ticker_id), position in ledger.replay(rows.iterator(chunk_size=10000)).items():
+        total = totals.get(user_id)
+        if total is None:
+            total = totals[user_id] = {
+                'user_id': user_id, 'holdings': 0, 'market_value': Decimal('0'), 'cost_basis': Decimal('0'),
+                'realized_pnl': Decimal('0'), 'sector_exposure': defaultdict(Decimal),
+            }
+        total['realized_pnl'] += position.realized_pnl
+        if position.shares > 0:
+            price, sector = prices.get(ticker_id, (Decimal('0'), ''))
+            value = (price * position.shares).quantize(CENT)
+            total['holdings'] += 1
+            total['market_value'] += value
+            total['cost_basis'] += position.total_cost
+            total['sector_exposure'][sector or 'Other'] += value
+
+    for total in totals.values():
+        total['unrealized_pnl'] = total['market_value'] - total['cost_basis']
+        total['sector_exposure'] = {sector: str(value) for sector, value in sorted(total['sector_exposure'].items())}
+    return list(totals.values())
+
+
+def _value_job(job):
+    return value_users(*job)
+
+
+def _save(valuations, as_of):
+    PortfolioSnapshot.objects.bulk_create(
+        [PortfolioSnapshot(as_of=as_of, **valuation) for valuation in valuations],
+        batch_size=1000,
+        update_conflicts=True,
+        unique_fields=['user', 'as_of'],
+        update_fields=SNAPSHOT_FIELDS,
+    )
+
+
+def value_portfolios(as_of=None, workers=None, chunk_size=CHUNK_USERS, progress=None):
+    """
+    Write today's (or ``as_of``'s) PortfolioSnapshot for every user with
+    filled orders and drop that day's rows for anyone who no longer has any.
+    Returns firm-wide totals, with market value by sector.
+    ``progress(users_done, chunks_done, chunks)`` is called after each chunk.
+    """
+    as_of = as_of or timezone.localdate()
+    started = timezone.now()
+    prices = {
+        ticker_id: (price, sector)
+        for ticker_id, price, sector in Ticker.objects.values_list('id', 'price', 'sector')
+    }
+    jobs = [(first, last, prices) for first, last in _user_ranges(chunk_size)]
+
+    summary = {
+        'users': 0, 'market_value': Decimal('0'), 'cost_basis': Decimal('0'),
+        'realized_pnl': Decimal('0'), 'sector_exposure': defaultdict(Decimal),
+    }
+
+    def collect(done, valuations):
+        _save(valuations, as_of)
+        summary['users'] += len(valuations)
+        for valuation in valuations:
+            for field in ('market_value', 'cost_basis', 'realized_pnl'):
+                summary[field] += valuation[field]
+            for sector, value in valuation['sector_exposure'].items():
+                summary['sector_exposure'][sector] += Decimal(value)
+        if progress:
+            progress(summary['users'], done, len(jobs))
+
+    workers = workers or os.cpu_count() or 1
+    if workers > 1 and len(jobs) > 1:
+        from django.db import connections
+
+        # Forked workers must not share the parent's database connections
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for done, valuations in enumerate(pool.map(_value_job, jobs), 1):
+                collect(done, valuations)
+    else:
+        for done, job in enumerate(jobs, 1):
+            collect(done, _value_job(job))
+
+    PortfolioSnapshot.objects.filter(as_of=as_of, computed_at__lt=started).delete()
+    summary['unrealized_pnl'] = summary['market_value'] - summary['cost_basis']
+    summary['sector_exposure'] = dict(sorted(summary['sector_exposure'].items(), key=lambda item: -item[1]))
+    return summary
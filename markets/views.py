@@ -1,25 +1,28 @@
 from django.shortcuts import render, get_object_or_404, redirect
+from django.conf import settings
 from django.contrib import messages
-from django.db.models import Q, Sum, F, Count, Case, When, DecimalField
+from django.db.models import Q, Sum, F, Count, Case, When, Value, DecimalField, IntegerField
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth import login, authenticate, logout
-from django.http import JsonResponse
+from django.core.cache import cache
+from django.http import HttpResponse, HttpResponseForbidden, JsonResponse, StreamingHttpResponse
+from django.utils import timezone
 from decimal import Decimal
 import json
-from datetime import datetime, timedelta
-from .models import Ticker, PriceBar, Watchlist, Order
+import math
+from datetime import date, datetime, timedelta
+from .models import Ticker, PriceBar, Watchlist, Order, Position, TradingStrategy, RiskMetric, PriceAlert
+from . import backtest, downsample, equity, exports, indicators, intraday, matching, pricestore, profiling, search, snapshot
+from . import screener as screener_engine
 from .forms import CustomUserCreationForm, CustomAuthenticationForm
 
 def home(request):
-    # Get indices
-    indices = Ticker.objects.filter(is_index=True).order_by('symbol')
-    
-    # Get top movers (excluding indices)
-    top_movers = Ticker.objects.filter(is_index=False).order_by('-change_pct')[:6]
+    market = snapshot.get()
     
     context = {
-        'indices': indices,
-        'top_movers': top_movers,
+        'indices': market['indices'],
+        'top_movers': market['top_gainers'][:6],
     }
     return render(request, 'markets/home_modern.html', context)
 
@@ -30,19 +33,18 @@ def stocks(request):
     stocks = Ticker.objects.filter(is_index=False)
     
     if query:
-        stocks = stocks.filter(
-            Q(symbol__icontains=query) | 
-            Q(name__icontains=query)
+        ranked = search.lookup(query, limit=500, include_indices=False)
+        # Keep the search ranking rather than the table's order
+        stocks = stocks.filter(id__in=ranked).order_by(
+            Case(*[When(id=ticker_id, then=Value(rank)) for rank, ticker_id in enumerate(ranked)], output_field=IntegerField())
         )
     
     if sector:
         stocks = stocks.filter(sector=sector)
     
-    sectors = Ticker.objects.values_list('sector', flat=True).distinct()
-    
     context = {
         'stocks': stocks,
-        'sectors': sectors,
+        'sectors': snapshot.get()['sectors'],
         'current_sector': sector,
         'query': query,
     }
@@ -74,13 +76,6 @@ def stock_detail(request, symbol):
 
 @login_required
 def watchlist(request):
-    # Get user's watchlist items
-    watchlist_items = Watchlist.objects.filter(user=request.user).select_related('ticker')
-    
-    # Calculate stats
-    gainers_count = watchlist_items.filter(ticker__change_pct__gt=0).count()
-    losers_count = watchlist_items.filter(ticker__change_pct__lt=0).count()
-    
     if request.method == 'POST':
         action = request.POST.get('action')
         ticker_id = request.POST.get('ticker_id')
@@ -99,6 +94,11 @@ def watchlist(request):
             Watchlist.objects.filter(user=request.user, ticker=ticker).delete()
             messages.success(request, f'{ticker.symbol} removed from watchlist')
     
+    # Get user's watchlist items, counting movers from the same rows
+    watchlist_items = list(Watchlist.objects.filter(user=request.user).select_related('ticker'))
+    gainers_count = sum(1 for item in watchlist_items if item.ticker.change_pct > 0)
+    losers_count = sum(1 for item in watchlist_items if item.ticker.change_pct < 0)
+    
     context = {
         'watchlist_items': watchlist_items,
         'gainers_count': gainers_count,
@@ -108,75 +108,47 @@ def watchlist(request):
 
 @login_required
 def portfolio(request):
-    # Get user's filled orders
-    orders = Order.objects.filter(
+    # Open positions are maintained by the ledger as orders fill
+    positions = Position.objects.filter(
+        user=request.user,
+        shares__gt=0
+    ).select_related('ticker')
+    
+    recent_orders = Order.objects.filter(
         user=request.user,
         status='FILLED'
-    ).order_by('-created_at')
+    ).select_related('ticker').order_by('-created_at')[:10]
     
     # Calculate holdings and performance metrics
-    holdings = {}
+    active_holdings = []
     total_investment = Decimal('0')
     total_current_value = Decimal('0')
-    realized_pnl = Decimal('0')
-    
-    for order in orders:
-        symbol = order.ticker.symbol
-        if symbol not in holdings:
-            holdings[symbol] = {
-                'symbol': symbol,
-                'company_name': order.ticker.name,
-                'ticker': order.ticker,
-                'shares': 0,
-                'avg_cost': Decimal('0'),
-                'total_cost': Decimal('0'),
-                'current_price': Decimal(str(order.ticker.price)),
-                'realized_pnl': Decimal('0'),
-                'trades': 0
-            }
-        
-        h = holdings[symbol]
-        price = Decimal(str(order.price))
-        
-        if order.order_type == 'BUY':
-            # Update position for BUY
-            old_total = h['shares'] * h['avg_cost']
-            new_total = price * order.quantity
-            h['shares'] += order.quantity
-            h['total_cost'] = old_total + new_total
-            h['avg_cost'] = h['total_cost'] / h['shares'] if h['shares'] > 0 else Decimal('0')
-        else:
-            # Update position and calculate realized P&L for SELL
-            sell_value = price * order.quantity
-            cost_basis = h['avg_cost'] * order.quantity
-            h['realized_pnl'] += sell_value - cost_basis
-            realized_pnl += sell_value - cost_basis
-            
-            h['shares'] -= order.quantity
-            if h['shares'] > 0:
-                h['total_cost'] = h['avg_cost'] * h['shares']
-        
-        h['trades'] += 1
-        
-        # Calculate current value and unrealized P&L
-        if h['shares'] > 0:
-            h['current_price'] = Decimal(str(order.ticker.price))
-            h['market_value'] = h['shares'] * h['current_price']
-            h['unrealized_pnl'] = h['market_value'] - h['total_cost']
-            h['return_pct'] = (
-                (h['market_value'] / h['total_cost'] - 1) * 100
-                if h['total_cost'] > 0 else Decimal('0')
-            )
-            h['day_change'] = h['shares'] * Decimal(str(order.ticker.change))
-            h['day_change_pct'] = Decimal(str(order.ticker.change_pct))
-    
-    # Remove closed positions
-    active_holdings = [v for v in holdings.values() if v['shares'] > 0]
     
-    # Calculate portfolio totals
-    for h in active_holdings:
-        total_investment += h['total_cost']
-        total_current_value += h['market_value']
+    for position in positions:
+        ticker = position.ticker
+        current_price = Decimal(str(ticker.price))
+        market_value = position.shares * current_price
+        active_holdings.append({
+            'symbol': ticker.symbol,
+            'company_name': ticker.name,
+            'ticker': ticker,
+            'shares': position.shares,
+            'avg_cost': position.avg_cost,
+            'total_cost': position.total_cost,
+            'current_price': current_price,
+            'realized_pnl': position.realized_pnl,
+            'trades': position.trades,
+            'market_value': market_value,
+            'unrealized_pnl': market_value - position.total_cost,
+            'return_pct': (
+                (market_value / position.total_cost - 1) * 100
+                if position.total_cost > 0 else Decimal('0')
+            ),
+            'day_change': position.shares * Decimal(str(ticker.change)),
+            'day_change_pct': Decimal(str(ticker.change_pct)),
+        })
+        total_investment += position.total_cost
+        total_current_value += market_value
     
     total_gain_loss = total_current_value - total_investment
     total_return_pct = (
@@ -192,7 +164,7 @@ def portfolio(request):
     
     context = {
         'holdings': active_holdings,
-        'recent_orders': orders[:10],
+        'recent_orders': recent_orders,
         'total_value': total_current_value,
         'total_gain_loss': total_gain_loss,
         'total_return_pct': total_return_pct,
@@ -204,61 +176,24 @@ def portfolio(request):
 @login_required
 def place_order(request):
     if request.method == 'POST':
+        if request.POST.get('ticker_id'):
+            ticker = get_object_or_404(Ticker, id=request.POST.get('ticker_id'))
+        else:
+            ticker = get_object_or_404(Ticker, symbol=(request.POST.get('symbol') or '').strip().upper())
         try:
-            ticker_id = request.POST.get('ticker_id')
-            side = request.POST.get('side')
+            side = (request.POST.get('side') or '').upper()
             qty = int(request.POST.get('qty'))
+            kind = (request.POST.get('kind') or 'market').upper()
             
-            if qty <= 0:
-                raise ValueError("Quantity must be positive")
-            
-            ticker = get_object_or_404(Ticker, id=ticker_id)
-            
-            # Get user's current position in this stock
-            orders = Order.objects.filter(
-                user=request.user,
-                ticker=ticker,
-                status='FILLED'
-            )
-            
-            position_qty = 0
-            position_value = 0
-            
-            for order in orders:
-                if order.side == 'BUY':
-                    position_qty += order.qty
-                    position_value += order.qty * float(order.price)
-                else:
-                    position_qty -= order.qty
-                    position_value -= order.qty * float(order.price)
-            
-            # Validate SELL orders against current position
-            if side == 'SELL' and qty > position_qty:
-                messages.error(request, f'Cannot sell {qty} shares. Current position: {position_qty}')
-                return redirect('stock_detail', symbol=ticker.symbol)
+            # LIMIT and STOP orders that do not cross the current price rest as PENDING
+            order, pnl = matching.submit(request.user, ticker, side, qty, kind, request.POST.get('price'))
             
-            # Calculate average price for position tracking
-            avg_price = position_value / position_qty if position_qty > 0 else 0
-            
-            # Create and save the order
-            order = Order.objects.create(
-                user=request.user,
-                ticker=ticker,
-                side=side,
-                qty=qty,
-                price=ticker.current_price,
-                status='FILLED'
-            )
-            
-            # Update position calculations
-            if side == 'BUY':
-                new_qty = position_qty + qty
-                new_value = position_value + (qty * float(ticker.current_price))
-                avg_price = new_value / new_qty
-                msg = f'Bought {qty} shares of {ticker.symbol} at ₹{ticker.current_price}'
+            if order.status == 'PENDING':
+                msg = f'{kind.title()} order to {side.lower()} {qty} shares of {ticker.symbol} at ₹{order.price} placed'
+            elif side == 'BUY':
+                msg = f'Bought {qty} shares of {ticker.symbol} at ₹{order.price}'
             else:
-                pnl = (float(ticker.current_price) - avg_price) * qty
-                msg = f'Sold {qty} shares of {ticker.symbol} at ₹{ticker.current_price} (P&L: ₹{pnl:,.2f})'
+                msg = f'Sold {qty} shares of {ticker.symbol} at ₹{order.price} (P&L: ₹{pnl:,.2f})'
             
             messages.success(request, msg)
             return redirect('stock_detail', symbol=ticker.symbol)
@@ -269,6 +204,78 @@ def place_order(request):
     
     return redirect('home')
 
+def _recent_bars(stock, days):
+    """Last ``days`` bars as (iso date, open, high, low, close, volume) tuples, oldest first"""
+    if pricestore.is_enabled():
+        series = pricestore.read(stock.id, limit=days)
+        if series is not None:
+            return series.rows()
+    
+    rows = PriceBar.objects.filter(
+        ticker=stock
+    ).order_by('-date').values_list('date', 'open', 'high', 'low', 'close', 'volume')[:days]
+    return [
+        (d.isoformat(), float(o), float(h), float(l), float(c), v)
+        for d, o, h, l, c, v in reversed(rows)
+    ]
+
+CHART_POINTS = 30
+CHART_CACHE_TIMEOUT = 5 * 60
+
+def _chart_params(request):
+    """(points, max_points, method) from the query string; max_points is None when not downsampling"""
+    try:
+        max_points = request.GET.get('max_points')
+        max_points = int(max_points) if max_points else None
+        points = int(request.GET.get('points', min(CHART_POINTS, max_points or CHART_POINTS)))
+    except ValueError:
+        raise ValueError('points and max_points must be whole numbers')
+    if points < 1 or (max_points is not None and max_points < 1):
+        raise ValueError('points and max_points must be at least 1')
+    method = request.GET.get('method', 'ohlc')
+    if method not in downsample.METHODS:
+        raise ValueError(f'method must be one of {", ".join(downsample.METHODS)}')
+    return points, max_points, method
+
+def _chart_bars(stock, days, points):
+    """
+    Bars covering the last ``days`` days at the coarsest resolution that still
+    gives ``points`` of them, as (resolution, rows) with rows oldest first.
+    Daily rows are timed by ISO date, intraday rows by epoch seconds.
+    """
+    rows = _recent_bars(stock, days)
+    if len(rows) >= points:
+        return intraday.DAILY, rows
+    
+    last_day = date.fromisoformat(rows[-1][0]) if rows else timezone.localdate()
+    since = intraday.day_start(last_day - timedelta(days=days - 1))
+    resolution = intraday.pick(stock.id, since, points)
+    if resolution is None:
+        return intraday.DAILY, rows
+    return resolution, intraday.read(stock.id, resolution, since)
+
+def _chart_series(stock, days, points, max_points, method, daily=False):
+    """
+    Chart bars downsampled to at most ``max_points``, as (resolution, rows,
+    picks, count): ``picks`` indexes each row's close in the full series of
+    ``count`` bars. Downsampled series are cached until the ticker updates.
+    """
+    if max_points is None:
+        resolution, rows = (intraday.DAILY, _recent_bars(stock, days)) if daily else _chart_bars(stock, days, points)
+        return resolution, rows, None, len(rows)
+    
+    key = 'chart:{}:{}:{}:{}:{}:{}'.format(
+        stock.id, days, 'daily' if daily else points, max_points, method,
+        stock.last_updated.timestamp() if stock.last_updated else 0,
+    )
+    series = cache.get(key)
+    if series is None:
+        resolution, rows = (intraday.DAILY, _recent_bars(stock, days)) if daily else _chart_bars(stock, days, points)
+        sampled, picks = downsample.downsample(rows, max_points, method)
+        series = (resolution, sampled, picks, len(rows))
+        cache.set(key, series, CHART_CACHE_TIMEOUT)
+    return series
+
 def get_stock_data(request, symbol):
     """API endpoint for chart data"""
     stock = get_object_or_404(Ticker, symbol=symbol)
@@ -276,26 +283,29 @@ def get_stock_data(request, symbol):
     
     # Define the number of days based on period
     days = {
+        '1d': 1,
         '7d': 7,
         '1m': 30,
         '3m': 90,
         '6m': 180,
     }.get(period, 30)
     
-    data = PriceBar.objects.filter(
-        ticker=stock
-    ).order_by('-date')[:days]
+    try:
+        points, max_points, method = _chart_params(request)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    resolution, bars, _, _ = _chart_series(stock, days, points, max_points, method)
     
     chart_data = [{
-        't': bar.date.isoformat(),
-        'o': float(bar.open),
-        'h': float(bar.high),
-        'l': float(bar.low),
-        'c': float(bar.close),
-        'v': bar.volume
-    } for bar in data]
-    
-    return JsonResponse({'data': chart_data})
+        't': t,
+        'o': o,
+        'h': h,
+        'l': l,
+        'c': c,
+        'v': v
+    } for t, o, h, l, c, v in reversed(bars)]
+    
+    return JsonResponse({'data': chart_data, 'resolution': resolution})
 
 def register(request):
     if request.user.is_authenticated:
@@ -343,65 +353,38 @@ def user_logout(request):
 @login_required
 def dashboard(request):
     """Enhanced dashboard with live market data and portfolio overview"""
-    # Get user's portfolio summary
-    user_orders = Order.objects.filter(user=request.user).select_related('ticker')
-    
-    # Calculate portfolio positions
-    positions = {}
-    for order in user_orders:
-        symbol = order.ticker.symbol
-        if symbol not in positions:
-            positions[symbol] = {
-                'symbol': symbol,
-                'ticker': order.ticker,
-                'shares': 0,
-                'total_cost': Decimal('0.00'),
-                'trades': []
-            }
-        
-        if order.side == 'buy':
-            positions[symbol]['shares'] += order.quantity
-            positions[symbol]['total_cost'] += order.quantity * order.price
-        else:
-            positions[symbol]['shares'] -= order.quantity
-            positions[symbol]['total_cost'] -= order.quantity * order.price
-        
-        positions[symbol]['trades'].append(order)
+    positions = Position.objects.filter(user=request.user, shares__gt=0).select_related('ticker')
     
     # Calculate current values
     portfolio_data = []
     total_value = Decimal('0.00')
     total_cost = Decimal('0.00')
     
-    for pos_data in positions.values():
-        if pos_data['shares'] > 0:
-            current_price = pos_data['ticker'].price
-            market_value = pos_data['shares'] * current_price
-            avg_cost = pos_data['total_cost'] / pos_data['shares'] if pos_data['shares'] > 0 else Decimal('0.00')
-            gain_loss = market_value - (pos_data['shares'] * avg_cost)
-            gain_loss_pct = (gain_loss / (pos_data['shares'] * avg_cost)) * 100 if avg_cost > 0 else 0
-            
-            portfolio_data.append({
-                'symbol': pos_data['symbol'],
-                'ticker': pos_data['ticker'],
-                'shares': pos_data['shares'],
-                'avg_cost': avg_cost,
-                'current_price': current_price,
-                'market_value': market_value,
-                'gain_loss': gain_loss,
-                'gain_loss_pct': gain_loss_pct,
-            })
-            
-            total_value += market_value
-            total_cost += pos_data['shares'] * avg_cost
+    for position in positions:
+        current_price = position.ticker.price
+        market_value = position.shares * current_price
+        gain_loss = market_value - position.total_cost
+        gain_loss_pct = (gain_loss / position.total_cost) * 100 if position.total_cost > 0 else 0
+        
+        portfolio_data.append({
+            'symbol': position.ticker.symbol,
+            'ticker': position.ticker,
+            'shares': position.shares,
+            'avg_cost': position.avg_cost,
+            'current_price': current_price,
+            'market_value': market_value,
+            'gain_loss': gain_loss,
+            'gain_loss_pct': gain_loss_pct,
+        })
+        
+        total_value += market_value
+        total_cost += position.total_cost
     
     # Market overview
-    indices = Ticker.objects.filter(is_index=True)
-    top_gainers = Ticker.objects.filter(is_index=False).order_by('-change_pct')[:5]
-    top_losers = Ticker.objects.filter(is_index=False).order_by('change_pct')[:5]
+    market = snapshot.get()
     
     # Recent orders
-    recent_orders = Order.objects.filter(user=request.user).order_by('-created_at')[:10]
+    recent_orders = Order.objects.filter(user=request.user).select_related('ticker').order_by('-created_at')[:10]
     
     # Watchlist
     watchlist = Watchlist.objects.filter(user=request.user).select_related('ticker')
@@ -412,135 +395,104 @@ def dashboard(request):
         'total_cost': total_cost,
         'total_gain_loss': total_value - total_cost,
         'total_gain_loss_pct': ((total_value - total_cost) / total_cost * 100) if total_cost > 0 else 0,
-        'indices': indices,
-        'top_gainers': top_gainers,
-        'top_losers': top_losers,
+        'indices': market['indices'],
+        'top_gainers': market['top_gainers'][:5],
+        'top_losers': market['top_losers'][:5],
         'recent_orders': recent_orders,
-        'watchlist': watchlist,
+        'watchlist_items': watchlist,
     }
     
     return render(request, 'markets/dashboard.html', context)
 
 @login_required
 def screener(request):
-    """Stock screener with advanced filtering"""
-    # Get filter parameters
-    min_price = request.GET.get('min_price', '')
-    max_price = request.GET.get('max_price', '')
-    min_volume = request.GET.get('min_volume', '')
-    max_volume = request.GET.get('max_volume', '')
-    min_change = request.GET.get('min_change', '')
-    max_change = request.GET.get('max_change', '')
-    sector = request.GET.get('sector', '')
-    market_cap = request.GET.get('market_cap', '')
-    
-    # Start with all non-index stocks
-    stocks = Ticker.objects.filter(is_index=False)
-    
-    # Apply filters
-    if min_price:
-        stocks = stocks.filter(price__gte=min_price)
-    if max_price:
-        stocks = stocks.filter(price__lte=max_price)
-    if min_volume:
-        stocks = stocks.filter(volume__gte=min_volume)
-    if max_volume:
-        stocks = stocks.filter(volume__lte=max_volume)
-    if min_change:
-        stocks = stocks.filter(change_pct__gte=min_change)
-    if max_change:
-        stocks = stocks.filter(change_pct__lte=max_change)
-    if sector:
-        stocks = stocks.filter(sector=sector)
-    if market_cap:
-        # Simple market cap filtering (this would need actual market cap data)
-        if market_cap == 'large':
-            stocks = stocks.filter(price__gte=100)
-        elif market_cap == 'mid':
-            stocks = stocks.filter(price__gte=50, price__lt=100)
-        elif market_cap == 'small':
-            stocks = stocks.filter(price__lt=50)
-    
-    # Order by relevance
-    stocks = stocks.order_by('-change_pct')
-    
-    # Get available sectors
-    sectors = Ticker.objects.values_list('sector', flat=True).distinct()
+    """Stock screener over live prices and precomputed TickerStats"""
+    error = None
+    try:
+        spec = screener_engine.spec_from_query(request.GET)
+        page = screener_engine.run(spec)
+    except screener_engine.ScreenerError as e:
+        error = str(e)
+        spec = {'sort': screener_engine.DEFAULT_SORT}
+        page = screener_engine.run({})
+    
+    # Query string without the page, for pagination links
+    params = request.GET.copy()
+    params.pop('page', None)
+    sort_params = params.copy()
+    sort_params.pop('sort', None)
     
     context = {
-        'stocks': stocks,
-        'sectors': sectors,
-        'filters': {
-            'min_price': min_price,
-            'max_price': max_price,
-            'min_volume': min_volume,
-            'max_volume': max_volume,
-            'min_change': min_change,
-            'max_change': max_change,
-            'sector': sector,
-            'market_cap': market_cap,
-        }
+        'page': page,
+        'stocks': page.object_list,
+        'sectors': snapshot.get()['sectors'],
+        'filters': request.GET,
+        'sort': spec['sort'],
+        'query_string': params.urlencode(),
+        'sort_query_string': sort_params.urlencode(),
+        'market_cap_buckets': screener_engine.MARKET_CAP_BUCKETS,
+        'error': error,
     }
     
     return render(request, 'markets/screener.html', context)
 
+@login_required
+def screener_api(request):
+    """Run a screen and return one page of results as JSON"""
+    try:
+        if request.method == 'POST':
+            spec = json.loads(request.body)
+        else:
+            spec = screener_engine.spec_from_query(request.GET)
+        page = screener_engine.run(spec)
+    except (json.JSONDecodeError, UnicodeDecodeError, screener_engine.ScreenerError) as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    
+    return JsonResponse({
+        'results': [screener_engine.row(ticker) for ticker in page.object_list],
+        'page': page.number,
+        'num_pages': page.paginator.num_pages,
+        'count': page.paginator.count,
+    })
+
 @login_required
 def analytics(request):
     """Portfolio analytics and performance metrics"""
-    # Get user's orders
-    user_orders = Order.objects.filter(user=request.user).select_related('ticker').order_by('created_at')
+    # Trading statistics
+    order_counts = Order.objects.filter(
+        user=request.user,
+        status='FILLED'
+    ).aggregate(
+        total=Count('id'),
+        buys=Count('id', filter=Q(order_type='BUY')),
+        sells=Count('id', filter=Q(order_type='SELL')),
+    )
     
-    if not user_orders:
+    if not order_counts['total']:
         return render(request, 'markets/analytics.html', {'no_data': True})
     
-    # Calculate portfolio performance over time
-    portfolio_history = []
-    cumulative_cost = Decimal('0.00')
-    positions = {}
-    
-    for order in user_orders:
-        symbol = order.ticker.symbol
-        
-        if symbol not in positions:
-            positions[symbol] = {'shares': 0, 'cost_basis': Decimal('0.00')}
-        
-        if order.side == 'buy':
-            positions[symbol]['shares'] += order.quantity
-            positions[symbol]['cost_basis'] += order.quantity * order.price
-            cumulative_cost += order.quantity * order.price
-        else:
-            positions[symbol]['shares'] -= order.quantity
-            positions[symbol]['cost_basis'] -= order.quantity * order.price
-            cumulative_cost -= order.quantity * order.price
-        
-        # Calculate current portfolio value
-        current_value = Decimal('0.00')
-        for pos_symbol, pos_data in positions.items():
-            if pos_data['shares'] > 0:
-                ticker = Ticker.objects.get(symbol=pos_symbol)
-                current_value += pos_data['shares'] * ticker.price
-        
-        portfolio_history.append({
-            'date': order.created_at.strftime('%Y-%m-%d'),
-            'value': float(current_value),
-            'cost': float(cumulative_cost),
-            'gain_loss': float(current_value - cumulative_cost)
-        })
+    # Daily equity curve valued at each day's closing prices
+    curve = equity.equity_curve(request.user)
+    portfolio_history = [{
+        'date': day.strftime('%Y-%m-%d'),
+        'value': round(value, 2),
+        'cost': round(cost, 2),
+        'gain_loss': round(value - cost, 2)
+    } for day, value, cost in zip(curve['dates'], curve['value'].tolist(), curve['cost'].tolist())]
     
-    # Calculate sector allocation
+    # Calculate sector allocation from the position ledger
     sector_allocation = {}
     total_portfolio_value = Decimal('0.00')
+    positions = Position.objects.filter(user=request.user, shares__gt=0).select_related('ticker')
     
-    for symbol, pos_data in positions.items():
-        if pos_data['shares'] > 0:
-            ticker = Ticker.objects.get(symbol=symbol)
-            value = pos_data['shares'] * ticker.price
-            total_portfolio_value += value
-            
-            sector = ticker.sector or 'Unknown'
-            if sector not in sector_allocation:
-                sector_allocation[sector] = Decimal('0.00')
-            sector_allocation[sector] += value
+    for position in positions:
+        value = position.shares * position.ticker.price
+        total_portfolio_value += value
+        
+        sector = position.ticker.sector or 'Unknown'
+        if sector not in sector_allocation:
+            sector_allocation[sector] = Decimal('0.00')
+        sector_allocation[sector] += value
     
     # Convert to percentages
     sector_percentages = {}
@@ -548,10 +500,34 @@ def analytics(request):
         for sector, value in sector_allocation.items():
             sector_percentages[sector] = float((value / total_portfolio_value) * 100)
     
-    # Trading statistics
-    total_trades = user_orders.count()
-    buy_orders = user_orders.filter(side='buy').count()
-    sell_orders = user_orders.filter(side='sell').count()
+    # Per-holding risk comes from the nightly RiskMetric snapshot
+    risk_metrics = {
+        metric.ticker_id: metric
+        for metric in RiskMetric.objects.filter(
+            ticker__in=[position.ticker_id for position in positions],
+            benchmark__symbol=settings.RISK_BENCHMARK_SYMBOL,
+        )
+    }
+    holdings = []
+    for position in positions:
+        value = position.shares * position.ticker.price
+        weight = value / total_portfolio_value * 100 if total_portfolio_value > 0 else Decimal('0')
+        holding_return = (value / position.total_cost - 1) * 100 if position.total_cost > 0 else Decimal('0')
+        metric = risk_metrics.get(position.ticker_id)
+        holdings.append({
+            'ticker': position.ticker,
+            'weight': round(float(weight), 2),
+            'return': round(float(holding_return), 2),
+            'contribution': round(float(weight * holding_return / 100), 2),
+            'beta': _metric(metric, 'beta'),
+            'volatility': _metric(metric, 'volatility', scale=100),
+            'sharpe': _metric(metric, 'sharpe'),
+            'max_drawdown': _metric(metric, 'max_drawdown', scale=100),
+        })
+    
+    total_trades = order_counts['total']
+    buy_orders = order_counts['buys']
+    sell_orders = order_counts['sells']
     
     # Performance metrics
     if portfolio_history:
@@ -563,6 +539,7 @@ def analytics(request):
         total_return_pct = 0
     
     context = {
+        'holdings': holdings,
         'portfolio_history': json.dumps(portfolio_history),
         'sector_allocation': json.dumps(sector_percentages),
         'trading_stats': {
@@ -577,54 +554,37 @@ def analytics(request):
     
     return render(request, 'markets/analytics.html', context)
 
+def _metric(metric, field, scale=1):
+    """A RiskMetric value for display, or None when it has not been computed"""
+    value = getattr(metric, field, None)
+    return None if value is None else round(value * scale, 2)
+
 @login_required
 def advanced_trading(request):
     """Advanced trading interface"""
-    # Get user's current positions
-    user_orders = Order.objects.filter(user=request.user).select_related('ticker')
-    
-    positions = {}
-    for order in user_orders:
-        symbol = order.ticker.symbol
-        if symbol not in positions:
-            positions[symbol] = {
-                'symbol': symbol,
-                'company_name': order.ticker.name,
-                'shares': 0,
-                'total_cost': Decimal('0.00'),
-            }
-        
-        if order.side == 'buy':
-            positions[symbol]['shares'] += order.quantity
-            positions[symbol]['total_cost'] += order.quantity * order.price
-        else:
-            positions[symbol]['shares'] -= order.quantity
-            positions[symbol]['total_cost'] -= order.quantity * order.price
+    positions = Position.objects.filter(user=request.user, shares__gt=0).select_related('ticker')
     
     # Calculate current values for positions
     position_list = []
-    for pos_data in positions.values():
-        if pos_data['shares'] > 0:
-            ticker = Ticker.objects.get(symbol=pos_data['symbol'])
-            avg_cost = pos_data['total_cost'] / pos_data['shares']
-            current_price = ticker.price
-            market_value = pos_data['shares'] * current_price
-            gain_loss = market_value - (pos_data['shares'] * avg_cost)
-            gain_loss_pct = (gain_loss / (pos_data['shares'] * avg_cost)) * 100 if avg_cost > 0 else 0
-            
-            position_list.append({
-                'symbol': pos_data['symbol'],
-                'company_name': pos_data['company_name'],
-                'shares': pos_data['shares'],
-                'avg_cost': avg_cost,
-                'current_price': current_price,
-                'market_value': market_value,
-                'gain_loss': gain_loss,
-                'gain_loss_percent': gain_loss_pct,
-            })
-    
-    # Get active orders (for demo, we'll show recent orders)
-    active_orders = Order.objects.filter(user=request.user).order_by('-created_at')[:10]
+    for position in positions:
+        current_price = position.ticker.price
+        market_value = position.shares * current_price
+        gain_loss = market_value - position.total_cost
+        gain_loss_pct = (gain_loss / position.total_cost) * 100 if position.total_cost > 0 else 0
+        
+        position_list.append({
+            'symbol': position.ticker.symbol,
+            'company_name': position.ticker.name,
+            'shares': position.shares,
+            'avg_cost': position.avg_cost,
+            'current_price': current_price,
+            'market_value': market_value,
+            'gain_loss': gain_loss,
+            'gain_loss_percent': gain_loss_pct,
+        })
+    
+    # Recent orders, resting ones included
+    active_orders = Order.objects.filter(user=request.user).select_related('ticker').order_by('-created_at')[:10]
     
     # Add calculated total to each order
     orders_with_total = []
@@ -633,7 +593,9 @@ def advanced_trading(request):
             'id': order.id,
             'created_at': order.created_at,
             'ticker': order.ticker,
-            'side': order.side,
+            'side': order.order_type.lower(),
+            'kind': order.kind,
+            'status': order.status,
             'quantity': order.quantity,
             'price': order.price,
             'total': order.quantity * order.price,
@@ -663,41 +625,106 @@ def get_chart_data(request, symbol):
         '1y': 365,
     }.get(period, 30)
     
-    data = PriceBar.objects.filter(
-        ticker=stock
-    ).order_by('-date')[:days]
+    try:
+        points, max_points, method = _chart_params(request)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    
+    # Optional indicator overlays, e.g. ?indicators=sma:20,rsi:14,macd,
+    # which are computed on daily bars
+    spec = request.GET.get('indicators', '')
+    resolution, bars, picks, count = _chart_series(stock, days, points, max_points, method, daily=bool(spec))
     
     chart_data = [{
-        'time': bar.date.isoformat(),
-        'open': float(bar.open),
-        'high': float(bar.high),
-        'low': float(bar.low),
-        'close': float(bar.close),
-        'volume': bar.volume
-    } for bar in reversed(data)]
+        'time': t,
+        'open': o,
+        'high': h,
+        'low': l,
+        'close': c,
+        'volume': v
+    } for t, o, h, l, c, v in bars]
+    
+    response = {'data': chart_data, 'resolution': resolution}
+    
+    if spec:
+        try:
+            specs = indicators.parse_spec(spec)
+        except ValueError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        
+        response['indicators'] = {
+            key: _indicator_json(values, count, picks)
+            for key, values in indicators.for_ticker(stock.id, specs).items()
+        }
+    
+    return JsonResponse(response)
+
+def _indicator_json(values, count, picks=None):
+    """
+    Last ``count`` points of an indicator series (or dict of series), NaN as
+    null, thinned to ``picks`` when the bars were downsampled
+    """
+    if isinstance(values, dict):
+        return {name: _indicator_json(series, count, picks) for name, series in values.items()}
+    tail = values[len(values) - count:] if count else values[:0]
+    if picks is not None:
+        tail = tail[picks]
+    return [None if math.isnan(v) else round(v, 4) for v in tail.tolist()]
+
+@login_required
+def backtest_strategy(request, strategy_id):
+    """Run one of the user's strategies and return the backtest as JSON"""
+    strategy = get_object_or_404(TradingStrategy, id=strategy_id, user=request.user)
+    
+    tickers = Ticker.objects.filter(is_index=False)
+    symbols = [s for s in request.GET.get('symbols', '').split(',') if s]
+    if symbols:
+        tickers = Ticker.objects.filter(symbol__in=symbols)
     
-    return JsonResponse({'data': chart_data})
+    try:
+        start = request.GET.get('start')
+        end = request.GET.get('end')
+        sizing = {}
+        if request.GET.get('sizing'):
+            sizing['method'] = request.GET['sizing']
+        if request.GET.get('size'):
+            # Checked with the strategy's own sizing by run_backtest
+            sizing['value'] = request.GET['size']
+        
+        result = backtest.run_backtest(
+            strategy.criteria,
+            list(tickers),
+            start=datetime.strptime(start, '%Y-%m-%d').date() if start else None,
+            end=datetime.strptime(end, '%Y-%m-%d').date() if end else None,
+            capital=float(request.GET.get('capital', 100000)),
+            slippage_bps=float(request.GET.get('slippage_bps', 0)),
+            commission=float(request.GET.get('commission', 0)),
+            commission_bps=float(request.GET.get('commission_bps', 0)),
+            sizing=sizing,
+            workers=getattr(settings, 'BACKTEST_WORKERS', None),
+        )
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    
+    result['strategy'] = {'id': strategy.id, 'name': strategy.name}
+    return JsonResponse(result)
 
 @login_required
 def cancel_order(request, order_id):
-    """Cancel a specific order"""
+    """Cancel a specific PENDING order; filled orders stay in the history"""
     if request.method == 'POST':
-        try:
-            order = Order.objects.get(id=order_id, user=request.user)
-            # In a real system, you would cancel the order here
-            # For now, we'll just delete it from the database
-            order.delete()
+        if matching.cancel(request.user, [order_id]):
             return JsonResponse({'success': True, 'message': 'Order canceled successfully'})
-        except Order.DoesNotExist:
-            return JsonResponse({'success': False, 'message': 'Order not found'})
+        if Order.objects.filter(id=order_id, user=request.user).exists():
+            return JsonResponse({'success': False, 'message': 'Only pending orders can be canceled'})
+        return JsonResponse({'success': False, 'message': 'Order not found'})
     return JsonResponse({'success': False, 'message': 'Invalid request method'})
 
 @login_required
 def cancel_all_orders(request):
-    """Cancel all active orders for the user"""
+    """Cancel all of the user's PENDING orders"""
     if request.method == 'POST':
-        canceled_count = Order.objects.filter(user=request.user).count()
-        Order.objects.filter(user=request.user).delete()
+        canceled_count = matching.cancel(request.user)
         return JsonResponse({
             'success': True, 
             'message': f'{canceled_count} orders canceled successfully'
@@ -732,38 +759,138 @@ def remove_from_watchlist(request, item_id):
         messages.error(request, 'Watchlist item not found')
     return redirect('watchlist')
 
+TRADE_HISTORY_PAGE_SIZE = 50
+
 @login_required
 def trade_history(request):
-    """View complete trade history"""
-    orders = Order.objects.filter(user=request.user).select_related('ticker').order_by('-created_at')
+    """View trade history, newest first, one keyset page at a time"""
+    orders = Order.objects.filter(user=request.user).select_related('ticker').order_by('-created_at', '-id')
     
     # Filter by symbol if provided
     symbol = request.GET.get('symbol')
     if symbol:
         orders = orders.filter(ticker__symbol=symbol)
     
+    # ?after=<order id> continues below that order. Seeking on (created_at, id)
+    # instead of an OFFSET keeps deep pages as cheap as the first one.
+    after = request.GET.get('after', '')
+    if after.isdigit():
+        cursor = Order.objects.filter(user=request.user, id=after).values_list('created_at', 'id').first()
+        if cursor:
+            created_at, order_id = cursor
+            orders = orders.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=order_id))
+    
+    page = list(orders[:TRADE_HISTORY_PAGE_SIZE + 1])
+    has_next = len(page) > TRADE_HISTORY_PAGE_SIZE
+    page = page[:TRADE_HISTORY_PAGE_SIZE]
+    
     context = {
-        'orders': orders,
+        'orders': page,
         'symbol_filter': symbol,
+        'next_cursor': page[-1].id if has_next else None,
+        'is_first_page': not after.isdigit(),
     }
     return render(request, 'markets/trade_history.html', context)
 
+@login_required
+def export_report(request, report):
+    """Stream a trades, holdings or equity report as CSV or JSON (?format=)"""
+    fmt = request.GET.get('format', 'csv')
+    try:
+        lines = exports.stream(report, fmt, request.user)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    
+    response = StreamingHttpResponse(lines, content_type='text/csv' if fmt == 'csv' else 'application/json')
+    response['Content-Disposition'] = f'attachment; filename="{report}-{datetime.now():%Y%m%d}.{fmt}"'
+    return response
+
 def search_stocks(request):
     """Search for stocks by symbol or name"""
     query = request.GET.get('q', '')
     if len(query) < 2:
         return JsonResponse({'results': []})
     
-    stocks = Ticker.objects.filter(
-        Q(symbol__icontains=query) | Q(name__icontains=query),
-        is_index=False
-    )[:10]
+    ticker_ids = search.lookup(query, limit=10, include_indices=False)
+    stocks = Ticker.objects.in_bulk(ticker_ids)
     
     results = [{
         'symbol': stock.symbol,
         'name': stock.name,
         'price': float(stock.price),
         'change_pct': float(stock.change_pct),
-    } for stock in stocks]
+    } for stock in (stocks[ticker_id] for ticker_id in ticker_ids if ticker_id in stocks)]
     
     return JsonResponse({'results': results})
+
+def _alert_json(alert):
+    return {
+        'id': alert.id,
+        'symbol': alert.ticker.symbol,
+        'target_price': float(alert.target_price),
+        'alert_type': alert.alert_type,
+        'is_active': alert.is_active,
+        'created_at': alert.created_at.isoformat(),
+        'triggered_at': alert.triggered_at.isoformat() if alert.triggered_at else None,
+    }
+
+@login_required
+def price_alerts(request):
+    """List the user's price alerts, or create one from a JSON body"""
+    if request.method == 'POST':
+        try:
+            data = json.loads(request.body)
+            alert_type = data['alert_type'].upper()
+            if alert_type not in dict(PriceAlert.ALERT_TYPE_CHOICES):
+                raise ValueError(f'alert_type must be ABOVE or BELOW, got {alert_type!r}')
+            try:
+                target_price = Decimal(str(data['target_price']))
+            except ArithmeticError:
+                target_price = None
+            if target_price is None or not target_price.is_finite() or target_price <= 0:
+                raise ValueError('target_price must be a positive number')
+            ticker = Ticker.objects.get(symbol=data['symbol'])
+        except Ticker.DoesNotExist:
+            return JsonResponse({'error': 'Unknown symbol'}, status=400)
+        except KeyError as e:
+            return JsonResponse({'error': f'Missing field {e}'}, status=400)
+        except (ValueError, TypeError, AttributeError) as e:
+            return JsonResponse({'error': str(e)}, status=400)
+
+        alert = PriceAlert.objects.create(
+            user=request.user,
+            ticker=ticker,
+            target_price=target_price.quantize(Decimal('0.01')),
+            alert_type=alert_type,
+        )
+        return JsonResponse({'alert': _alert_json(alert)}, status=201)
+
+    alerts = PriceAlert.objects.filter(user=request.user).select_related('ticker').order_by('-created_at')
+    return JsonResponse({'alerts': [_alert_json(alert) for alert in alerts]})
+
+@login_required
+def delete_price_alert(request, alert_id):
+    """Delete one of the user's price alerts"""
+    if request.method == 'POST':
+        deleted, _ = PriceAlert.objects.filter(id=alert_id, user=request.user).delete()
+        if deleted:
+            return JsonResponse({'success': True, 'message': 'Alert deleted'})
+        return JsonResponse({'success': False, 'message': 'Alert not found'})
+    return JsonResponse({'success': False, 'message': 'Invalid request method'})
+
+def metrics(request):
+    """Prometheus scrape target for the request profiling registry; staff or INTERNAL_IPS only"""
+    if not (request.user.is_staff or request.META.get('REMOTE_ADDR') in getattr(settings, 'INTERNAL_IPS', ['127.0.0.1'])):
+        return HttpResponseForbidden()
+    return HttpResponse(profiling.registry.prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+@staff_member_required
+def slow_endpoints(request):
+    """Views by mean latency, with the SQL and template breakdown of the slowest sampled requests"""
+    context = {
+        'enabled': 'markets.profiling.ProfilingMiddleware' in settings.MIDDLEWARE,
+        'sample_rate': getattr(settings, 'PROFILE_SAMPLE_RATE', 0.01) * 100,
+        'views': profiling.registry.summary(),
+        'slowest': profiling.registry.slowest_requests()[:20],
+    }
+    return render(request, 'markets/slow_endpoints.html', context)
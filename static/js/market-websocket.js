@@ -7,14 +7,16 @@ class MarketDataSocket {
         this.reconnectInterval = 3000;
         this.isConnected = false;
         this.subscribers = new Map();
+        this.quotes = new Map();
         
         this.connect();
     }
     
     connect() {
         try {
-            // Using a mock WebSocket for demo - replace with real market data provider
-            this.socket = new WebSocket('wss://stream.tradingview.com/socket.io/');
+            // Ticker updates pushed by stocksite.asgi (markets/realtime.py)
+            const scheme = window.location.protocol === 'https:' ? 'wss' : 'ws';
+            this.socket = new WebSocket(`${scheme}://${window.location.host}/ws/tickers/`);
             
             this.socket.onopen = () => {
                 console.log('Market data connection established');
@@ -52,36 +54,60 @@ class MarketDataSocket {
     }
     
     handleMarketData(data) {
-        if (data.type === 'price_update') {
-            this.updatePrice(data.symbol, data.price, data.change, data.changePercent);
-        } else if (data.type === 'trade') {
-            this.updateTrade(data.symbol, data.price, data.volume);
-        } else if (data.type === 'news') {
-            this.updateNews(data);
+        if (data.type === 'ticks') {
+            // Only changed fields arrive; merge them into the last known quote
+            Object.entries(data.data).forEach(([symbol, fields]) => {
+                const quote = Object.assign(this.quotes.get(symbol) || {}, fields);
+                this.quotes.set(symbol, quote);
+                if ('price' in fields || 'change' in fields || 'change_pct' in fields) {
+                    this.updatePrice(symbol, quote.price, quote.change, quote.change_pct);
+                }
+                if ('volume' in fields) {
+                    this.updateTrade(symbol, quote.price, quote.volume);
+                }
+            });
+        } else if (data.type === 'error') {
+            console.error('Market data error:', data.error);
         }
     }
     
     updatePrice(symbol, price, change, changePercent) {
-        // Update price displays
+        // Update price displays, keeping each element's currency prefix
         const priceElements = document.querySelectorAll(`[data-symbol="${symbol}"] .price`);
         const changeElements = document.querySelectorAll(`[data-symbol="${symbol}"] .change`);
+        const percentElements = document.querySelectorAll(`[data-symbol="${symbol}"] .change-pct`);
         
-        priceElements.forEach(element => {
-            element.textContent = `$${price.toFixed(2)}`;
-            this.animateChange(element);
-        });
+        if (price !== undefined) {
+            priceElements.forEach(element => {
+                const currency = element.dataset.currency || '$';
+                element.textContent = `${currency}${price.toFixed(2)}`;
+                this.animateChange(element);
+            });
+        }
+        
+        if (change === undefined || changePercent === undefined) {
+            return;
+        }
         
         changeElements.forEach(element => {
             const changeClass = change >= 0 ? 'text-success' : 'text-danger';
             const changeIcon = change >= 0 ? '▲' : '▼';
+            const currency = element.dataset.currency || '$';
             
             element.className = `change ${changeClass}`;
-            element.innerHTML = `${changeIcon} $${Math.abs(change).toFixed(2)} (${changePercent.toFixed(2)}%)`;
+            element.innerHTML = `${changeIcon} ${currency}${Math.abs(change).toFixed(2)} (${changePercent.toFixed(2)}%)`;
             this.animateChange(element);
         });
         
+        percentElements.forEach(element => {
+            element.className = `change-pct ${changePercent >= 0 ? 'text-success' : 'text-danger'}`;
+            element.textContent = `${changePercent > 0 ? '+' : ''}${changePercent.toFixed(2)}%`;
+        });
+        
         // Update charts if visible
-        this.updateChart(symbol, price);
+        if (price !== undefined) {
+            this.updateChart(symbol, price);
+        }
         
         // Trigger notifications for significant changes
         if (Math.abs(changePercent) > 5) {
@@ -90,6 +116,9 @@ class MarketDataSocket {
     }
     
     updateTrade(symbol, price, volume) {
+        if (price === undefined) {
+            return;
+        }
         const tradeElements = document.querySelectorAll(`[data-symbol="${symbol}"] .last-trade`);
         
         tradeElements.forEach(element => {
@@ -368,21 +397,6 @@ document.addEventListener('DOMContentLoaded', function() {
     `;
     document.head.appendChild(style);
     
-    // Mock data for demonstration
-    setTimeout(() => {
-        if (window.marketSocket && window.marketSocket.isConnected) {
-            // Simulate price updates
-            setInterval(() => {
-                const symbols = ['AAPL', 'GOOGL', 'MSFT', 'TSLA', 'AMZN'];
-                const symbol = symbols[Math.floor(Math.random() * symbols.length)];
-                const price = 100 + Math.random() * 200;
-                const change = (Math.random() - 0.5) * 10;
-                const changePercent = (change / price) * 100;
-                
-                window.marketSocket.updatePrice(symbol, price, change, changePercent);
-            }, 3000);
-        }
-    }, 2000);
 });
 
 // Cleanup on page unload
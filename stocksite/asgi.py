@@ -2,6 +2,8 @@
 ASGI config for stocksite project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+WebSocket connections to ``/ws/tickers/`` go to the live Ticker feed in
+``markets.realtime``; everything else is handled by Django.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
@@ -13,4 +15,15 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'stocksite.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from markets.realtime import ticker_socket  # noqa: E402  (after Django is set up)
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'websocket':
+        if scope['path'] == '/ws/tickers/':
+            return await ticker_socket(scope, receive, send)
+        await receive()
+        return await send({'type': 'websocket.close'})
+    return await django_application(scope, receive, send)